@@ -0,0 +1,345 @@
+#!/usr/bin/env python3
+"""
+Local HTTP service over the donation and market-odds outputs.
+Loads the aggregate artifacts once into memory and serves them as JSON (or
+Arrow IPC with ?format=arrow) to dashboards, using only asyncio and the
+standard library so it runs fully offline.
+
+Endpoints:
+    /health                                 artifact version and cache counters
+    /aggregations/<freq>                    weekly/monthly (party, segment, start, end)
+    /cumulative/<freq>                      cumulative ratios (segment, start, end)
+    /candidates/<freq>                      per-candidate ratios (candidate, race, segment, start, end)
+    /segments                               donor segment statistics
+    /markets                                markets with data_segment odds and their segments
+    /markets/<event>/<market>               odds for one market (segment=all|small|medium|large)
+
+Identical requests that arrive while a response is being built share that
+build (request coalescing), finished responses are kept in an LRU cache,
+and artifacts are re-read when their size or mtime changes (hot reload).
+"""
+
+import argparse
+import asyncio
+import json
+from collections import OrderedDict
+from pathlib import Path
+from urllib.parse import parse_qsl, unquote, urlsplit
+
+import numpy as np
+import pandas as pd
+from donation_query import CANDIDATE_STORE, PARTY_STORE, filter_values, period_bound
+from period_rollup import FREQUENCIES
+
+try:
+    import pyarrow as pa
+except ImportError:
+    pa = None
+
+DEFAULT_PORT = 8765
+RESPONSE_CACHE_SIZE = 512
+RELOAD_INTERVAL = 2.0
+
+CUMULATIVE_STORE = Path('cumulative_ratio_analysis') / 'output'
+DONOR_SEGMENTS_FILE = Path('donor_segments.csv')
+MARKET_ROOT = Path('data_segment')
+MARKET_SEGMENT_FILES = {
+    'all': 'all_segments.csv',
+    'small': 'small_segment.csv',
+    'medium': 'medium_segment.csv',
+    'large': 'large_segment.csv',
+}
+
+class HTTPError(Exception):
+    """Error with an HTTP status, reported to the client as JSON."""
+
+    def __init__(self, status, message):
+        super().__init__(message)
+        self.status = status
+
+def artifact_paths(root):
+    """Map artifact names to the files they are loaded from."""
+    root = Path(root)
+    paths = {
+        'segments': root / DONOR_SEGMENTS_FILE,
+        'candidates': root / CANDIDATE_STORE,
+    }
+    for freq in FREQUENCIES:
+        paths[f'aggregations/{freq}'] = root / PARTY_STORE / f'{freq}_aggregations.csv'
+    for freq in ('weekly', 'monthly'):
+        paths[f'cumulative/{freq}'] = root / CUMULATIVE_STORE / f'{freq}_cumulative_aggregations.csv'
+    for market_dir in sorted((root / MARKET_ROOT).glob('*/*')):
+        for segment, file_name in MARKET_SEGMENT_FILES.items():
+            paths[f'markets/{market_dir.parent.name}/{market_dir.name}/{segment}'] = market_dir / file_name
+    return {name: path for name, path in paths.items() if path.exists()}
+
+def segment_statistics(donor_segments):
+    """Per-segment donor counts and donation totals from donor_segments.csv."""
+    stats = donor_segments.groupby('Donor_Segment')['Cumulative_Donation_USD'].agg(
+        ['count', 'sum', 'mean', 'median']).reset_index()
+    stats.columns = ['Donor_Segment', 'Donors', 'Total_Donated', 'Average_Donation', 'Median_Donation']
+    stats['Donor_Share'] = stats['Donors'] / stats['Donors'].sum()
+    return stats
+
+class ArtifactStore:
+    """In-memory copies of the aggregate artifacts, reloaded when their files change."""
+
+    def __init__(self, root):
+        self.root = Path(root)
+        self.tables = {}
+        self.stamps = {}
+        self.version = 0
+
+    def refresh(self):
+        """
+        Reload new or changed artifacts and drop removed ones. Returns the
+        changed names. The new tables are swapped in with one assignment, so
+        requests served meanwhile never see a dict that is being modified.
+        """
+        paths = artifact_paths(self.root)
+        changed = [name for name in self.stamps if name not in paths]
+        tables, stamps = {}, {}
+        for name, path in paths.items():
+            stat = path.stat()
+            stamp = (stat.st_size, stat.st_mtime_ns)
+            if self.stamps.get(name) == stamp:
+                tables[name], stamps[name] = self.tables[name], stamp
+                continue
+            table = pd.read_csv(path, dtype={'Year_Month': str, 'Period': str})
+            if name == 'segments':
+                table = segment_statistics(table)
+            tables[name], stamps[name] = table, stamp
+            changed.append(name)
+
+        if changed:
+            self.tables, self.stamps = tables, stamps
+            self.version += 1
+        return changed
+
+    def table(self, name):
+        """Loaded artifact by name (HTTP 404 when it is missing)."""
+        table = self.tables.get(name)
+        if table is None:
+            raise HTTPError(404, f"artifact {name!r} is not available")
+        return table
+
+def _single(params, name):
+    """Last value of a query parameter, or None."""
+    values = params.get(name)
+    return values[-1] if values else None
+
+def _filter(table, params, columns):
+    """Vectorized filtering on the query parameters that map to table columns."""
+    mask = np.ones(len(table), dtype=bool)
+    for param, column in columns.items():
+        values = filter_values(params.get(param))
+        if values is not None:
+            mask &= table[column].astype(str).isin(values).to_numpy()
+    return table[mask]
+
+def _filter_periods(table, params, period_col, freq):
+    """Inclusive start/end filtering on period labels."""
+    periods = table[period_col].astype(str)
+    start = period_bound(_single(params, 'start'), freq)
+    end = period_bound(_single(params, 'end'), freq)
+    mask = np.ones(len(table), dtype=bool)
+    if start is not None:
+        mask &= (periods >= start).to_numpy()
+    if end is not None:
+        mask &= (periods <= end).to_numpy()
+    return table[mask]
+
+def build_response(store, path, params):
+    """Build the DataFrame (or dict) answering one request."""
+    parts = [unquote(part) for part in path.strip('/').split('/') if part]
+    if parts == ['segments']:
+        return store.table('segments')
+    if parts == ['markets']:
+        segments = {}
+        for name in store.tables:
+            if name.startswith('markets/'):
+                _, event_id, market_slug, segment = name.split('/')
+                segments.setdefault((event_id, market_slug), []).append(segment)
+        return pd.DataFrame([(event_id, market_slug, sorted(names, key=list(MARKET_SEGMENT_FILES).index))
+                             for (event_id, market_slug), names in sorted(segments.items())],
+                            columns=['event_id', 'market_slug', 'segments'])
+    if len(parts) == 3 and parts[0] == 'markets':
+        segment = _single(params, 'segment') or 'all'
+        return store.table(f'markets/{parts[1]}/{parts[2]}/{segment}')
+
+    if len(parts) == 2 and parts[1] in FREQUENCIES:
+        kind, freq = parts
+        if kind == 'aggregations':
+            table = store.table(f'aggregations/{freq}')
+            table = _filter(table, params, {'party': 'Party', 'segment': 'Donor_Segment'})
+            return _filter_periods(table, params, FREQUENCIES[freq][0], freq)
+        if kind == 'cumulative':
+            table = store.table(f'cumulative/{freq}')
+            table = _filter(table, params, {'segment': 'Segment'})
+            return _filter_periods(table, params, FREQUENCIES[freq][0], freq)
+        if kind == 'candidates':
+            table = store.table('candidates')
+            table = table[table['Frequency'] == freq]
+            table = _filter(table, params, {'candidate': 'Candidate', 'race': 'Race', 'segment': 'Segment'})
+            return _filter_periods(table, params, 'Period', freq)
+    raise HTTPError(404, f"unknown endpoint {path!r}")
+
+def encode_response(result, fmt):
+    """Serialize a result to (content_type, body bytes)."""
+    if isinstance(result, dict):
+        return 'application/json', json.dumps(result).encode()
+    if fmt == 'arrow':
+        if pa is None:
+            raise HTTPError(400, "Arrow responses need pyarrow")
+        table = pa.Table.from_pandas(result, preserve_index=False)
+        sink = pa.BufferOutputStream()
+        with pa.ipc.new_stream(sink, table.schema) as writer:
+            writer.write_table(table)
+        return 'application/vnd.apache.arrow.stream', sink.getvalue().to_pybytes()
+    return 'application/json', result.to_json(orient='records').encode()
+
+class AggregateService:
+    """asyncio HTTP front end with request coalescing, an LRU response cache and hot reload."""
+
+    def __init__(self, root, cache_size=RESPONSE_CACHE_SIZE, reload_interval=RELOAD_INTERVAL):
+        self.store = ArtifactStore(root)
+        self.store.refresh()
+        self.cache = OrderedDict()
+        self.cache_size = cache_size
+        self.inflight = {}
+        self.reload_interval = reload_interval
+        self.counters = {'requests': 0, 'cache_hits': 0, 'coalesced': 0, 'built': 0, 'reloads': 0}
+
+    def build(self, path, params, fmt):
+        """Build (status, content_type, body) for a request; runs in a worker thread."""
+        try:
+            return (200, *encode_response(build_response(self.store, path, params), fmt))
+        except HTTPError as e:
+            return e.status, 'application/json', json.dumps({'error': str(e)}).encode()
+        except (KeyError, ValueError) as e:
+            return 400, 'application/json', json.dumps({'error': str(e)}).encode()
+        except Exception as e:
+            return 500, 'application/json', json.dumps({'error': str(e)}).encode()
+
+    async def respond(self, path, params):
+        """Return (status, content_type, body) for a request, via the cache or a shared build."""
+        self.counters['requests'] += 1
+        fmt = params.pop('format', ['json'])[-1]
+        key = (self.store.version, path, tuple(sorted((name, tuple(values)) for name, values in params.items())), fmt)
+        if key in self.cache:
+            self.cache.move_to_end(key)
+            self.counters['cache_hits'] += 1
+            return self.cache[key]
+        if key in self.inflight:
+            self.counters['coalesced'] += 1
+        else:
+            self.inflight[key] = asyncio.ensure_future(self.build_shared(key, path, params, fmt))
+        # Shielded so a caller that goes away never cancels the build the others wait on
+        return await asyncio.shield(self.inflight[key])
+
+    async def build_shared(self, key, path, params, fmt):
+        """Build one response for every caller of key and cache it."""
+        try:
+            response = await asyncio.get_running_loop().run_in_executor(None, self.build, path, params, fmt)
+        finally:
+            del self.inflight[key]
+        self.counters['built'] += 1
+        if response[0] == 200:
+            self.cache[key] = response
+            while len(self.cache) > self.cache_size:
+                self.cache.popitem(last=False)
+        return response
+
+    async def handle_client(self, reader, writer):
+        """Serve HTTP/1.1 requests on one connection (keep-alive)."""
+        try:
+            while True:
+                request_line = await reader.readline()
+                if not request_line:
+                    break
+                headers = {}
+                while True:
+                    line = await reader.readline()
+                    if line in (b'\r\n', b'\n', b''):
+                        break
+                    name, _, value = line.decode('latin-1').partition(':')
+                    headers[name.strip().lower()] = value.strip()
+
+                method, target, _ = request_line.decode('latin-1').split(' ', 2)
+                if method != 'GET':
+                    status, content_type, body = 405, 'application/json', b'{"error": "GET only"}'
+                else:
+                    url = urlsplit(target)
+                    # Repeated parameters (candidate=A&candidate=B) select several values
+                    params = {}
+                    for name, value in parse_qsl(url.query):
+                        params.setdefault(name, []).append(value)
+                    if url.path.strip('/') == 'health':
+                        status, content_type, body = 200, 'application/json', json.dumps(
+                            {'version': self.store.version, 'artifacts': len(self.store.tables),
+                             **self.counters}).encode()
+                    else:
+                        status, content_type, body = await self.respond(url.path, params)
+
+                keep_alive = headers.get('connection', '').lower() != 'close'
+                writer.write(f'HTTP/1.1 {status} {"OK" if status == 200 else "Error"}\r\n'
+                             f'Content-Type: {content_type}\r\n'
+                             f'Content-Length: {len(body)}\r\n'
+                             f'Connection: {"keep-alive" if keep_alive else "close"}\r\n\r\n'.encode() + body)
+                await writer.drain()
+                if not keep_alive:
+                    break
+        except (ConnectionError, ValueError):
+            pass
+        finally:
+            writer.close()
+
+    async def watch(self):
+        """Poll artifact files and reload them when they change."""
+        while True:
+            await asyncio.sleep(self.reload_interval)
+            changed = await asyncio.get_running_loop().run_in_executor(None, self.store.refresh)
+            if changed:
+                # Cached responses belong to the old version; drop them
+                self.cache.clear()
+                self.counters['reloads'] += 1
+                print(f"  ↻ Reloaded {len(changed)} artifact(s), version {self.store.version}")
+
+    async def start(self, host='127.0.0.1', port=DEFAULT_PORT):
+        """Start listening and the reload watcher; returns the asyncio server."""
+        server = await asyncio.start_server(self.handle_client, host, port)
+        self.watcher = asyncio.create_task(self.watch())
+        return server
+
+def parse_args():
+    """Parse command line options."""
+    parser = argparse.ArgumentParser(description="Serve donation and market-odds aggregates over HTTP.")
+    parser.add_argument('--root', default='.', help="repository directory holding the outputs")
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=DEFAULT_PORT)
+    parser.add_argument('--reload-interval', type=float, default=RELOAD_INTERVAL,
+                        help="seconds between artifact change checks")
+    return parser.parse_args()
+
+async def serve(args):
+    """Start the service and serve until cancelled."""
+    service = AggregateService(args.root, reload_interval=args.reload_interval)
+    server = await service.start(args.host, args.port)
+    print(f"  ✓ Loaded {len(service.store.tables):,} artifacts from {Path(args.root).resolve()}")
+    print(f"  ✓ Serving on http://{args.host}:{args.port} (Ctrl+C to stop)")
+    async with server:
+        await server.serve_forever()
+
+def main():
+    """Run the aggregate service until interrupted."""
+    args = parse_args()
+    print("="*80)
+    print("DONATION AGGREGATE SERVICE")
+    print("="*80)
+    try:
+        asyncio.run(serve(args))
+    except KeyboardInterrupt:
+        print("\n✓ Stopped")
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,150 @@
+#!/usr/bin/env python3
+"""
+Load test for aggregate_service.py.
+Sends a mix of dashboard requests over keep-alive connections and reports
+p50/p99 latency and throughput. Without --url the service is started
+in-process on a free port, so the test runs fully offline.
+"""
+
+import argparse
+import asyncio
+import json
+import time
+from urllib.parse import quote, urlsplit
+
+import numpy as np
+from aggregate_service import AggregateService
+
+def parse_args():
+    """Parse command line options."""
+    parser = argparse.ArgumentParser(description="Load test the aggregate service.")
+    parser.add_argument('--url', help="base URL of a running service (default: start one in-process)")
+    parser.add_argument('--root', default='.', help="outputs directory for the in-process service")
+    parser.add_argument('--requests', type=int, default=5000, help="total number of requests")
+    parser.add_argument('--concurrency', type=int, default=32, help="number of concurrent connections")
+    return parser.parse_args()
+
+class Connection:
+    """Minimal keep-alive HTTP/1.1 GET client."""
+
+    def __init__(self, host, port):
+        self.host = host
+        self.port = port
+        self.reader = None
+        self.writer = None
+
+    async def get(self, path):
+        """Return (status, body) for one GET request."""
+        if self.writer is None:
+            self.reader, self.writer = await asyncio.open_connection(self.host, self.port)
+        self.writer.write(f'GET {path} HTTP/1.1\r\nHost: {self.host}\r\n\r\n'.encode())
+        await self.writer.drain()
+        status = int((await self.reader.readline()).split()[1])
+        length = 0
+        while True:
+            line = await self.reader.readline()
+            if line in (b'\r\n', b'\n', b''):
+                break
+            name, _, value = line.decode('latin-1').partition(':')
+            if name.strip().lower() == 'content-length':
+                length = int(value)
+        return status, await self.reader.readexactly(length)
+
+    def close(self):
+        if self.writer is not None:
+            self.writer.close()
+
+async def request_mix(connection):
+    """Dashboard-style request paths, including every market's segment odds."""
+    paths = ['/aggregations/weekly', '/aggregations/monthly?party=DEM',
+             '/aggregations/weekly?segment=Small&start=2024-01-01', '/cumulative/weekly?segment=All',
+             '/cumulative/monthly', '/segments', '/markets', '/aggregations/monthly?format=arrow']
+    status, body = await connection.get('/markets')
+    if status == 200:
+        for market in json.loads(body):
+            for segment in market['segments']:
+                paths.append(f"/markets/{quote(market['event_id'])}/{quote(market['market_slug'])}"
+                             f"?segment={segment}")
+    return paths
+
+async def run_load(host, port, total, concurrency):
+    """Issue `total` requests over `concurrency` connections; returns latencies and error count."""
+    probe = Connection(host, port)
+    paths = await request_mix(probe)
+    probe.close()
+
+    latencies = []
+    errors = 0
+    counter = iter(range(total))
+
+    async def worker():
+        nonlocal errors
+        connection = Connection(host, port)
+        try:
+            for i in counter:
+                path = paths[i % len(paths)]
+                started = time.perf_counter()
+                status, _ = await connection.get(path)
+                latencies.append(time.perf_counter() - started)
+                if status != 200:
+                    errors += 1
+        finally:
+            connection.close()
+
+    started = time.perf_counter()
+    await asyncio.gather(*(worker() for _ in range(concurrency)))
+    elapsed = time.perf_counter() - started
+
+    probe = Connection(host, port)
+    _, health = await probe.get('/health')
+    probe.close()
+    return np.array(latencies), errors, elapsed, len(paths), json.loads(health)
+
+async def load_test(args):
+    """Start the service if needed, run the load and print the report."""
+    server = None
+    if args.url:
+        url = urlsplit(args.url)
+        host, port = url.hostname, url.port or 80
+    else:
+        service = AggregateService(args.root)
+        server = await service.start('127.0.0.1', 0)
+        host, port = server.sockets[0].getsockname()[:2]
+        print(f"  ✓ Started in-process service on {host}:{port} "
+              f"({len(service.store.tables):,} artifacts)")
+
+    try:
+        latencies, errors, elapsed, path_count, health = await run_load(
+            host, port, args.requests, args.concurrency)
+    finally:
+        if server is not None:
+            # Let the handlers see the clients disconnect before shutting down
+            await asyncio.sleep(0.1)
+            service.watcher.cancel()
+            server.close()
+            await server.wait_closed()
+
+    latencies_ms = latencies * 1000
+    print(f"\n  Requests: {len(latencies):,} over {args.concurrency} connections "
+          f"({path_count} distinct paths)")
+    print(f"  Errors: {errors:,}")
+    print(f"  Throughput: {len(latencies) / elapsed:,.0f} requests/s")
+    print(f"  Latency p50: {np.percentile(latencies_ms, 50):.2f} ms")
+    print(f"  Latency p99: {np.percentile(latencies_ms, 99):.2f} ms")
+    print(f"  Latency max: {latencies_ms.max():.2f} ms")
+    print(f"  Service: {health['built']:,} built, {health['cache_hits']:,} cache hits, "
+          f"{health['coalesced']:,} coalesced")
+
+def main():
+    """Run the load test."""
+    args = parse_args()
+    print("="*80)
+    print("AGGREGATE SERVICE LOAD TEST")
+    print("="*80)
+    asyncio.run(load_test(args))
+    print(f"\n{'='*80}")
+    print("✓ Load test complete!")
+    print(f"{'='*80}")
+
+if __name__ == '__main__':
+    main()
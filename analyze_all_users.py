@@ -6,6 +6,7 @@ Generates all_users_analysis.csv with user statistics.
 
 import pandas as pd
 from pathlib import Path
+from sqlite_store import write_table
 
 def analyze_user(date_group_token_file):
     """Analyze a single user's date_group_token.csv file."""
@@ -97,6 +98,9 @@ def main():
     df = pd.DataFrame(user_analyses)
     df = df.sort_values('cumulative_total_value_max', ascending=False)
     df.to_csv(output_file, index=False)
+    db = write_table('all_users_analysis', df)
+    if db is not None:
+        print(f"  ✓ Stored all_users_analysis in {db}")
     
     print(f"\n{'='*80}")
     print(f"✓ COMPLETED: Analyzed {len(df)} users")
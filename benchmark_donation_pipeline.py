@@ -0,0 +1,236 @@
+#!/usr/bin/env python3
+"""
+Benchmark suite for the donation pipeline on synthetic data.
+For each requested size it generates (or reuses) a synthetic
+US_Election_Donation.csv with generate_donation_data.py, then runs the
+pipeline stages in order as separate processes:
+
+    segment_election_donors -> prepare_donation_time_series ->
+    prepare_cumulative_donations -> plot_donation_time_series ->
+    plot_cumulative_donations
+
+Each stage is timed and its peak resident memory is the child's own
+high-water mark (VmHWM), polled while it runs. Generation runs as a child
+process too, so the benchmark process itself stays small. The results go
+to a JSON report (with the git commit and library versions) so runs can be
+compared over time; --compare prints the change against an earlier report.
+"""
+
+import argparse
+import json
+import os
+import platform
+import shutil
+import subprocess
+import sys
+import time
+from datetime import datetime, timezone
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+from generate_donation_data import parse_size
+
+ROOT = Path(__file__).resolve().parent
+POLL_SECONDS = 0.02
+
+# stage -> (script, working directory relative to the size's directory)
+STAGES = {
+    'segment': ('segment_election_donors.py', '.'),
+    'prepare_time_series': ('prepare_donation_time_series.py', '.'),
+    'prepare_cumulative': ('cumulative_ratio_analysis/prepare_cumulative_donations.py', 'cumulative_ratio_analysis'),
+    'plot_time_series': ('plot_donation_time_series.py', '.'),
+    'plot_cumulative': ('cumulative_ratio_analysis/plot_cumulative_donations.py', 'cumulative_ratio_analysis'),
+}
+
+def parse_args():
+    """Parse command line options."""
+    parser = argparse.ArgumentParser(description="Benchmark the donation pipeline on synthetic data.")
+    parser.add_argument('--sizes', nargs='+', default=['1M'],
+                        help="row counts to benchmark, e.g. 1M 10M 70M (default: 1M)")
+    parser.add_argument('--stages', nargs='+', default=list(STAGES), choices=list(STAGES),
+                        help="stages to run, in pipeline order (default: all)")
+    parser.add_argument('--workdir', type=Path, default=Path('.benchmark'),
+                        help="directory for the generated files and stage outputs (default: .benchmark)")
+    parser.add_argument('--output', type=Path, default=Path('benchmark_report.json'),
+                        help="JSON report to write (default: benchmark_report.json)")
+    parser.add_argument('--compare', type=Path, help="earlier JSON report to compare against")
+    parser.add_argument('--warm', action='store_true',
+                        help="keep the Parquet cache from earlier runs instead of timing a cold start")
+    parser.add_argument('--seed', type=int, default=0, help="generator seed (default: 0)")
+    return parser.parse_args()
+
+def prepare_input(size_dir, rows, seed):
+    """Generate the synthetic file unless one with the same rows and seed exists."""
+    donation_file = size_dir / 'US_Election_Donation.csv'
+    stamp_file = size_dir / 'generated.json'
+    stamp = {'rows': rows, 'seed': seed}
+    if donation_file.exists() and stamp_file.exists() and json.loads(stamp_file.read_text()) == stamp:
+        print(f"  ✓ Reusing {donation_file} ({donation_file.stat().st_size / 1e6:,.1f} MB)")
+        return donation_file, None
+
+    result = run_script('generate_donation_data.py', size_dir, size_dir / 'generate.log',
+                        ['--rows', str(rows), '--seed', str(seed), '--output', donation_file.name])
+    if result['returncode'] != 0:
+        print(f"  ✗ Generating {donation_file} failed; see {result['log']}")
+        return None, None
+    stamp_file.write_text(json.dumps(stamp))
+    print(f"  ✓ Generated {donation_file} ({donation_file.stat().st_size / 1e6:,.1f} MB) "
+          f"in {result['seconds']:.1f}s")
+    return donation_file, result['seconds']
+
+def peak_rss_bytes(pid):
+    """A process's own resident high-water mark (VmHWM), or None without /proc."""
+    try:
+        with open(f'/proc/{pid}/status') as f:
+            for line in f:
+                if line.startswith('VmHWM:'):
+                    return int(line.split()[1]) * 1024
+    except OSError:
+        pass
+    return None
+
+def run_script(script, cwd, log_file, args=()):
+    """Run a repo script as a child process in `cwd`; returns its timing and peak memory."""
+    cwd.mkdir(parents=True, exist_ok=True)
+    env = dict(os.environ, MPLBACKEND='Agg', PYTHONPATH=str(ROOT))
+
+    peak = None
+    with open(log_file, 'w') as log:
+        started = time.perf_counter()
+        process = subprocess.Popen([sys.executable, str(ROOT / script), *args], cwd=cwd, env=env,
+                                   stdout=log, stderr=subprocess.STDOUT)
+        # ru_maxrss of a forked child starts at the parent's high-water mark, so
+        # poll the child's own VmHWM until wait4 reaps it
+        while True:
+            pid, status, usage = os.wait4(process.pid, os.WNOHANG)
+            if pid:
+                break
+            sample = peak_rss_bytes(process.pid)
+            if sample is not None:
+                peak = max(peak or 0, sample)
+            time.sleep(POLL_SECONDS)
+        seconds = time.perf_counter() - started
+    process.returncode = os.waitstatus_to_exitcode(status)
+
+    if peak is None:
+        # No /proc (e.g. macOS): fall back to ru_maxrss, which is bytes there and KB on Linux
+        peak = usage.ru_maxrss if sys.platform == 'darwin' else usage.ru_maxrss * 1024
+    return {
+        'script': script,
+        'seconds': round(seconds, 3),
+        'cpu_seconds': round(usage.ru_utime + usage.ru_stime, 3),
+        'peak_rss_mb': round(peak / 2**20, 1),
+        'returncode': process.returncode,
+        'log': str(log_file),
+    }
+
+def run_stage(name, size_dir):
+    """Run one pipeline stage on a size's directory."""
+    script, cwd = STAGES[name]
+    return {'stage': name, **run_script(script, size_dir / cwd, size_dir / f'{name}.log')}
+
+def environment():
+    """Machine, library and code version details for the report."""
+    try:
+        commit = subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], cwd=ROOT, capture_output=True,
+                                text=True, check=True).stdout.strip()
+        dirty = bool(subprocess.run(['git', 'status', '--porcelain', '--untracked-files=no'], cwd=ROOT,
+                                    capture_output=True, text=True).stdout.strip())
+    except (OSError, subprocess.CalledProcessError):
+        commit, dirty = None, None
+    try:
+        import pyarrow
+        pyarrow_version = pyarrow.__version__
+    except ImportError:
+        pyarrow_version = None
+    return {
+        'commit': commit,
+        'dirty': dirty,
+        'python': platform.python_version(),
+        'pandas': pd.__version__,
+        'numpy': np.__version__,
+        'pyarrow': pyarrow_version,
+        'platform': platform.platform(),
+        'cpus': os.cpu_count(),
+    }
+
+def benchmark_size(size, stages, workdir, seed, warm):
+    """Generate one size and run the stages on it."""
+    rows = parse_size(size)
+    size_dir = workdir / size
+    print(f"\n[{size}] {rows:,} rows")
+    donation_file, generate_seconds = prepare_input(size_dir, rows, seed)
+    if donation_file is None:
+        return {'size': size, 'rows': rows, 'stages': []}
+    if not warm:
+        # Time a cold start: the first stage rebuilds the columnar cache
+        shutil.rmtree(size_dir / '.donation_cache', ignore_errors=True)
+
+    results = []
+    for name in stages:
+        result = run_stage(name, size_dir)
+        results.append(result)
+        status = '✓' if result['returncode'] == 0 else '✗'
+        print(f"  {status} {name:22s} {result['seconds']:9.2f}s  {result['peak_rss_mb']:9.1f} MB peak RSS")
+        if result['returncode'] != 0:
+            # Later stages read the prepare outputs; the plot stages are independent
+            if name.startswith('plot_'):
+                print(f"    see {result['log']}")
+                continue
+            print(f"    see {result['log']}; skipping the remaining stages")
+            break
+
+    return {
+        'size': size,
+        'rows': rows,
+        'input_mb': round(donation_file.stat().st_size / 1e6, 1),
+        'generate_seconds': None if generate_seconds is None else round(generate_seconds, 3),
+        'stages': results,
+    }
+
+def print_comparison(report, baseline):
+    """Per-stage time and memory change against an earlier report."""
+    earlier = {(run['size'], stage['stage']): stage for run in baseline['runs'] for stage in run['stages']}
+    print(f"\nChange vs {baseline['environment'].get('commit')} ({baseline['created']}):")
+    for run in report['runs']:
+        for stage in run['stages']:
+            before = earlier.get((run['size'], stage['stage']))
+            if before is None or before['returncode'] != 0 or stage['returncode'] != 0:
+                continue
+            time_change = (stage['seconds'] / before['seconds'] - 1) * 100 if before['seconds'] else 0
+            memory_change = (stage['peak_rss_mb'] / before['peak_rss_mb'] - 1) * 100 if before['peak_rss_mb'] else 0
+            print(f"  {run['size']:>5s} {stage['stage']:22s} {before['seconds']:9.2f}s -> {stage['seconds']:9.2f}s "
+                  f"({time_change:+6.1f}%)  {before['peak_rss_mb']:8.1f} -> {stage['peak_rss_mb']:8.1f} MB "
+                  f"({memory_change:+6.1f}%)")
+
+def main():
+    """Run the benchmark for every requested size and write the report."""
+    args = parse_args()
+    print("="*80)
+    print("DONATION PIPELINE BENCHMARK")
+    print("="*80)
+
+    # Keep pipeline order whatever order the stages were given in
+    stages = [name for name in STAGES if name in args.stages]
+    report = {
+        'created': datetime.now(timezone.utc).isoformat(timespec='seconds'),
+        'environment': environment(),
+        'runs': [benchmark_size(size, stages, args.workdir, args.seed, args.warm) for size in args.sizes],
+    }
+
+    args.output.write_text(json.dumps(report, indent=2) + '\n')
+    print(f"\n  ✓ Report written to {args.output}")
+
+    if args.compare is not None:
+        if args.compare.exists():
+            print_comparison(report, json.loads(args.compare.read_text()))
+        else:
+            print(f"  ⚠ {args.compare} not found; nothing to compare")
+
+    print(f"\n{'='*80}")
+    print("✓ Benchmark complete!")
+    print(f"{'='*80}")
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,158 @@
+#!/usr/bin/env python3
+"""
+Scaling benchmark for the trader pipeline on synthetic Polymarket data.
+Each scale is EVENTSxMARKETSxWALLETSxTRADES (markets per event, trades per
+market), e.g. 4x5x2000x10000. For each one the data/ layout is generated
+with generate_trade_data.py (or reused), then the orchestration steps run
+in order as separate processes:
+
+    build_combined_token -> closing_price_index -> build_date_group_token ->
+    analyze_all_users -> segment_users -> build_segment_positions_data ->
+    build_segment_aggregation_data
+
+Every step reports wall time, CPU time, peak RSS, files written and trade
+rows per second. The results go to a JSON report next to the donation
+benchmark's, so runs can be compared as markets and users scale.
+"""
+
+import argparse
+import json
+import os
+import shutil
+import time
+from datetime import datetime, timezone
+from pathlib import Path
+
+from benchmark_donation_pipeline import environment, run_script
+
+STEPS = [
+    ('combined_token', 'build_combined_token.py'),
+    ('price_index', 'closing_price_index.py'),
+    ('date_group_token', 'build_date_group_token.py'),
+    ('analyze_users', 'analyze_all_users.py'),
+    ('segment_users', 'segment_users.py'),
+    ('segment_positions', 'build_segment_positions_data.py'),
+    ('segment_aggregation', 'build_segment_aggregation_data.py'),
+]
+OUTPUTS = ['.price_index', 'combined_token_output', 'date_group_token_output', 'data_segment_output', 'data_segment',
+           'all_users_analysis.csv']
+
+def parse_scale(text):
+    """(events, markets per event, wallets, trades per market) from 'ExMxWxT'."""
+    try:
+        events, markets, wallets, trades = (int(part) for part in text.lower().split('x'))
+    except ValueError:
+        raise argparse.ArgumentTypeError(f"expected EVENTSxMARKETSxWALLETSxTRADES, got {text!r}")
+    return events, markets, wallets, trades
+
+def parse_args():
+    """Parse command line options."""
+    parser = argparse.ArgumentParser(description="Benchmark the trader pipeline on synthetic data.")
+    parser.add_argument('--scales', nargs='+', default=['2x3x300x3000', '4x4x600x5000'],
+                        help="EVENTSxMARKETSxWALLETSxTRADES per scale (default: 2x3x300x3000 4x4x600x5000)")
+    parser.add_argument('--workdir', type=Path, default=Path('.benchmark') / 'trades',
+                        help="directory for the generated data and step outputs (default: .benchmark/trades)")
+    parser.add_argument('--output', type=Path, default=Path('trade_benchmark_report.json'),
+                        help="JSON report to write (default: trade_benchmark_report.json)")
+    parser.add_argument('--seed', type=int, default=0, help="generator seed (default: 0)")
+    return parser.parse_args()
+
+def files_written_since(scale_dir, started):
+    """Output files created or rewritten since `started` (epoch seconds)."""
+    count = 0
+    for name in OUTPUTS:
+        path = scale_dir / name
+        if path.is_file():
+            count += path.stat().st_mtime >= started
+            continue
+        for folder, _, files in os.walk(path):
+            count += sum(os.stat(os.path.join(folder, file)).st_mtime >= started for file in files)
+    return count
+
+def prepare_input(scale_dir, scale, seed):
+    """Generate the data/ layout unless one with the same scale and seed exists."""
+    stamp_file = scale_dir / 'generated.json'
+    stamp = {'scale': list(scale), 'seed': seed}
+    if (scale_dir / 'data').exists() and stamp_file.exists() and json.loads(stamp_file.read_text()) == stamp:
+        print(f"  ✓ Reusing {scale_dir / 'data'}")
+        return None
+
+    shutil.rmtree(scale_dir / 'data', ignore_errors=True)
+    scale_dir.mkdir(parents=True, exist_ok=True)
+    events, markets, wallets, trades = scale
+    # A child process, so the generated frames never inflate this process's memory
+    result = run_script('generate_trade_data.py', scale_dir, scale_dir / 'generate.log',
+                        ['--events', str(events), '--markets', str(markets), '--wallets', str(wallets),
+                         '--trades', str(trades), '--seed', str(seed), '--output', 'data'])
+    if result['returncode'] != 0:
+        print(f"  ✗ Generating {scale_dir / 'data'} failed; see {result['log']}")
+        return False
+    stamp_file.write_text(json.dumps(stamp))
+    print(f"  ✓ Generated {scale_dir / 'data'} in {result['seconds']:.1f}s")
+    return result['seconds']
+
+def benchmark_scale(text, workdir, seed):
+    """Generate one scale and run every step on it."""
+    scale = parse_scale(text)
+    events, markets, wallets, trades = scale
+    trade_rows = events * markets * trades
+    scale_dir = workdir / text
+    print(f"\n[{text}] {events} events x {markets} markets, {wallets:,} wallets, {trade_rows:,} trades")
+    generate_seconds = prepare_input(scale_dir, scale, seed)
+    if generate_seconds is False:
+        return {'scale': text, 'trade_rows': trade_rows, 'steps': []}
+
+    # Start from empty outputs so every step does its full work
+    for name in OUTPUTS:
+        path = scale_dir / name
+        if path.is_dir():
+            shutil.rmtree(path)
+        elif path.exists():
+            path.unlink()
+
+    results = []
+    for name, script in STEPS:
+        started = time.time()
+        result = {'step': name, **run_script(script, scale_dir, scale_dir / f'{name}.log')}
+        result['files_written'] = files_written_since(scale_dir, started)
+        result['trade_rows_per_second'] = round(trade_rows / result['seconds']) if result['seconds'] else None
+        results.append(result)
+        status = '✓' if result['returncode'] == 0 else '✗'
+        print(f"  {status} {name:20s} {result['seconds']:8.2f}s  {result['peak_rss_mb']:8.1f} MB  "
+              f"{result['files_written']:8,} files  {result['trade_rows_per_second'] or 0:10,} rows/s")
+        if result['returncode'] != 0:
+            print(f"    see {result['log']}; skipping the remaining steps")
+            break
+
+    return {
+        'scale': text,
+        'events': events,
+        'markets': events * markets,
+        'wallets': wallets,
+        'trade_rows': trade_rows,
+        'generate_seconds': None if generate_seconds is None else round(generate_seconds, 3),
+        'total_seconds': round(sum(result['seconds'] for result in results), 3),
+        'steps': results,
+    }
+
+def main():
+    """Run the benchmark for every requested scale and write the report."""
+    args = parse_args()
+    print("="*80)
+    print("TRADER PIPELINE BENCHMARK")
+    print("="*80)
+
+    report = {
+        'created': datetime.now(timezone.utc).isoformat(timespec='seconds'),
+        'environment': environment(),
+        'runs': [benchmark_scale(text, args.workdir, args.seed) for text in args.scales],
+    }
+    args.output.write_text(json.dumps(report, indent=2) + '\n')
+    print(f"\n  ✓ Report written to {args.output}")
+
+    print(f"\n{'='*80}")
+    print("✓ Benchmark complete!")
+    print(f"{'='*80}")
+
+if __name__ == '__main__':
+    main()
@@ -1,44 +1,43 @@
 #!/usr/bin/env python3
 """
-Generate combined_token.csv files from trades data.
-Processes trades and calculates daily net tokens per user, market, and date.
+Generate the combined token store from trades data.
+Processes trades and calculates daily net tokens per user, market, and date,
+written as one dataset partitioned by event (see combined_token_store.py).
 """
 
+import argparse
 import pandas as pd
-import os
 from pathlib import Path
 from collections import defaultdict
+from combined_token_store import combined_token_path, write_event_tokens, write_user_files
+from hive_dataset import reset_dataset
+from sqlite_store import TableBatch
+from token_map import market_token_pairs, token_map_path, write_token_map
+from trade_normalization import day_labels, normalize_trades
+from data_schema import TRADE_DTYPES, TRADE_STAGE_COLUMNS, read_schema_csv
 
 def process_trades_file(trades_file, event_id):
-    """Process a single trades file and return aggregated data."""
+    """Process a single trades file and return its aggregated data and token map rows."""
     print(f"Processing {trades_file}...")
     
-    # Read trades file
-    df = pd.read_csv(trades_file)
+    # Read trades file (only the columns this step uses)
+    df = read_schema_csv(trades_file, TRADE_DTYPES, TRADE_STAGE_COLUMNS['combined_token'])
     
-    # Map columns
-    df['user_id'] = df['proxyWallet']
-    df['token_type'] = df['outcome'].map({'Yes': 'YES', 'No': 'NO'})
+    # Distinct asset/outcome pairs, recorded so later steps never re-read this file for them
+    tokens = market_token_pairs(df, event_id, Path(trades_file).stem.replace('_trades', ''))
     
-    # Convert timestamp to date
-    df['date'] = pd.to_datetime(df['timestamp'], unit='s').dt.date
+    # Wallet, YES/NO token type, signed net tokens (BUY +, SELL -) and UTC day number
+    df = normalize_trades(df)
     
     # Get market_slug from the filename or slug column
     market_slug = df['slug'].iloc[0] if 'slug' in df.columns else Path(trades_file).stem.replace('_trades', '')
     
-    # Calculate net tokens per day
-    # BUY increases position (positive), SELL decreases position (negative)
-    df['net_tokens'] = df.apply(
-        lambda row: row['size'] if row['side'] == 'BUY' else -row['size'],
-        axis=1
-    )
-    
-    # Group by user_id, date, and token_type
-    grouped = df.groupby(['user_id', 'date', 'token_type'])['net_tokens'].sum().reset_index()
+    # Group by user_id, day, and token_type
+    grouped = df.groupby(['user_id', 'epoch_day', 'token_type'])['net_tokens'].sum().reset_index()
     
     # Pivot to get yes_net_tokens and no_net_tokens
     pivoted = grouped.pivot_table(
-        index=['user_id', 'date'],
+        index=['user_id', 'epoch_day'],
         columns='token_type',
         values='net_tokens',
         fill_value=0
@@ -55,6 +54,9 @@ def process_trades_file(trades_file, event_id):
     else:
         pivoted['no_net_tokens'] = 0
     
+    # Dates are only formatted for the grouped rows
+    pivoted['date'] = day_labels(pivoted['epoch_day'])
+    
     # Add event_id and market_slug
     pivoted['event_id'] = event_id
     pivoted['market_slug'] = market_slug
@@ -62,22 +64,34 @@ def process_trades_file(trades_file, event_id):
     # Select and reorder columns
     result = pivoted[['user_id', 'event_id', 'market_slug', 'date', 'yes_net_tokens', 'no_net_tokens']].copy()
     
-    return result
+    return result, tokens
+
+def parse_args():
+    """Parse command line options."""
+    parser = argparse.ArgumentParser(description="Build the combined token store from trades files.")
+    parser.add_argument('--per-user-files', action='store_true',
+                        help="also write the old <event>/user_<wallet>/combined_token.csv files")
+    return parser.parse_args()
 
 def main():
     """Main function to process all trades files."""
+    args = parse_args()
+    
     print("="*80)
     print("BUILD COMBINED TOKEN - Step 0a")
     print("="*80)
     
     data_dir = Path('data')
-    output_dir = Path('combined_token_output')
+    store = combined_token_path(Path('combined_token_output'))
+    
+    # Per-market results of each event
+    event_data = defaultdict(list)
     
-    # Dictionary to store data per user per event
-    user_event_data = defaultdict(lambda: defaultdict(list))
+    # Asset/outcome pairs of each market
+    token_pairs = []
     
     # Collect all trades files first
-    print("\n[1/2] Scanning for trades files...")
+    print("\n[1/3] Scanning for trades files...")
     all_trades_files = []
     for event_dir in data_dir.iterdir():
         if not event_dir.is_dir():
@@ -97,49 +111,49 @@ def main():
     print(f"  ✓ Found {total_files} trades files to process")
     
     # Process all trades files
-    print(f"\n[2/2] Processing trades files...")
+    print(f"\n[2/3] Processing trades files...")
     for idx, (trades_file, event_id) in enumerate(all_trades_files, 1):
         if idx % 10 == 0 or idx == total_files:
             print(f"  Progress: {idx}/{total_files} files ({idx*100//total_files}%)")
         
         try:
-            result_df = process_trades_file(trades_file, event_id)
-            
-            # Group by user_id and append to user_event_data
-            for user_id, group in result_df.groupby('user_id'):
-                user_event_data[event_id][user_id].append(group)
+            result, tokens = process_trades_file(trades_file, event_id)
+            event_data[event_id].append(result)
+            token_pairs.append(tokens)
                 
         except Exception as e:
             print(f"  ✗ Error processing {trades_file.name}: {e}")
             continue
     
-    # Write output files per user per event
-    print(f"\n[3/3] Writing output files...")
-    total_users = sum(len(users) for users in user_event_data.values())
-    user_count = 0
-    
-    for event_id, user_data in user_event_data.items():
-        for user_id, dataframes in user_data.items():
-            user_count += 1
-            if user_count % 100 == 0 or user_count == total_users:
-                print(f"  Progress: {user_count}/{total_users} users ({user_count*100//total_users}%)")
-            
-            # Combine all dataframes for this user in this event
-            combined_df = pd.concat(dataframes, ignore_index=True)
-            
-            # Sort by market_slug, date
-            combined_df = combined_df.sort_values(['market_slug', 'date'])
-            
-            # Create output directory
-            user_output_dir = output_dir / event_id / f'user_{user_id}'
-            user_output_dir.mkdir(parents=True, exist_ok=True)
-            
-            # Write to file
-            output_file = user_output_dir / 'combined_token.csv'
-            combined_df.to_csv(output_file, index=False)
+    # One sorted partition per event instead of one file per user per event
+    print(f"\n[3/3] Writing combined token store...")
+    reset_dataset(store)
+    total_users = 0
+    user_files = 0
+    combined_tokens = TableBatch('combined_tokens')
+    
+    for event_id in sorted(event_data):
+        combined_df = pd.concat(event_data[event_id], ignore_index=True)
+        write_event_tokens(combined_df, store, event_id)
+        combined_tokens.add(combined_df)
+        if args.per_user_files:
+            user_files += write_user_files(combined_df, Path('combined_token_output'), event_id)
+        users = combined_df['user_id'].nunique()
+        total_users += users
+        print(f"  ✓ {event_id}: {len(combined_df):,} rows, {users:,} users")
+    
+    if args.per_user_files:
+        print(f"  ✓ Wrote {user_files:,} per-user combined_token.csv files")
+    
+    write_token_map(token_pairs, token_map_path(Path('combined_token_output')))
+    print(f"  ✓ Token map of {len(token_pairs)} markets written to {token_map_path(Path('combined_token_output'))}")
+    
+    db = combined_tokens.close()
+    if db is not None:
+        print(f"  ✓ Stored combined_tokens in {db}")
     
     print(f"\n{'='*80}")
-    print(f"✓ COMPLETED: Processed {total_files} trades files, created {total_users} user files")
+    print(f"✓ COMPLETED: Processed {total_files} trades files, {total_users} user/event pairs in {store}")
     print(f"{'='*80}\n")
 
 if __name__ == '__main__':
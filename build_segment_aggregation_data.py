@@ -9,6 +9,12 @@ import numpy as np
 import matplotlib.pyplot as plt
 from pathlib import Path
 from datetime import datetime
+from closing_price_index import (PRICE_FILE_SOURCES, build_closing_price_index, market_closing_prices,
+                                 offset_prices)
+from positions_store import positions_path, read_positions
+from sqlite_store import TableBatch
+from trade_normalization import epoch_day
+from data_schema import META_DTYPES, META_STAGE_COLUMNS, read_schema_csv
 
 def load_segment_mapping():
     """Load user segment mapping from all_users_analysis.csv."""
@@ -28,7 +34,7 @@ def load_market_closing_date(event_id, market_slug, data_dir):
     if not meta_file.exists():
         return None
     
-    meta_df = pd.read_csv(meta_file)
+    meta_df = read_schema_csv(meta_file, META_DTYPES, META_STAGE_COLUMNS['closing_date'])
     market_meta = meta_df[meta_df['market_slug'] == market_slug]
     
     if market_meta.empty:
@@ -39,95 +45,41 @@ def load_market_closing_date(event_id, market_slug, data_dir):
     
     return closing_date
 
-def load_price_odds(event_id, market_slug, data_dir):
-    """Load end-of-day YES prices and convert to day_offset."""
-    price_file = data_dir / event_id / 'prices' / f'{market_slug}_price.csv'
-    
-    if not price_file.exists():
+def load_price_odds(event_id, market_slug, data_dir, price_index):
+    """End-of-day YES prices by day_offset (up to the closing day) from the closing price index."""
+    closes = price_index.get((event_id, market_slug))
+    if closes is None:
         return None
     
-    # Load price file
-    price_df = pd.read_csv(price_file)
-    price_df['date'] = pd.to_datetime(price_df['timestamp'], unit='s').dt.date
-    
     # Get closing date
     closing_date = load_market_closing_date(event_id, market_slug, data_dir)
     if closing_date is None:
         return None
     
-    # Map token_id to token_type using trades
-    trades_file = data_dir / event_id / 'trades' / f'{market_slug}_trades.csv'
-    if not trades_file.exists():
-        return None
-    
-    trades_df = pd.read_csv(trades_file)
-    token_mapping = trades_df[['asset', 'outcome']].drop_duplicates()
-    token_mapping['token_type'] = token_mapping['outcome'].map({'Yes': 'YES', 'No': 'NO'})
-    
-    price_df = price_df.merge(
-        token_mapping[['asset', 'token_type']],
-        left_on='token_id',
-        right_on='asset',
-        how='left'
-    )
-    
-    # Filter YES tokens only
-    yes_prices = price_df[price_df['token_type'] == 'YES'].copy()
-    
-    # Get end-of-day price (last price per day by timestamp)
-    end_of_day_prices = yes_prices.sort_values('timestamp').groupby('date')['price'].last().reset_index()
-    
-    # Calculate day_offset
-    end_of_day_prices['day_offset'] = (end_of_day_prices['date'] - closing_date).apply(lambda x: x.days)
-    
     # Filter day_offset <= 0 (up to closing date)
-    end_of_day_prices = end_of_day_prices[end_of_day_prices['day_offset'] <= 0]
-    
-    return end_of_day_prices[['day_offset', 'price']].set_index('day_offset')['price'].to_dict()
+    yes_prices = offset_prices(closes, 'YES', epoch_day(closing_date))
+    return {day_offset: price for day_offset, price in yes_prices.items() if day_offset <= 0}
 
-def aggregate_segment_positions(positions_dir, segment_mapping, segment_filter=None):
-    """Aggregate positions for a specific segment."""
-    results = []
-    
-    # Process all user position files
-    for user_file in positions_dir.glob('user_*.csv'):
-        user_id = user_file.stem.replace('user_', '')
-        
-        # Check if user has segment mapping
-        if user_id not in segment_mapping:
-            continue
-        
-        user_segment = segment_mapping[user_id]
-        
-        # Filter by segment if specified
-        if segment_filter is not None and user_segment != segment_filter:
-            continue
-        
-        # Load user positions
-        df = pd.read_csv(user_file)
-        
-        # Filter users with non-zero cumulative positions
-        df = df[(df['yes_cumulative_position'] != 0) | (df['no_cumulative_position'] != 0)]
-        
-        if df.empty:
-            continue
-        
-        # Aggregate by day_offset
-        for day_offset, group in df.groupby('day_offset'):
-            # Sum individual positions only where corresponding cumulative position != 0
-            agg_yes = group[group['yes_cumulative_position'] != 0]['individual_yes_position'].sum()
-            agg_no = group[group['no_cumulative_position'] != 0]['individual_no_position'].sum()
-            
-            results.append({
-                'day_offset': day_offset,
-                'agg_yes': agg_yes,
-                'agg_no': agg_no,
-            })
-    
-    if not results:
+def aggregate_segment_positions(positions, segment_mapping, segment_filter=None):
+    """Aggregate one market's positions for a specific segment."""
+    # Only users with a segment mapping, filtered by segment if specified
+    if segment_filter is None:
+        df = positions[positions['user_id'].isin(segment_mapping.keys())]
+    else:
+        df = positions[positions['user_id'].map(segment_mapping) == segment_filter]
+    
+    # Filter users with non-zero cumulative positions
+    df = df[(df['yes_cumulative_position'] != 0) | (df['no_cumulative_position'] != 0)]
+    
+    if df.empty:
         return None
     
-    result_df = pd.DataFrame(results)
+    # Sum individual positions only where corresponding cumulative position != 0
+    result_df = pd.DataFrame({
+        'day_offset': df['day_offset'],
+        'agg_yes': df['individual_yes_position'].where(df['yes_cumulative_position'] != 0, 0.0),
+        'agg_no': df['individual_no_position'].where(df['no_cumulative_position'] != 0, 0.0),
+    })
     # Aggregate across all users for each day_offset
     result_df = result_df.groupby('day_offset').agg({
         'agg_yes': 'sum',
@@ -141,13 +93,12 @@ def aggregate_segment_positions(positions_dir, segment_mapping, segment_filter=N
     
     return result_df.sort_values('day_offset')
 
-def process_market(event_id, market_slug, data_dir, segment_mapping, market_num, total_markets):
-    """Process a single market and generate segment aggregations and graph."""
+def process_market(event_id, market_slug, data_dir, price_index, positions, segment_mapping, market_num,
+                   total_markets):
+    """Process a single market's positions and generate segment aggregations and graph."""
     print(f"  [{market_num}/{total_markets}] Processing {market_slug}...")
     
-    positions_dir = Path('data_segment_output') / event_id / market_slug
-    
-    if not positions_dir.exists():
+    if positions is None:
         print(f"  Warning: No positions data found for {market_slug}")
         return
     
@@ -156,13 +107,13 @@ def process_market(event_id, market_slug, data_dir, segment_mapping, market_num,
     output_dir.mkdir(parents=True, exist_ok=True)
     
     # Aggregate by segment
-    all_segments = aggregate_segment_positions(positions_dir, segment_mapping)
-    small_segment = aggregate_segment_positions(positions_dir, segment_mapping, 'Small')
-    medium_segment = aggregate_segment_positions(positions_dir, segment_mapping, 'Medium')
-    large_segment = aggregate_segment_positions(positions_dir, segment_mapping, 'Large')
+    all_segments = aggregate_segment_positions(positions, segment_mapping)
+    small_segment = aggregate_segment_positions(positions, segment_mapping, 'Small')
+    medium_segment = aggregate_segment_positions(positions, segment_mapping, 'Medium')
+    large_segment = aggregate_segment_positions(positions, segment_mapping, 'Large')
     
     # Load price odds
-    price_odds = load_price_odds(event_id, market_slug, data_dir)
+    price_odds = load_price_odds(event_id, market_slug, data_dir, price_index)
     
     # Save CSV files
     if all_segments is not None:
@@ -177,6 +128,13 @@ def process_market(event_id, market_slug, data_dir, segment_mapping, market_num,
     if large_segment is not None:
         large_segment.to_csv(output_dir / 'large_segment.csv', index=False)
     
+    # Same four tables in the SQLite store, replacing this market's rows
+    with TableBatch('segment_odds', scope={'event_id': event_id, 'market_slug': market_slug}) as odds:
+        for segment, table in [('all', all_segments), ('small', small_segment),
+                               ('medium', medium_segment), ('large', large_segment)]:
+            if table is not None:
+                odds.add(table, event_id=event_id, market_slug=market_slug, segment=segment)
+    
     # Create comparison graph
     plt.figure(figsize=(12, 8))
     
@@ -253,11 +211,22 @@ def main():
     total_markets = len(all_markets)
     print(f"  ✓ Found {total_markets} markets to process")
     
+    # Every market's positions in one read
+    store = positions_path(Path('data_segment_output'))
+    if not store.exists():
+        print(f"✗ Error: {store} not found. Run build_segment_positions_data.py first.")
+        return
+    positions = dict(list(read_positions(store).groupby(['event_id', 'market_slug'], sort=False)))
+    print(f"  ✓ Loaded positions for {len(positions)} markets from {store}")
+    # Prices derived from <market>_price.csv only, as this step always used
+    price_index = market_closing_prices(build_closing_price_index(data_dir), PRICE_FILE_SOURCES)
+    
     # Process all markets
     print(f"\n[3/3] Processing markets and generating graphs...")
     for market_num, (event_id, market_slug) in enumerate(all_markets, 1):
         try:
-            process_market(event_id, market_slug, data_dir, segment_mapping, market_num, total_markets)
+            process_market(event_id, market_slug, data_dir, price_index, positions.get((event_id, market_slug)),
+                           segment_mapping, market_num, total_markets)
         except Exception as e:
             print(f"  ✗ Error processing {market_slug}: {e}")
             continue
@@ -1,13 +1,21 @@
 #!/usr/bin/env python3
 """
 Build segment positions data from trades.
-Step 1: Process trades and create per-user position files with day_offset.
+Step 1: Process trades and write every user's positions with day_offset to
+one dataset partitioned by market (see positions_store.py).
 """
 
 import pandas as pd
 import numpy as np
 from pathlib import Path
 from datetime import datetime
+from closing_price_index import (PRICE_FILE_SOURCES, build_closing_price_index, market_closing_prices,
+                                 offset_prices)
+from hive_dataset import reset_dataset
+from positions_store import POSITION_COLUMNS, positions_path, write_market_positions
+from sqlite_store import TableBatch
+from trade_normalization import epoch_day, normalize_trades
+from data_schema import META_DTYPES, META_STAGE_COLUMNS, TRADE_DTYPES, TRADE_STAGE_COLUMNS, read_schema_csv
 
 def load_market_closing_date(event_id, market_slug, data_dir):
     """Load closing date from meta file."""
@@ -16,7 +24,7 @@ def load_market_closing_date(event_id, market_slug, data_dir):
     if not meta_file.exists():
         return None
     
-    meta_df = pd.read_csv(meta_file)
+    meta_df = read_schema_csv(meta_file, META_DTYPES, META_STAGE_COLUMNS['closing_date'])
     market_meta = meta_df[meta_df['market_slug'] == market_slug]
     
     if market_meta.empty:
@@ -27,19 +35,13 @@ def load_market_closing_date(event_id, market_slug, data_dir):
     
     return closing_date
 
-def process_market_trades(trades_file, event_id, market_slug, data_dir, market_num, total_markets):
-    """Process trades for a single market and generate user position files."""
+def process_market_trades(trades_file, event_id, market_slug, data_dir, price_index, store, market_num,
+                          total_markets):
+    """Process trades for a single market and write its users' positions to the dataset."""
     print(f"  [{market_num}/{total_markets}] Processing {market_slug}...")
     
     # Load trades
-    df = pd.read_csv(trades_file)
-    
-    # Map columns
-    df['user_id'] = df['proxyWallet']
-    df['token_type'] = df['outcome'].map({'Yes': 'YES', 'No': 'NO'})
-    
-    # Convert timestamp to date
-    df['date'] = pd.to_datetime(df['timestamp'], unit='s').dt.date
+    df = read_schema_csv(trades_file, TRADE_DTYPES, TRADE_STAGE_COLUMNS['positions'])
     
     # Get closing date
     closing_date = load_market_closing_date(event_id, market_slug, data_dir)
@@ -47,14 +49,8 @@ def process_market_trades(trades_file, event_id, market_slug, data_dir, market_n
         print(f"  Warning: Could not find closing date for {market_slug}, skipping...")
         return
     
-    # Calculate day_offset
-    df['day_offset'] = (df['date'] - closing_date).apply(lambda x: x.days)
-    
-    # Calculate net tokens per trade
-    df['net_tokens'] = df.apply(
-        lambda row: row['size'] if row['side'] == 'BUY' else -row['size'],
-        axis=1
-    )
+    # Wallet, YES/NO token type, signed net tokens and day_offset from the closing day
+    df = normalize_trades(df, closing_date)
     
     # Group by user_id, day_offset, and token_type
     grouped = df.groupby(['user_id', 'day_offset', 'token_type'])['net_tokens'].sum().reset_index()
@@ -78,82 +74,47 @@ def process_market_trades(trades_file, event_id, market_slug, data_dir, market_n
     else:
         pivoted['no_net_tokens'] = 0
     
-    # Process each user
-    output_dir = Path('data_segment_output') / event_id / market_slug
-    output_dir.mkdir(parents=True, exist_ok=True)
+    # Cumulative positions per user, in day_offset order
+    pivoted = pivoted.sort_values(['user_id', 'day_offset'])
+    by_user = pivoted.groupby('user_id', sort=False)
+    pivoted['yes_cumulative_position'] = by_user['yes_net_tokens'].cumsum()
+    pivoted['no_cumulative_position'] = by_user['no_net_tokens'].cumsum()
     
-    unique_users = pivoted['user_id'].unique()
-    total_users = len(unique_users)
+    # Calculate individual positions
+    # H_y = yes_cumulative_position, H_n = no_cumulative_position
+    H_y = pivoted['yes_cumulative_position']
+    H_n = pivoted['no_cumulative_position']
     
-    for user_idx, (user_id, user_data) in enumerate(pivoted.groupby('user_id'), 1):
-        # Sort by day_offset (ascending, from earliest to latest)
-        user_data = user_data.sort_values('day_offset').copy()
-        
-        # Calculate cumulative positions
-        user_data['yes_cumulative_position'] = user_data['yes_net_tokens'].cumsum()
-        user_data['no_cumulative_position'] = user_data['no_net_tokens'].cumsum()
-        
-        # Calculate individual positions
-        # H_y = yes_cumulative_position, H_n = no_cumulative_position
-        H_y = user_data['yes_cumulative_position']
-        H_n = user_data['no_cumulative_position']
-        
-        user_data['individual_yes_position'] = (
-            (H_y * (H_y > 0)) + (-H_n * (H_n < 0))
-        )
-        user_data['individual_no_position'] = (
-            (H_n * (H_n > 0)) + (-H_y * (H_y < 0))
-        )
-        
-        # Try to load prices (optional)
-        price_file = data_dir / event_id / 'prices' / f'{market_slug}_price.csv'
-        yes_prices = {}
-        no_prices = {}
-        
-        if price_file.exists():
-            try:
-                price_df = pd.read_csv(price_file)
-                price_df['date'] = pd.to_datetime(price_df['timestamp'], unit='s').dt.date
-                
-                # Map token_id to token_type using trades
-                token_mapping = df[['asset', 'outcome']].drop_duplicates()
-                token_mapping['token_type'] = token_mapping['outcome'].map({'Yes': 'YES', 'No': 'NO'})
-                
-                price_df = price_df.merge(
-                    token_mapping[['asset', 'token_type']],
-                    left_on='token_id',
-                    right_on='asset',
-                    how='left'
-                )
-                
-                # Get end-of-day prices per date
-                for date, group in price_df.groupby('date'):
-                    day_offset = (date - closing_date).days
-                    yes_price = group[group['token_type'] == 'YES']['price'].iloc[-1] if len(group[group['token_type'] == 'YES']) > 0 else None
-                    no_price = group[group['token_type'] == 'NO']['price'].iloc[-1] if len(group[group['token_type'] == 'NO']) > 0 else None
-                    
-                    if yes_price is not None:
-                        yes_prices[day_offset] = yes_price
-                    if no_price is not None:
-                        no_prices[day_offset] = no_price
-            except Exception as e:
-                print(f"  Warning: Could not load prices: {e}")
-        
-        # Add prices to user data
-        user_data['yes_price'] = user_data['day_offset'].map(yes_prices)
-        user_data['no_price'] = user_data['day_offset'].map(no_prices)
-        
-        # Select and reorder columns
-        output_df = user_data[[
-            'user_id', 'day_offset', 'yes_cumulative_position', 'no_cumulative_position',
-            'individual_yes_position', 'individual_no_position', 'yes_price', 'no_price'
-        ]].copy()
-        
-        # Write to file
-        output_file = output_dir / f'user_{user_id}.csv'
-        output_df.to_csv(output_file, index=False)
+    pivoted['individual_yes_position'] = (
+        (H_y * (H_y > 0)) + (-H_n * (H_n < 0))
+    )
+    pivoted['individual_no_position'] = (
+        (H_n * (H_n > 0)) + (-H_y * (H_y < 0))
+    )
+    
+    # End-of-day prices from the closing price index (optional)
+    closes = price_index.get((event_id, market_slug))
+    yes_prices = {}
+    no_prices = {}
+    
+    if closes is not None:
+        closing_day = epoch_day(closing_date)
+        yes_prices = offset_prices(closes, 'YES', closing_day)
+        no_prices = offset_prices(closes, 'NO', closing_day)
+    
+    # Add prices to user data
+    pivoted['yes_price'] = pivoted['day_offset'].map(yes_prices)
+    pivoted['no_price'] = pivoted['day_offset'].map(no_prices)
+    
+    # One partition per market instead of one file per user
+    output_df = pivoted[POSITION_COLUMNS]
+    write_market_positions(output_df, store, event_id, market_slug)
+    
+    # One transaction per market replaces that market's rows in the SQLite store
+    with TableBatch('user_positions', scope={'event_id': event_id, 'market_slug': market_slug}) as positions:
+        positions.add(output_df, event_id=event_id, market_slug=market_slug)
     
-    print(f"    ✓ Created {total_users} user position files")
+    print(f"    ✓ Wrote {len(output_df):,} position rows for {output_df['user_id'].nunique():,} users")
 
 def main():
     """Main function to process all markets."""
@@ -189,15 +150,20 @@ def main():
     
     # Process all trades files
     print(f"\n[2/2] Processing markets...")
+    # Prices derived from <market>_price.csv only, as this step always used
+    price_index = market_closing_prices(build_closing_price_index(data_dir), PRICE_FILE_SOURCES)
+    store = positions_path(Path('data_segment_output'))
+    reset_dataset(store)
     for market_num, (trades_file, event_id, market_slug) in enumerate(all_markets, 1):
         try:
-            process_market_trades(trades_file, event_id, market_slug, data_dir, market_num, total_markets)
+            process_market_trades(trades_file, event_id, market_slug, data_dir, price_index, store, market_num,
+                                  total_markets)
         except Exception as e:
             print(f"  ✗ Error processing {market_slug}: {e}")
             continue
     
     print(f"\n{'='*80}")
-    print(f"✓ COMPLETED: Processed {total_markets} markets")
+    print(f"✓ COMPLETED: Processed {total_markets} markets into {store}")
     print(f"{'='*80}\n")
 
 if __name__ == '__main__':
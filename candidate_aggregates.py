@@ -0,0 +1,101 @@
+#!/usr/bin/env python3
+"""
+Per-candidate cumulative donation totals and head-to-head ratios.
+One grouped scan reduces the donation file to daily (Day, Donor_Segment,
+Candidate) partials for every candidate at once; weekly/monthly rollups,
+cumulative sums and race ratios are then computed on that small table, so
+the cost barely depends on how many races are requested.
+
+Races come from a CSV with Race and Candidate columns (one row per
+candidate in a race). Without one, every candidate is compared against all
+others in a single race named 'All'.
+"""
+
+import numpy as np
+import pandas as pd
+from data_schema import DONATION_STAGE_COLUMNS
+from donation_aggregates import SEGMENTS, _merge_sums
+from donation_cache import iter_donation_chunks
+from donation_dates import decode_received_days
+from donor_dictionary import SEGMENT_LABELS
+from period_rollup import FREQUENCIES, rollup
+
+CANDIDATE_COLUMNS = DONATION_STAGE_COLUMNS['candidate_ratios']
+SEGMENT_ORDER = ['All'] + SEGMENTS
+ALL_RACE = 'All'
+
+def load_races(race_file):
+    """Read a Race,Candidate CSV into a race table."""
+    races = pd.read_csv(race_file, usecols=['Race', 'Candidate'], dtype=str).dropna()
+    return races.drop_duplicates().reset_index(drop=True)
+
+def candidate_daily_partials(donation_file, segment_codes, candidates=None, chunksize=1_000_000):
+    """
+    Daily (sum, count) partials of positive, dated donations from segmented
+    donors, keyed by (Day, Donor_Segment, Candidate), in one pass over the
+    cache. `candidates` optionally restricts the scan to those names.
+    """
+    daily = None
+    for chunk in iter_donation_chunks(donation_file, columns=CANDIDATE_COLUMNS, chunksize=chunksize):
+        if candidates is not None:
+            chunk = chunk[chunk['Candidate'].isin(candidates)]
+        days = decode_received_days(chunk['Received'])
+        amounts = chunk['Donation_Amount_USD'].to_numpy(dtype='float64', na_value=np.nan)
+        ids = chunk['Donor_ID'].to_numpy()
+        codes = np.full(len(ids), -1, dtype='int8')
+        known = (ids >= 0) & (ids < len(segment_codes))
+        codes[known] = segment_codes[ids[known]]
+
+        kept = ~np.isnat(days) & (amounts > 0) & (codes >= 0) & chunk['Candidate'].notna().to_numpy()
+        if not kept.any():
+            continue
+        rows = pd.DataFrame({'sum': amounts[kept], 'count': 1})
+        partial = rows.groupby([days[kept].astype('int64'),
+                                pd.Categorical.from_codes(codes[kept], categories=SEGMENT_LABELS),
+                                chunk['Candidate'].astype(str).to_numpy()[kept]], observed=True).sum()
+        daily = _merge_sums(daily, partial)
+
+    if daily is not None:
+        daily.index.names = ['Day', 'Donor_Segment', 'Candidate']
+    return daily
+
+def candidate_cumulative(daily, frequency, races=None):
+    """
+    Long-format cumulative totals and race ratios for one frequency:
+    Frequency, Period, Race, Segment, Candidate, Donation, Cumulative_Donation,
+    Race_Cumulative_Total and Ratio (candidate share of the race so far).
+    """
+    period_col = FREQUENCIES[frequency][0]
+    sums = rollup(daily, frequency)['sum']
+    sums.index.names = [period_col, 'Segment', 'Candidate']
+    rollup_all = sums.groupby(level=[period_col, 'Candidate']).sum()
+
+    # period x (Segment, Candidate) cube: every candidate accumulates in one cumsum
+    cube = pd.concat([
+        pd.concat({'All': rollup_all}, names=['Segment']).reorder_levels([period_col, 'Segment', 'Candidate']),
+        sums.rename(index=str, level='Segment'),
+    ]).unstack(['Segment', 'Candidate']).fillna(0)
+    long = pd.DataFrame({
+        'Donation': cube.stack(['Segment', 'Candidate']),
+        'Cumulative_Donation': cube.cumsum().stack(['Segment', 'Candidate']),
+    }).reset_index().rename(columns={period_col: 'Period'})
+
+    if races is None:
+        races = pd.DataFrame({'Race': ALL_RACE, 'Candidate': long['Candidate'].unique()})
+    long = long.merge(races, on='Candidate')
+    total = long.groupby(['Period', 'Segment', 'Race'])['Cumulative_Donation'].transform('sum')
+    long['Race_Cumulative_Total'] = total
+    long['Ratio'] = long['Cumulative_Donation'] / total.where(total > 0)
+
+    # A race only gets rows once donations to it have started
+    long = long[long['Race_Cumulative_Total'] > 0].copy()
+    long['Frequency'] = frequency
+    long['Segment'] = pd.Categorical(long['Segment'], categories=SEGMENT_ORDER)
+    long = long.sort_values(['Race', 'Segment', 'Candidate', 'Period'])
+    return long[['Frequency', 'Period', 'Race', 'Segment', 'Candidate', 'Donation',
+                 'Cumulative_Donation', 'Race_Cumulative_Total', 'Ratio']].reset_index(drop=True)
+
+def candidate_ratio_table(daily, races=None, frequencies=('weekly', 'monthly')):
+    """All requested frequencies stacked into one long-format table."""
+    return pd.concat([candidate_cumulative(daily, frequency, races) for frequency in frequencies],
+                     ignore_index=True)
@@ -0,0 +1,192 @@
+#!/usr/bin/env python3
+"""
+Candidate index for the donation file.
+Builds, once per source file, a copy of the Parquet cache with the rows
+grouped by Candidate (original order kept within each candidate) in small
+row groups, plus a candidate -> (first row, row count) map. Filtering on a
+list of candidates then reads only the row groups holding their rows, so the
+cost follows the number of matches rather than the size of the file.
+
+Rows are first spread over hash buckets by candidate so the grouping step
+only ever holds one bucket in memory.
+"""
+
+import json
+import shutil
+import sys
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+from data_schema import DONATION_DTYPES, arrow_to_pandas, categorical_columns
+from donation_cache import CACHE_DIR_NAME, build_cache, cached_columns, source_fingerprint
+
+try:
+    import pyarrow as pa
+    import pyarrow.compute as pc
+    import pyarrow.parquet as pq
+except ImportError:
+    pa = None
+    pc = None
+    pq = None
+
+INDEX_VERSION = 2
+INDEX_BUCKETS = 64
+INDEX_ROW_GROUP_SIZE = 16_384
+SCAN_CHUNK_SIZE = 1_000_000
+
+# Position of each row in the source file, used to restore file order
+ROW_COLUMN = '_Row'
+
+def candidate_index_paths(donation_file):
+    """Return (grouped_parquet_file, index_file) for a donation file."""
+    donation_file = Path(donation_file)
+    cache_dir = donation_file.parent / CACHE_DIR_NAME
+    return (cache_dir / f'{donation_file.stem}.by_candidate.parquet',
+            cache_dir / f'{donation_file.stem}.by_candidate.json')
+
+def _index_stamp(donation_file):
+    """Source fingerprint plus the index version."""
+    return {**source_fingerprint(donation_file), 'index_version': INDEX_VERSION}
+
+def _candidate_buckets(candidates):
+    """Stable hash bucket per candidate name."""
+    names = candidates.to_numpy(dtype=object, na_value='')
+    return (pd.util.hash_array(names) % INDEX_BUCKETS).astype('int64')
+
+def build_candidate_index(donation_file):
+    """
+    Write the candidate-grouped Parquet copy and return the candidate map
+    {candidate: [first_row, row_count]}. Rows without a candidate are left out.
+    """
+    parquet_file = build_cache(donation_file)
+    grouped_file, _ = candidate_index_paths(donation_file)
+    bucket_dir = grouped_file.parent / f'.{grouped_file.stem}_buckets'
+    shutil.rmtree(bucket_dir, ignore_errors=True)
+    bucket_dir.mkdir(parents=True)
+
+    # Pass 1: spread rows over candidate hash buckets, in file order
+    writers = {}
+    first_row = 0
+    try:
+        for batch in pq.ParquetFile(parquet_file).iter_batches(batch_size=SCAN_CHUNK_SIZE):
+            table = pa.Table.from_batches([batch])
+            table = table.append_column(ROW_COLUMN, pa.array(
+                np.arange(first_row, first_row + len(table), dtype='int64')))
+            first_row += len(table)
+            buckets = _candidate_buckets(table['Candidate'].to_pandas())
+            order = np.argsort(buckets, kind='stable')
+            bounds = np.searchsorted(buckets[order], np.arange(INDEX_BUCKETS + 1))
+            for bucket in range(INDEX_BUCKETS):
+                if bounds[bucket] == bounds[bucket + 1]:
+                    continue
+                if bucket not in writers:
+                    writers[bucket] = pq.ParquetWriter(bucket_dir / f'bucket-{bucket:03d}.parquet', table.schema)
+                writers[bucket].write_table(table.take(order[bounds[bucket]:bounds[bucket + 1]]))
+    finally:
+        for writer in writers.values():
+            writer.close()
+
+    # Pass 2: group each bucket by candidate and append it to the indexed file
+    candidates = {}
+    writer = None
+    position = 0
+    tmp_file = grouped_file.with_suffix('.parquet.tmp')
+    try:
+        for bucket_file in sorted(bucket_dir.glob('bucket-*.parquet')):
+            table = pq.read_table(bucket_file)
+            names = table['Candidate'].to_pandas()
+            table = table.filter(pa.array(names.notna().to_numpy()))
+            names = names.dropna().to_numpy(dtype=object)
+            order = np.argsort(names, kind='stable')
+            names = names[order]
+            unique_names, starts, counts = np.unique(names, return_index=True, return_counts=True)
+            for name, start, count in zip(unique_names, starts, counts):
+                candidates[name] = [int(position + start), int(count)]
+            if writer is None:
+                writer = pq.ParquetWriter(tmp_file, table.schema, compression='zstd')
+            writer.write_table(table.take(order), row_group_size=INDEX_ROW_GROUP_SIZE)
+            position += len(table)
+    finally:
+        if writer is not None:
+            writer.close()
+    shutil.rmtree(bucket_dir, ignore_errors=True)
+
+    if writer is not None:
+        tmp_file.replace(grouped_file)
+    return candidates
+
+def load_candidate_index(donation_file, force=False):
+    """Load the candidate map, rebuilding the index when the donation file changed."""
+    grouped_file, index_file = candidate_index_paths(donation_file)
+    stamp = _index_stamp(donation_file)
+    if not force and grouped_file.exists() and index_file.exists():
+        try:
+            with open(index_file) as f:
+                index = json.load(f)
+            if index['stamp'] == stamp:
+                return index['candidates']
+        except (OSError, ValueError, KeyError):
+            pass
+
+    print(f"  Building candidate index for {Path(donation_file).name} (one-time)...")
+    candidates = build_candidate_index(donation_file)
+    with open(index_file, 'w') as f:
+        json.dump({'stamp': stamp, 'candidates': candidates}, f, indent=2)
+    print(f"  ✓ Indexed {len(candidates):,} candidates")
+    return candidates
+
+def read_candidates(donation_file, candidates, columns=None):
+    """
+    Load the rows of the given candidates in original file order, reading
+    only the row groups of the candidate-grouped copy that hold them.
+    """
+    index = load_candidate_index(donation_file)
+    grouped_file, _ = candidate_index_paths(donation_file)
+    ranges = [index[name] for name in dict.fromkeys(candidates) if name in index]
+    columns = cached_columns(build_cache(donation_file), columns)
+
+    if not ranges:
+        empty = arrow_to_pandas(pq.ParquetFile(build_cache(donation_file)).schema_arrow.empty_table(), DONATION_DTYPES)
+        return empty[columns]
+
+    parquet = pq.ParquetFile(grouped_file, read_dictionary=categorical_columns(DONATION_DTYPES, columns))
+    read_columns = columns + [ROW_COLUMN]
+
+    # Global row positions of the matches and the row groups that hold them
+    metadata = parquet.metadata
+    group_starts = np.cumsum([0] + [metadata.row_group(i).num_rows for i in range(metadata.num_row_groups)])
+    positions = np.concatenate([np.arange(start, start + count) for start, count in ranges])
+    position_groups = np.searchsorted(group_starts, positions, side='right') - 1
+    groups = np.unique(position_groups)
+
+    table = parquet.read_row_groups(groups.tolist(), columns=read_columns)
+    # Offset of each read group inside the concatenated table
+    group_offsets = np.cumsum([0] + [metadata.row_group(i).num_rows for i in groups[:-1]])
+    local = positions - group_starts[position_groups] + group_offsets[np.searchsorted(groups, position_groups)]
+    table = table.take(local)
+    table = table.take(pc.sort_indices(table[ROW_COLUMN]))
+    return arrow_to_pandas(table.drop_columns([ROW_COLUMN]), DONATION_DTYPES)
+
+def main():
+    """Build (or refresh) the candidate index and list the indexed candidates."""
+    print("="*80)
+    print("BUILD CANDIDATE INDEX")
+    print("="*80)
+
+    donation_file = Path(sys.argv[1]) if len(sys.argv) > 1 else Path('US_Election_Donation.csv')
+    if not donation_file.exists():
+        print(f"✗ Error: {donation_file} not found")
+        return
+    if pq is None:
+        print("✗ Error: pyarrow is not installed; filter_candidates.py will scan the CSV")
+        return
+
+    candidates = load_candidate_index(donation_file)
+    largest = sorted(candidates.items(), key=lambda item: -item[1][1])[:10]
+    print(f"\nLargest candidates:")
+    for name, (_, count) in largest:
+        print(f"  {name}: {count:,} rows")
+
+if __name__ == '__main__':
+    main()
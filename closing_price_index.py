@@ -0,0 +1,207 @@
+#!/usr/bin/env python3
+"""
+Closing-price index shared by the trader steps.
+Derives the end-of-day YES/NO price of every market once and keeps it as a
+compact table of (event_id, market_slug, source, token_type, epoch_day) -> price
+in .price_index/. Token ids are mapped to YES/NO with the token map that
+build_combined_token.py emits (see token_map.py). Each source of a market
+(<market>_price.csv plus the market's token map pairs, or a precomputed
+<market>_closing_prices.csv) is stamped with its fingerprint, so a run only
+re-derives the sources whose inputs changed.
+
+build_date_group_token.py, build_segment_positions_data.py and
+build_segment_aggregation_data.py read the table instead of re-reading the
+price and trades files themselves. Each keeps the price source it used before:
+the date group step prefers <market>_closing_prices.csv, while the positions
+and aggregation steps only derive prices from <market>_price.csv.
+"""
+
+import json
+import sys
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+from data_schema import CLOSING_PRICE_DTYPES, PRICE_DTYPES, PRICE_STAGE_COLUMNS, read_schema_csv
+from donation_cache import source_fingerprint
+from token_map import market_token_types, read_token_map
+from trade_normalization import epoch_days
+
+try:
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+except ImportError:
+    pa = None
+    pq = None
+
+INDEX_DIR_NAME = '.price_index'
+INDEX_COLUMNS = ['event_id', 'market_slug', 'source', 'token_type', 'epoch_day', 'price']
+
+# Price files a market can have, by source name
+PRICE_SOURCES = {'closing_prices': '_closing_prices.csv', 'price': '_price.csv'}
+
+# Sources each consumer reads, in order of preference
+DATE_GROUP_SOURCES = ('closing_prices', 'price')
+PRICE_FILE_SOURCES = ('price',)
+
+# Bumped whenever the derivation changes, so old indexes are rebuilt
+INDEX_FORMAT_VERSION = 3
+
+def index_paths(index_dir=INDEX_DIR_NAME):
+    """Return (table_file, manifest_file); the table is CSV when pyarrow is missing."""
+    index_dir = Path(index_dir)
+    table_file = index_dir / ('closing_prices.parquet' if pq is not None else 'closing_prices.csv')
+    return table_file, index_dir / 'manifest.json'
+
+def market_price_files(data_dir, event_id, market_slug):
+    """{source: price file} of the price files a market has."""
+    prices_dir = Path(data_dir) / event_id / 'prices'
+    files = {source: prices_dir / f'{market_slug}{suffix}' for source, suffix in PRICE_SOURCES.items()}
+    return {source: price_file for source, price_file in files.items() if price_file.exists()}
+
+def find_markets(data_dir):
+    """(event_id, market_slug) of every market with price data, in sorted order."""
+    markets = set()
+    for prices_dir in Path(data_dir).glob('*/prices'):
+        for suffix in PRICE_SOURCES.values():
+            for price_file in prices_dir.glob(f'*{suffix}'):
+                markets.add((prices_dir.parent.name, price_file.name[:-len(suffix)]))
+    return sorted(markets)
+
+def derive_closing_prices(price_file, token_types):
+    """Last price of each UTC day per token type, as (token_type, epoch_day, price) rows."""
+    if price_file.name.endswith('_closing_prices.csv'):
+        closing_prices = read_schema_csv(price_file, CLOSING_PRICE_DTYPES)
+        closing_prices['epoch_day'] = (pd.to_datetime(closing_prices['date']).to_numpy(dtype='datetime64[D]')
+                                       .astype('int64').astype('int32'))
+        return closing_prices[['token_type', 'epoch_day', 'price']]
+
+    # Map token_id to token_type with the market's asset/outcome pairs
+    price_df = read_schema_csv(price_file, PRICE_DTYPES, PRICE_STAGE_COLUMNS['closing_prices'])
+    price_df = price_df.dropna(subset=['timestamp'])
+    price_df['token_type'] = price_df['token_id'].map(token_types)
+    price_df['epoch_day'] = epoch_days(price_df['timestamp'])
+
+    # End-of-day price: the last price of the day by timestamp
+    price_df = price_df.dropna(subset=['token_type']).sort_values('timestamp', kind='stable')
+    return price_df.groupby(['token_type', 'epoch_day'])['price'].last().reset_index()
+
+def _index_dtypes(table):
+    """Plain string keys, int32 days and float64 prices."""
+    return table.astype({'event_id': str, 'market_slug': str, 'source': str, 'token_type': str,
+                         'epoch_day': 'int32', 'price': 'float64'})
+
+def _read_index(table_file, manifest_file):
+    """Stored table and manifest, or an empty pair when missing, unreadable or outdated."""
+    empty = pd.DataFrame(columns=INDEX_COLUMNS), {}
+    if not table_file.exists() or not manifest_file.exists():
+        return empty
+    try:
+        with open(manifest_file) as f:
+            manifest = json.load(f)
+        if manifest.get('format_version') != INDEX_FORMAT_VERSION:
+            return empty
+        if table_file.suffix == '.parquet':
+            table = pq.read_table(table_file).to_pandas()
+        else:
+            table = pd.read_csv(table_file, dtype={'event_id': str, 'market_slug': str, 'source': str,
+                                                   'token_type': str})
+    except (OSError, ValueError):
+        return empty
+    return table, manifest.get('markets', {})
+
+def _write_index(table, markets, table_file, manifest_file):
+    """Write the table, then the manifest that marks it complete."""
+    table_file.parent.mkdir(parents=True, exist_ok=True)
+    tmp_file = table_file.with_suffix(table_file.suffix + '.tmp')
+    if table_file.suffix == '.parquet':
+        arrow_table = pa.Table.from_pandas(table, preserve_index=False)
+        for name in ['event_id', 'market_slug', 'source', 'token_type']:
+            arrow_table = arrow_table.set_column(arrow_table.schema.get_field_index(name), name,
+                                                 arrow_table[name].cast(pa.dictionary(pa.int32(), pa.string())))
+        pq.write_table(arrow_table, tmp_file)
+    else:
+        table.to_csv(tmp_file, index=False)
+    tmp_file.replace(table_file)
+    with open(manifest_file, 'w') as f:
+        json.dump({'format_version': INDEX_FORMAT_VERSION, 'markets': markets}, f, indent=2)
+
+def build_closing_price_index(data_dir=Path('data'), index_dir=INDEX_DIR_NAME, verbose=True):
+    """
+    Bring the index up to date with data_dir and return it. Only market price
+    sources whose fingerprints changed (or that are new) are re-derived.
+    """
+    table_file, manifest_file = index_paths(index_dir)
+    table, stored = _read_index(table_file, manifest_file)
+    token_map = read_token_map()
+
+    markets = {}
+    rebuilt = []
+    for event_id, market_slug in find_markets(data_dir):
+        for source, price_file in market_price_files(data_dir, event_id, market_slug).items():
+            key = f'{event_id}/{market_slug}/{source}'
+            markets[key] = {price_file.name: source_fingerprint(price_file)}
+            token_types = None
+            if source == 'price':
+                token_types = market_token_types(token_map, data_dir, event_id, market_slug)
+                if token_types is None:
+                    del markets[key]
+                    continue
+                markets[key]['token_map'] = sorted([asset, token_type] for asset, token_type in token_types.items()
+                                                   if isinstance(token_type, str))
+            if stored.get(key) == markets[key]:
+                continue
+            try:
+                closes = derive_closing_prices(price_file, token_types)
+            except Exception as e:
+                print(f"  ✗ Error indexing prices of {market_slug}: {e}")
+                del markets[key]
+                continue
+            rebuilt.append(closes.assign(event_id=event_id, market_slug=market_slug, source=source)[INDEX_COLUMNS])
+
+    if rebuilt or set(markets) != set(stored):
+        # Keep unchanged sources, replace rebuilt ones and drop sources that went away
+        keys = (table['event_id'].astype(str) + '/' + table['market_slug'].astype(str) + '/'
+                + table['source'].astype(str))
+        kept = table[keys.isin([key for key in markets if stored.get(key) == markets[key]])]
+        table = _index_dtypes(pd.concat([_index_dtypes(kept)] + rebuilt, ignore_index=True))
+        _write_index(table, markets, table_file, manifest_file)
+
+    if verbose:
+        print(f"  ✓ Closing price index: {len(markets)} price sources ({len(rebuilt)} re-derived) in {table_file}")
+    return _index_dtypes(table)
+
+def market_closing_prices(index, sources=DATE_GROUP_SOURCES):
+    """
+    Index rows split per market: {(event_id, market_slug): rows}, taken from
+    the first of `sources` that each market has.
+    """
+    rows = index[index['source'].isin(sources)]
+    rank = rows['source'].map({source: i for i, source in enumerate(sources)})
+    best = rank.groupby([rows['event_id'], rows['market_slug']], sort=False).transform('min')
+    rows = rows[rank == best].drop(columns='source')
+    return {key: market_rows.reset_index(drop=True)
+            for key, market_rows in rows.groupby(['event_id', 'market_slug'], sort=False)}
+
+def offset_prices(closes, token_type, closing_day):
+    """{day_offset: price} of one token type, relative to the closing epoch day."""
+    rows = closes[closes['token_type'] == token_type]
+    return dict(zip((rows['epoch_day'].to_numpy(dtype=np.int64) - closing_day).tolist(), rows['price'].tolist()))
+
+def main():
+    """Build or refresh the index for data/ (or the directory given as argument)."""
+    print("="*80)
+    print("CLOSING PRICE INDEX")
+    print("="*80)
+
+    data_dir = Path(sys.argv[1]) if len(sys.argv) > 1 else Path('data')
+    if not data_dir.exists():
+        print(f"✗ Error: {data_dir} directory not found.")
+        return
+
+    index = build_closing_price_index(data_dir)
+    print(f"  ✓ {len(index):,} closing prices for "
+          f"{index.groupby(['event_id', 'market_slug']).ngroups:,} markets")
+
+if __name__ == '__main__':
+    main()
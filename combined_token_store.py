@@ -0,0 +1,94 @@
+#!/usr/bin/env python3
+"""
+Single columnar store for the combined token rows.
+build_combined_token.py writes every user's daily YES/NO net tokens into one
+Hive-style dataset under combined_token_output/combined_tokens/, partitioned
+by event (event_id=<event>/part-0.parquet) and sorted by wallet, market and
+date. That replaces one combined_token.csv per user per event, so the step
+writes one file per event instead of one directory per wallet.
+build_date_group_token.py reads it back an event at a time.
+
+Row groups are small and sorted by wallet, so a filtered read of a few
+wallets only decodes the row groups that hold them. Without pyarrow the rows
+go to combined_tokens.csv instead (see hive_dataset.py).
+"""
+
+import sys
+from pathlib import Path
+
+import pandas as pd
+from hive_dataset import dataset_path, partition_values, read_dataset, write_partition
+
+DATASET_NAME = 'combined_tokens'
+TOKEN_COLUMNS = ['user_id', 'event_id', 'market_slug', 'date', 'yes_net_tokens', 'no_net_tokens']
+SORT_COLUMNS = ['user_id', 'market_slug', 'date']
+PARTITION_COLUMNS = ['event_id']
+STRING_COLUMNS = ['user_id', 'event_id', 'market_slug']
+
+def combined_token_path(output_dir='combined_token_output'):
+    """Dataset directory (or CSV file when pyarrow is missing) for combined token rows."""
+    return dataset_path(output_dir, DATASET_NAME)
+
+def write_event_tokens(rows, path, event_id):
+    """Write one event's combined token rows (TOKEN_COLUMNS), sorted by wallet, market and date."""
+    rows = rows[TOKEN_COLUMNS].sort_values(SORT_COLUMNS, kind='stable')
+    # Dates carry no time of day, so they are stored as days
+    write_partition(rows, path, {'event_id': event_id}, dictionary_columns=['user_id', 'market_slug'],
+                    date_columns=['date'])
+
+def write_user_files(rows, output_dir, event_id):
+    """
+    Write one event's rows in the per-user layout that predates the store:
+    <output_dir>/<event>/user_<wallet>/combined_token.csv, sorted by market and date.
+    Returns the number of files written.
+    """
+    rows = rows[TOKEN_COLUMNS].sort_values(SORT_COLUMNS, kind='stable')
+    count = 0
+    for user_id, user_rows in rows.groupby('user_id', sort=False):
+        user_dir = Path(output_dir) / event_id / f'user_{user_id}'
+        user_dir.mkdir(parents=True, exist_ok=True)
+        user_rows.to_csv(user_dir / 'combined_token.csv', index=False)
+        count += 1
+    return count
+
+def list_events(path):
+    """Events present in the store, in sorted order."""
+    return partition_values(path, 'event_id')
+
+def read_combined_tokens(path, events=None, users=None, columns=None):
+    """
+    Load combined token rows, reading only the requested events and, within
+    them, only the row groups that can hold the requested wallets.
+    """
+    df = read_dataset(path, PARTITION_COLUMNS, columns or TOKEN_COLUMNS, STRING_COLUMNS,
+                      {'event_id': events, 'user_id': users})
+    # datetime.date dates, as the per-user CSV readers produced
+    if 'date' in df.columns:
+        df['date'] = pd.to_datetime(df['date']).dt.date
+    return df
+
+def iter_event_tokens(path, columns=None):
+    """Yield (event_id, rows) for every event in the store, one event in memory at a time."""
+    for event_id in list_events(path):
+        yield event_id, read_combined_tokens(path, events=[event_id], columns=columns)
+
+def main():
+    """Print per-event row and wallet counts of the combined token store."""
+    print("="*80)
+    print("COMBINED TOKEN STORE")
+    print("="*80)
+
+    path = Path(sys.argv[1]) if len(sys.argv) > 1 else combined_token_path()
+    if not path.exists():
+        print(f"✗ Error: {path} not found")
+        print("  Run build_combined_token.py first")
+        return
+
+    total = 0
+    for event_id, rows in iter_event_tokens(path, columns=['user_id', 'event_id']):
+        print(f"  {event_id}: {len(rows):,} rows, {rows['user_id'].nunique():,} wallets")
+        total += len(rows)
+    print(f"\n  ✓ {total:,} rows in {path}")
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,148 @@
+#!/usr/bin/env python3
+"""
+Column and dtype registry for the raw donation and trade files.
+Each stage declares the columns it reads here, and every reader goes through
+read_schema_csv / coerce_donations so only those columns are parsed, with compact
+dtypes (categorical labels, nullable int32 date codes) instead of inferred
+objects.
+
+Amounts stay float64: the sums are written to the output CSVs, and float32
+would change their printed values (e.g. 19.99 -> 19.989999771118164).
+"""
+
+import numpy as np
+import pandas as pd
+
+# Donation file (US_Election_Donation.csv)
+DONATION_DTYPES = {
+    'Party': 'category',
+    'Candidate': 'category',
+    'Candidate_ID': 'category',
+    'State': 'category',
+    'Donator': str,
+    'Received': 'Int32',
+    'Donation_Amount_USD': 'float64',
+    'Donor_ID': 'int32',
+}
+
+# Columns each donation stage reads (None = every column of the source CSV)
+DONATION_STAGE_COLUMNS = {
+    'time_series': ['Party', 'Received', 'Donor_ID', 'Donation_Amount_USD'],
+    'parallel_ingest': ['Party', 'Received', 'Donator', 'Donation_Amount_USD'],
+    'base_table': ['Party', 'Received', 'Donor_ID', 'Donation_Amount_USD'],
+    'filter_candidates': None,
+    'candidate_ratios': ['Candidate', 'Received', 'Donor_ID', 'Donation_Amount_USD'],
+}
+
+# Polymarket trades (<market>_trades.csv); asset ids exceed int64, keep them as text.
+# Timestamps are float64 so blank or fractional values still parse; rows
+# without one are dropped before day bucketing.
+TRADE_DTYPES = {
+    'proxyWallet': str,
+    'side': 'category',
+    'asset': str,
+    'outcome': str,
+    'size': 'float64',
+    'price': 'float64',
+    'timestamp': 'float64',
+    'slug': str,
+}
+
+TRADE_STAGE_COLUMNS = {
+    'combined_token': ['proxyWallet', 'outcome', 'timestamp', 'slug', 'side', 'size', 'asset'],
+    'positions': ['proxyWallet', 'outcome', 'timestamp', 'side', 'size'],
+    'token_mapping': ['asset', 'outcome'],
+}
+
+# Price history (<market>_price.csv) and precomputed closing prices
+PRICE_DTYPES = {
+    'timestamp': 'float64',
+    'token_id': str,
+    'price': 'float64',
+}
+
+PRICE_STAGE_COLUMNS = {
+    'closing_prices': ['timestamp', 'token_id', 'price'],
+}
+
+CLOSING_PRICE_DTYPES = {
+    'date': str,
+    'token_type': str,
+    'price': 'float64',
+}
+
+# Event metadata (meta_<event>.csv)
+META_DTYPES = {
+    'market_slug': str,
+    'market_endDate': str,
+}
+
+META_STAGE_COLUMNS = {
+    'closing_date': ['market_slug', 'market_endDate'],
+}
+
+def read_schema_csv(path, dtypes, columns=None, **kwargs):
+    """
+    pd.read_csv restricted to `columns` with dtypes from a registry.
+    Requested columns that a file does not have (e.g. an optional `slug`)
+    are skipped rather than raising.
+    """
+    wanted = set(columns) if columns is not None else None
+    usecols = (lambda col: col in wanted) if wanted is not None else None
+    dtype = {col: dtype for col, dtype in dtypes.items() if wanted is None or col in wanted}
+    return pd.read_csv(path, usecols=usecols, dtype=dtype, **kwargs)
+
+def donation_text_dtypes(columns=None):
+    """
+    Read dtypes for raw donation text. Numeric columns are read as text and
+    converted by coerce_donations, since the export contains values that a
+    typed parse would reject.
+    """
+    dtypes = {}
+    for col, dtype in DONATION_DTYPES.items():
+        if columns is not None and col not in columns:
+            continue
+        dtypes[col] = dtype if dtype in ('category', str) else str
+    return dtypes
+
+def coerce_donations(chunk):
+    """
+    Convert raw donation text columns to their registry dtypes.
+    Received becomes a nullable Int32 date code, truncated the way
+    parse_date truncates; values outside the int32 range are never valid
+    dates and become missing.
+    """
+    if 'Received' in chunk.columns:
+        received = np.trunc(pd.to_numeric(chunk['Received'], errors='coerce').to_numpy(
+            dtype='float64', na_value=np.nan))
+        usable = np.isfinite(received) & (np.abs(received) < 2 ** 31)
+        chunk['Received'] = pd.arrays.IntegerArray(
+            np.where(usable, received, 0).astype('int32'), mask=~usable)
+    if 'Donation_Amount_USD' in chunk.columns:
+        chunk['Donation_Amount_USD'] = pd.to_numeric(
+            chunk['Donation_Amount_USD'], errors='coerce').astype('float64')
+    for col in chunk.columns:
+        if DONATION_DTYPES.get(col) == 'category' and not isinstance(chunk[col].dtype, pd.CategoricalDtype):
+            chunk[col] = chunk[col].astype('category')
+    return chunk
+
+def arrow_to_pandas(table, dtypes):
+    """
+    Convert an Arrow table or record batch to pandas. Columns registered as
+    nullable integers are converted straight to pandas nullable arrays rather
+    than the float64 Arrow produces for integer columns with nulls.
+    """
+    columns = {}
+    for name, column in zip(table.schema.names, table.columns):
+        dtype = dtypes.get(name)
+        if dtype in ('Int32', 'Int64'):
+            nullable = pd.api.types.pandas_dtype(dtype)
+            columns[name] = column.to_pandas(types_mapper=lambda _: nullable)
+        else:
+            columns[name] = column.to_pandas()
+    return pd.DataFrame(columns)
+
+def categorical_columns(dtypes, columns=None):
+    """Columns of a registry that are held as categoricals."""
+    return [col for col, dtype in dtypes.items()
+            if dtype == 'category' and (columns is None or col in columns)]
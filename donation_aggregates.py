@@ -0,0 +1,171 @@
+#!/usr/bin/env python3
+"""
+Cleaning of donation chunks and the partial aggregates built from them.
+The chunked reduction itself happens in donation_base_table.py; the accumulator
+here wraps the resulting daily (day, segment, party) sums and their rollups.
+"""
+
+import numpy as np
+import pandas as pd
+from donation_dates import decode_received
+from donor_dictionary import lookup_segments
+from period_rollup import FREQUENCIES, period_label_column, rollup
+
+PARTIES = ['DEM', 'REP']
+SEGMENTS = ['Small', 'Medium', 'Large']
+
+def clean_donation_chunk(chunk, segment_codes):
+    """
+    Filter and enrich a raw donation chunk keyed on Donor_ID.
+    `segment_codes` is the id-indexed array from donor_dictionary.load_segment_codes.
+    Returns (cleaned_chunk, skipped) where skipped counts rows without a segment.
+    """
+    # Filter for only DEM and REP parties
+    chunk = chunk[chunk['Party'].isin(PARTIES)].copy()
+    # Fixed categories so every chunk groups and sorts the parties the same way
+    chunk['Party'] = chunk['Party'].astype(pd.CategoricalDtype(PARTIES))
+
+    # Decode MDDYYYY dates for the whole column at once
+    chunk['Date'] = decode_received(chunk['Received'])
+
+    # Filter out invalid dates and amounts
+    chunk = chunk[chunk['Date'].notna()].copy()
+    chunk['Donation_Amount_USD'] = pd.to_numeric(chunk['Donation_Amount_USD'], errors='coerce')
+    chunk = chunk[chunk['Donation_Amount_USD'] > 0].copy()
+
+    # Add donor segment (array gather on donor ids)
+    chunk['Donor_Segment'] = lookup_segments(chunk['Donor_ID'], segment_codes)
+
+    # Keep only donors with segments
+    before_filter = len(chunk)
+    chunk = chunk[chunk['Donor_Segment'].notna()].copy()
+    skipped = before_filter - len(chunk)
+
+    if len(chunk) == 0:
+        return chunk, skipped
+
+    # Extract week and month
+    chunk['Year_Week'], chunk['Year_Month'] = period_labels(chunk['Date'])
+
+    # Keep only needed columns
+    chunk = chunk[['Party', 'Donor_ID', 'Donation_Amount_USD', 'Donor_Segment',
+                   'Date', 'Year_Week', 'Year_Month']]
+    return chunk, skipped
+
+def period_labels(dates):
+    """Return categorical (Year_Week, Year_Month) label Series for a datetime Series."""
+    days = dates.to_numpy(dtype='datetime64[D]').astype('int64')
+    return tuple(pd.Series(period_label_column(days, frequency), index=dates.index)
+                 for frequency in ('weekly', 'monthly'))
+
+def _merge_sums(left, right):
+    """Add two partial sum Series/DataFrames aligned on their index."""
+    if left is None:
+        return right
+    if right is None:
+        return left
+    combined = pd.concat([left, right])
+    return combined.groupby(level=list(range(combined.index.nlevels)), observed=True).sum()
+
+class DonationAccumulator:
+    """
+    Partial aggregates for the donation time series.
+    Holds only per-period sums and summary counters, never raw rows; filled from
+    the base table by donation_base_table.accumulator_from_partials.
+    """
+
+    def __init__(self):
+        self.daily = None
+        self.weekly = None
+        self.monthly = None
+        self.party_stats = None
+        self.segment_stats = None
+        self.donor_ids = np.empty(0, dtype='int32')
+        self.total_rows = 0
+        self.min_date = None
+        self.max_date = None
+
+    def weekly_aggregations(self):
+        """Weekly totals in the weekly_aggregations.csv layout."""
+        weekly_agg = self.weekly.reset_index()
+        weekly_agg.columns = ['Year_Week', 'Donor_Segment', 'Party', 'Total_Donation']
+        return weekly_agg
+
+    def monthly_aggregations(self):
+        """Monthly totals in the monthly_aggregations.csv layout."""
+        monthly_agg = self.monthly.reset_index()
+        monthly_agg.columns = ['Year_Month', 'Donor_Segment', 'Party', 'Total_Donation']
+        return monthly_agg
+
+    def period_aggregations(self, frequency):
+        """Totals for any period_rollup frequency (e.g. 'quarterly'), rolled up from the daily partials."""
+        period_agg = rollup(self.daily, frequency)['sum'].reset_index()
+        period_agg.columns = [FREQUENCIES[frequency][0], 'Donor_Segment', 'Party', 'Total_Donation']
+        return period_agg
+
+    def print_summary(self):
+        """Print the summary statistics block shared by the prepare scripts."""
+        print(f"Total donations processed: {self.total_rows:,}")
+        print(f"Date range: {self.min_date.date()} to {self.max_date.date()}")
+        print(f"\nDonations by Party:")
+        for party in self.party_stats.index:
+            total = self.party_stats.loc[party, 'sum']
+            count = self.party_stats.loc[party, 'count']
+            print(f"  {party}: ${total:,.2f} ({count:,} donations)")
+
+        print(f"\nDonations by Segment:")
+        for segment in SEGMENTS:
+            if segment in self.segment_stats.index:
+                total = self.segment_stats.loc[segment, 'sum']
+                count = self.segment_stats.loc[segment, 'count']
+                print(f"  {segment}: ${total:,.2f} ({count:,} donations)")
+
+        print(f"\nUnique donors: {len(self.donor_ids):,}")
+        print(f"Unique weeks: {self.weekly.index.get_level_values(0).nunique()}")
+        print(f"Unique months: {self.monthly.index.get_level_values(0).nunique()}")
+
+def cumulative_aggregations(period_sums, period_col):
+    """
+    Cumulative DEM/REP totals and ratios per segment (plus an 'All' rollup)
+    from partial sums indexed by (period, Donor_Segment, Party), in the
+    layout of the *_cumulative_aggregations.csv files.
+    All segments and parties are laid out as one period x (Segment, Party)
+    cube, so the cumulative sums and ratios are single column-wise operations.
+    """
+    sums = period_sums.rename('Donation')
+    sums.index.names = [period_col, 'Segment', 'Party']
+    segment_order = ['All'] + SEGMENTS
+    rollup = sums.groupby(level=[period_col, 'Party'], observed=True).sum()
+    cube = pd.concat([
+        pd.concat({'All': rollup}, names=['Segment']).reorder_levels([period_col, 'Segment', 'Party']),
+        sums.rename(index=str, level='Segment'),
+    ]).unstack(['Segment', 'Party'])
+
+    # A segment only gets rows for periods in which it has donations
+    present = cube.notna().T.groupby(level='Segment').any().T.reindex(columns=segment_order, fill_value=False)
+    cube = cube.reindex(columns=pd.MultiIndex.from_product([segment_order, PARTIES])).fillna(0)
+    cube.columns = cube.columns.set_names(['Segment', 'Party'])
+
+    cumulative = cube.cumsum()
+    dem = cube.xs('DEM', level='Party', axis=1)
+    rep = cube.xs('REP', level='Party', axis=1)
+    cumulative_dem = cumulative.xs('DEM', level='Party', axis=1)
+    cumulative_rep = cumulative.xs('REP', level='Party', axis=1)
+    total = cumulative_dem + cumulative_rep
+    positive_total = total.where(total > 0)
+    measures = {
+        'DEM': dem,
+        'REP': rep,
+        'Cumulative_DEM': cumulative_dem,
+        'Cumulative_REP': cumulative_rep,
+        'Total_Cumulative': total,
+        'Dem_Ratio': cumulative_dem / positive_total,
+        'Rep_Ratio': cumulative_rep / positive_total,
+    }
+
+    # Back to long format: segment blocks in order, periods ascending within each
+    long = pd.concat({name: frame.T.stack() for name, frame in measures.items()}, axis=1)
+    long = long[present.T.stack().reindex(long.index).to_numpy()]
+    long = long.reindex(segment_order, level='Segment')
+    long = long.reset_index()
+    return long[[period_col] + list(measures) + ['Segment']]
@@ -0,0 +1,299 @@
+#!/usr/bin/env python3
+"""
+Donor x day x party base table for the donation file.
+One pass compresses the raw rows into per (Day, Donor_ID, Party) sums and
+counts, cached next to the Parquet cache. Donor totals (and so the segment
+thresholds), weekly/monthly aggregations and the cumulative ratio tables
+are all derived from it without rereading the raw rows.
+
+The pass runs over the Parquet cache, or with workers > 1 over byte-range
+shards of the CSV in a process pool (see parallel_ingest.py); both produce
+the same table.
+"""
+
+import argparse
+import io
+import json
+import multiprocessing as mp
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+from data_schema import DONATION_STAGE_COLUMNS, coerce_donations, donation_text_dtypes
+from donation_aggregates import PARTIES, DonationAccumulator, _merge_sums
+from donation_cache import CACHE_DIR_NAME, build_cache, iter_donation_chunks, source_fingerprint
+from donation_dates import decode_received_days
+from donor_dictionary import DonorDictionary, dictionary_path
+from parallel_ingest import RAW_COLUMNS, shard_row_ranges
+from period_rollup import daily_partials, rollup
+
+BASE_TABLE_VERSION = 1
+BASE_COLUMNS = DONATION_STAGE_COLUMNS['base_table']
+KEY_COLUMNS = ['Day', 'Donor_ID', 'Party']
+
+# Donor-id ranges the base table is split into for per-range donor totals
+DONOR_PARTITIONS = 16
+
+# Day key for rows whose Received value is not a valid date
+INVALID_DAY = np.iinfo('int32').min
+
+def base_table_paths(donation_file):
+    """Return (table_file, stamp_file) for a donation file."""
+    donation_file = Path(donation_file)
+    cache_dir = donation_file.parent / CACHE_DIR_NAME
+    return (cache_dir / f'{donation_file.stem}.base.pkl',
+            cache_dir / f'{donation_file.stem}.base.json')
+
+def _base_stamp(donation_file):
+    """Source fingerprint plus the base table version."""
+    return {**source_fingerprint(donation_file), 'base_version': BASE_TABLE_VERSION}
+
+def reduce_base_chunk(chunk):
+    """
+    Reduce raw rows to base table partials (Donor_ID -1 collects rows
+    without a donor name). Amount/Count cover every row (missing amounts
+    count as 0), as used for donor totals; Kept_Amount/Kept_Count cover only
+    positive amounts, as used for the time series.
+    """
+    days = decode_received_days(chunk['Received'])
+    amounts = chunk['Donation_Amount_USD'].fillna(0).to_numpy()
+    kept = amounts > 0
+    rows = pd.DataFrame({
+        'Day': np.where(np.isnat(days), INVALID_DAY, days.astype('int64')).astype('int32'),
+        'Donor_ID': chunk['Donor_ID'].to_numpy(),
+        'Party': chunk['Party'].astype(str).where(chunk['Party'].notna(), ''),
+        'Amount': amounts,
+        'Count': 1,
+        'Kept_Amount': np.where(kept, amounts, 0.0),
+        'Kept_Count': kept.astype('int64'),
+    })
+    return rows.groupby(KEY_COLUMNS).sum()
+
+def merge_base_partials(partials, compact_every=8):
+    """Sum an iterable of base table partials, compacting every few partials."""
+    base = None
+    pending = []
+    for partial in partials:
+        pending.append(partial)
+        if len(pending) >= compact_every:
+            base = _merge_sums(base, pd.concat(pending).groupby(level=KEY_COLUMNS).sum())
+            pending = []
+    if pending:
+        base = _merge_sums(base, pd.concat(pending).groupby(level=KEY_COLUMNS).sum())
+    if base is None:
+        return pd.DataFrame(columns=KEY_COLUMNS + ['Amount', 'Count', 'Kept_Amount', 'Kept_Count'])
+
+    base = base.reset_index()
+    base['Party'] = base['Party'].astype('category')
+    return base
+
+def build_base_table(donation_file, chunksize=1_000_000, compact_every=8):
+    """Stream the donation file once into the base table (indexed by Day, Donor_ID, Party)."""
+    chunks = iter_donation_chunks(donation_file, columns=BASE_COLUMNS, chunksize=chunksize)
+    return merge_base_partials((reduce_base_chunk(chunk) for chunk in chunks), compact_every)
+
+def _reduce_shard(task):
+    """
+    Reduce one byte range of the CSV to base table partials keyed on
+    shard-local donor ids. Runs in a worker process.
+    Returns (local id -> name array, partials or None).
+    """
+    csv_file, header, start, end, chunksize = task
+    with open(csv_file, 'rb') as f:
+        f.seek(start)
+        data = f.read(end - start)
+
+    # Local ids follow first appearance in the shard, like the dictionary's
+    names = DonorDictionary()
+    partials = []
+    for chunk in pd.read_csv(io.BytesIO(header + data), usecols=RAW_COLUMNS,
+                             dtype=donation_text_dtypes(RAW_COLUMNS), chunksize=chunksize):
+        chunk = coerce_donations(chunk)
+        chunk['Donor_ID'] = names.encode(chunk['Donator'], add=True)
+        partials.append(reduce_base_chunk(chunk))
+    if not partials:
+        return names.decode(np.arange(0)), None
+    # A shard is one serial chunk, so this is the serial reader's partial
+    return names.decode(np.arange(len(names))), partials[0]
+
+def build_base_table_parallel(donation_file, workers, chunksize=1_000_000, compact_every=8):
+    """
+    Build the base table from byte ranges of the CSV in a process pool.
+    Each shard holds exactly the rows of one serial chunk (`chunksize` lines),
+    and the shard partials are mapped to donor dictionary ids and merged in
+    shard order. New names therefore get ids in file order, as in the Parquet
+    cache, and every sum is added up in the same order as build_base_table,
+    so the two tables are identical for any number of workers.
+    """
+    dictionary_file = dictionary_path(donation_file)
+    dictionary = DonorDictionary.load(dictionary_file)
+    header, ranges = shard_row_ranges(donation_file, chunksize)
+    tasks = [(str(donation_file), header, start, end, chunksize) for start, end in ranges]
+
+    def dictionary_partials(results):
+        for local_names, partial in results:
+            if partial is None:
+                continue
+            # Position -1 (rows without a donor name) picks the trailing -1
+            ids = np.append(dictionary.encode(local_names, add=True), np.int32(-1))
+            partial = partial.reset_index()
+            partial['Donor_ID'] = ids[partial['Donor_ID'].to_numpy()]
+            yield partial.set_index(KEY_COLUMNS)
+
+    # imap keeps shard order, so ids and sums are merged deterministically
+    with mp.get_context().Pool(workers) as pool:
+        base = merge_base_partials(dictionary_partials(pool.imap(_reduce_shard, tasks)), compact_every)
+
+    if dictionary.modified or not dictionary_file.exists():
+        dictionary.save(dictionary_file)
+    return base
+
+def load_base_table(donation_file, force=False, workers=1):
+    """
+    Load the cached base table, rebuilding it when the donation file changed.
+    With workers > 1 a rebuild reads the CSV in parallel shards instead of
+    the Parquet cache.
+    """
+    table_file, stamp_file = base_table_paths(donation_file)
+    # Donor ids in the table refer to the dictionary written with the Parquet
+    # cache (or by the parallel build, which assigns the same ids)
+    if workers <= 1:
+        build_cache(donation_file)
+    stamp = _base_stamp(donation_file)
+    if not force and table_file.exists() and stamp_file.exists() and dictionary_path(donation_file).exists():
+        try:
+            with open(stamp_file) as f:
+                if json.load(f) == stamp:
+                    return pd.read_pickle(table_file)
+        except (OSError, ValueError):
+            pass
+
+    print(f"  Building donor x day x party base table for {Path(donation_file).name}...")
+    if workers > 1:
+        base = build_base_table_parallel(donation_file, workers)
+    else:
+        base = build_base_table(donation_file)
+    table_file.parent.mkdir(parents=True, exist_ok=True)
+    base.to_pickle(table_file)
+    with open(stamp_file, 'w') as f:
+        json.dump(stamp, f, indent=2)
+    print(f"  ✓ Base table: {len(base):,} rows")
+    return base
+
+def donor_totals(base):
+    """Per-donor totals and donation counts (the segment_election_donors.py layout)."""
+    totals = base[base['Donor_ID'] >= 0].groupby('Donor_ID')[['Amount', 'Count']].sum().reset_index()
+    totals.columns = ['Donor_ID', 'Cumulative_Donation_USD', 'Number_of_Donations']
+    return totals
+
+def iter_donor_totals(base, partitions=DONOR_PARTITIONS):
+    """
+    Yield donor_totals for contiguous Donor_ID ranges of the base table. All
+    rows of a donor fall in one range, so each range's totals are complete.
+    """
+    ids = base['Donor_ID'].to_numpy()
+    if not (ids >= 0).any():
+        return
+    bounds = np.linspace(0, int(ids.max()) + 1, partitions + 1).astype('int64')
+    for low, high in zip(bounds[:-1], bounds[1:]):
+        part = base[(ids >= low) & (ids < high)]
+        if len(part):
+            yield donor_totals(part)
+
+def kept_rows(base):
+    """Base rows that enter the time series: DEM/REP, valid date, positive amounts."""
+    kept = base[base['Party'].isin(PARTIES) & (base['Day'] != INVALID_DAY) & (base['Kept_Count'] > 0)]
+    kept = kept[['Day', 'Donor_ID', 'Party', 'Kept_Amount', 'Kept_Count']].copy()
+    kept.columns = ['Day', 'Donor_ID', 'Party', 'sum', 'count']
+    kept['Party'] = kept['Party'].astype(pd.CategoricalDtype(PARTIES))
+    return kept
+
+def accumulator_from_partials(daily, donor_ids, min_day, max_day):
+    """Wrap daily (sum, count) partials and their weekly/monthly rollups in a DonationAccumulator."""
+    accumulator = DonationAccumulator()
+    accumulator.daily = daily
+    accumulator.weekly = rollup(daily, 'weekly')['sum']
+    accumulator.monthly = rollup(daily, 'monthly')['sum']
+    accumulator.party_stats = daily.groupby(level='Party', observed=True).sum()
+    accumulator.segment_stats = daily.groupby(level='Donor_Segment', observed=True).sum()
+    accumulator.donor_ids = np.asarray(donor_ids, dtype='int32')
+    accumulator.total_rows = int(daily['count'].sum())
+    accumulator.min_date = pd.Timestamp(np.datetime64(int(min_day), 'D'))
+    accumulator.max_date = pd.Timestamp(np.datetime64(int(max_day), 'D'))
+    return accumulator
+
+def base_accumulator(base, segment_codes):
+    """
+    Time series aggregates for the given id-indexed segment codes.
+    Returns (DonationAccumulator or None, skipped) where skipped counts the
+    kept donations of donors without a segment.
+    """
+    rows = kept_rows(base)
+    ids = rows['Donor_ID'].to_numpy()
+    codes = np.full(len(ids), -1, dtype='int8')
+    known = (ids >= 0) & (ids < len(segment_codes))
+    codes[known] = segment_codes[ids[known]]
+    skipped = int(rows['count'].to_numpy()[codes < 0].sum())
+
+    # The daily partials are the base level; every period is rolled up from them
+    daily = daily_partials(rows, codes)
+    if daily is None:
+        return None, skipped
+    segmented = rows[codes >= 0]
+    return accumulator_from_partials(daily, np.unique(segmented['Donor_ID'].to_numpy()),
+                                     segmented['Day'].min(), segmented['Day'].max()), skipped
+
+def sorted_base(base):
+    """Base table rows in key order, for comparing tables built different ways."""
+    base = base.astype({'Party': str}).sort_values(KEY_COLUMNS, kind='stable')
+    return base.reset_index(drop=True)
+
+def check_parallel(donation_file, workers):
+    """Build the table serially and with `workers` processes; True when they are identical."""
+    serial = sorted_base(build_base_table(donation_file))
+    parallel = sorted_base(build_base_table_parallel(donation_file, workers))
+    if serial.equals(parallel):
+        print(f"  ✓ Parallel build ({workers} workers) matches the serial build: {len(serial):,} rows")
+        return True
+
+    print(f"  ✗ Parallel build differs from the serial build "
+          f"({len(parallel):,} vs {len(serial):,} rows)")
+    if len(serial) == len(parallel):
+        for col in serial.columns:
+            mismatched = int((serial[col] != parallel[col]).sum())
+            if mismatched:
+                print(f"    {col}: {mismatched:,} rows differ")
+    return False
+
+def parse_args():
+    """Parse command line options."""
+    parser = argparse.ArgumentParser(description="Build the donor x day x party base table.")
+    parser.add_argument('donation_file', nargs='?', type=Path, default=Path('US_Election_Donation.csv'),
+                        help="donation CSV (default: US_Election_Donation.csv)")
+    parser.add_argument('--workers', type=int, default=1,
+                        help="build from parallel byte-range shards of the CSV with this many processes")
+    parser.add_argument('--check', action='store_true',
+                        help="build the table both serially and with --workers and compare them")
+    return parser.parse_args()
+
+def main():
+    """Build (or refresh) the base table for a donation file."""
+    args = parse_args()
+    print("="*80)
+    print("BUILD DONOR x DAY x PARTY BASE TABLE")
+    print("="*80)
+
+    donation_file = args.donation_file
+    if not donation_file.exists():
+        print(f"✗ Error: {donation_file} not found")
+        return
+
+    if args.check:
+        check_parallel(donation_file, max(args.workers, 2))
+        return
+
+    base = load_base_table(donation_file, workers=args.workers)
+    print(f"\n  ✓ {len(base):,} base rows for {base['Donor_ID'].nunique():,} donors")
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,237 @@
+#!/usr/bin/env python3
+"""
+Columnar Parquet cache for the raw donation CSV.
+Converts US_Election_Donation.csv once into a typed, compressed Parquet copy
+stamped with a fingerprint of the source file. Readers load only the columns
+they need and the cache is rebuilt automatically when the CSV changes.
+The cache also carries an int32 Donor_ID column from the donor dictionary, so
+rewriting that dictionary makes the cache stale as well.
+"""
+
+import hashlib
+import json
+import sys
+from pathlib import Path
+
+import pandas as pd
+from data_schema import (DONATION_DTYPES, arrow_to_pandas, categorical_columns,
+                         coerce_donations, donation_text_dtypes)
+from donor_dictionary import DonorDictionary, dictionary_path
+
+try:
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+except ImportError:
+    pa = None
+    pq = None
+
+CACHE_DIR_NAME = '.donation_cache'
+CONVERT_CHUNK_SIZE = 1_000_000
+FINGERPRINT_SAMPLE_BYTES = 1 << 20
+
+# Bumped whenever the cached column types change, so old caches are rebuilt
+CACHE_FORMAT_VERSION = 3
+
+DONOR_ID_COLUMN = 'Donor_ID'
+
+def cache_paths(csv_file):
+    """Return (parquet_file, fingerprint_file) for a source CSV."""
+    csv_file = Path(csv_file)
+    cache_dir = csv_file.parent / CACHE_DIR_NAME
+    return (cache_dir / f'{csv_file.stem}.parquet',
+            cache_dir / f'{csv_file.stem}.fingerprint.json')
+
+def source_fingerprint(csv_file):
+    """
+    Fingerprint a source file by size, mtime and a hash of its first and last MiB.
+    Cheap enough to compute on every run, even for multi-GB files.
+    """
+    csv_file = Path(csv_file)
+    stat = csv_file.stat()
+    digest = hashlib.sha256()
+    with open(csv_file, 'rb') as f:
+        digest.update(f.read(FINGERPRINT_SAMPLE_BYTES))
+        if stat.st_size > FINGERPRINT_SAMPLE_BYTES:
+            f.seek(max(stat.st_size - FINGERPRINT_SAMPLE_BYTES, FINGERPRINT_SAMPLE_BYTES))
+            digest.update(f.read())
+    return {
+        'size': stat.st_size,
+        'mtime_ns': stat.st_mtime_ns,
+        'sha256_head_tail': digest.hexdigest(),
+    }
+
+def is_cache_fresh(csv_file):
+    """Check whether the Parquet cache exists and matches the source CSV."""
+    parquet_file, fingerprint_file = cache_paths(csv_file)
+    if not parquet_file.exists() or not fingerprint_file.exists():
+        return False
+    # Cached Donor_ID values are only meaningful alongside their dictionary
+    if not dictionary_path(csv_file).exists():
+        return False
+    try:
+        with open(fingerprint_file) as f:
+            stored = json.load(f)
+    except (OSError, ValueError):
+        return False
+    return stored == _cache_stamp(csv_file)
+
+def _cache_stamp(csv_file, source=None):
+    """Source fingerprint, cache format version and the fingerprint of the donor dictionary."""
+    dictionary_file = dictionary_path(csv_file)
+    return {
+        **(source or source_fingerprint(csv_file)),
+        'format_version': CACHE_FORMAT_VERSION,
+        # A rewritten or replaced dictionary may no longer match the cached Donor_ID values
+        'dictionary': source_fingerprint(dictionary_file) if dictionary_file.exists() else None,
+    }
+
+def _coerce_chunk(chunk, dictionary):
+    """Convert a raw text chunk to the registry dtypes and add donor ids."""
+    chunk = coerce_donations(chunk)
+    if 'Donator' in chunk.columns:
+        chunk[DONOR_ID_COLUMN] = dictionary.encode(chunk['Donator'], add=True)
+    return chunk
+
+def _field_type(name):
+    """Arrow type of a cache column (categoricals are stored as dictionary-encoded text)."""
+    dtype = DONATION_DTYPES.get(name)
+    if dtype in ('int32', 'Int32'):
+        return pa.int32()
+    if dtype == 'float64':
+        return pa.float64()
+    return pa.string()
+
+def build_cache(csv_file, force=False):
+    """
+    Convert the source CSV to Parquet if the cache is missing or stale.
+    Returns the Parquet path, or None when pyarrow is not installed.
+    """
+    if pq is None:
+        return None
+
+    csv_file = Path(csv_file)
+    parquet_file, fingerprint_file = cache_paths(csv_file)
+    if not force and is_cache_fresh(csv_file):
+        return parquet_file
+
+    print(f"  Building Parquet cache for {csv_file.name} (one-time conversion)...")
+    parquet_file.parent.mkdir(parents=True, exist_ok=True)
+    source = source_fingerprint(csv_file)
+    dictionary_file = dictionary_path(csv_file)
+    dictionary = DonorDictionary.load(dictionary_file)
+
+    # Write to a temporary file so an interrupted conversion never looks fresh
+    tmp_file = parquet_file.with_suffix('.parquet.tmp')
+    writer = None
+    total_rows = 0
+    try:
+        for chunk in pd.read_csv(csv_file, chunksize=CONVERT_CHUNK_SIZE, dtype=str):
+            # Everything is parsed as text here; coerce_donations applies the registry dtypes
+            chunk = _coerce_chunk(chunk, dictionary)
+            table = pa.Table.from_pandas(chunk, preserve_index=False)
+            if writer is None:
+                schema = pa.schema([pa.field(name, _field_type(name)) for name in chunk.columns])
+                writer = pq.ParquetWriter(tmp_file, schema, compression='zstd')
+            writer.write_table(table.cast(writer.schema))
+            total_rows += len(chunk)
+    finally:
+        if writer is not None:
+            writer.close()
+
+    if writer is None:
+        tmp_file.unlink(missing_ok=True)
+        return None
+
+    # Persist new donor ids before the cache that references them
+    if dictionary.modified or not dictionary_file.exists():
+        dictionary.save(dictionary_file)
+    tmp_file.replace(parquet_file)
+    with open(fingerprint_file, 'w') as f:
+        json.dump(_cache_stamp(csv_file, source), f, indent=2)
+
+    print(f"  ✓ Cached {total_rows:,} rows to {parquet_file}")
+    return parquet_file
+
+def _iter_csv_chunks(csv_file, columns, chunksize):
+    """CSV fallback reader; derives Donor_ID from the dictionary when requested."""
+    want_ids = columns is not None and DONOR_ID_COLUMN in columns
+    usecols = columns
+    if want_ids:
+        usecols = [col for col in columns if col != DONOR_ID_COLUMN]
+        if 'Donator' not in usecols:
+            usecols.append('Donator')
+
+    dictionary = DonorDictionary.load(dictionary_path(csv_file)) if want_ids else None
+    for chunk in pd.read_csv(csv_file, chunksize=chunksize, usecols=usecols,
+                             dtype=donation_text_dtypes(usecols)):
+        chunk = coerce_donations(chunk)
+        if want_ids:
+            chunk[DONOR_ID_COLUMN] = dictionary.encode(chunk['Donator'], add=True)
+            chunk = chunk[columns]
+        yield chunk
+
+    if want_ids and dictionary.modified:
+        dictionary.save(dictionary_path(csv_file))
+
+def cached_columns(parquet_file, columns=None):
+    """
+    Columns to read from the cache: `columns`, or else the source CSV's own
+    columns. The internal Donor_ID is left out unless asked for, since the ids
+    are only meaningful next to the source file's dictionary.
+    """
+    if columns is not None:
+        return list(columns)
+    return [name for name in pq.ParquetFile(parquet_file).schema_arrow.names if name != DONOR_ID_COLUMN]
+
+def iter_donation_chunks(csv_file, columns=None, chunksize=1_000_000):
+    """
+    Yield DataFrame chunks of the donation file, reading only `columns`.
+    Uses the Parquet cache when pyarrow is available, otherwise the CSV.
+    """
+    parquet_file = build_cache(csv_file)
+    if parquet_file is None:
+        yield from _iter_csv_chunks(csv_file, columns, chunksize)
+        return
+
+    columns = cached_columns(parquet_file, columns)
+    parquet = pq.ParquetFile(parquet_file, read_dictionary=categorical_columns(DONATION_DTYPES, columns))
+    for batch in parquet.iter_batches(batch_size=chunksize, columns=columns):
+        yield arrow_to_pandas(batch, DONATION_DTYPES)
+
+def read_donations(csv_file, columns=None):
+    """Load the donation file in full, reading only `columns`."""
+    parquet_file = build_cache(csv_file)
+    if parquet_file is None:
+        return pd.concat(_iter_csv_chunks(csv_file, columns, CONVERT_CHUNK_SIZE), ignore_index=True)
+    columns = cached_columns(parquet_file, columns)
+    parquet = pq.ParquetFile(parquet_file, read_dictionary=categorical_columns(DONATION_DTYPES, columns))
+    return arrow_to_pandas(parquet.read(columns=columns), DONATION_DTYPES)
+
+def load_donor_dictionary(csv_file):
+    """Load the donor dictionary for a donation file, building the cache first."""
+    build_cache(csv_file)
+    return DonorDictionary.load(dictionary_path(csv_file))
+
+def main():
+    """Build (or refresh) the Parquet cache for the donation file."""
+    print("="*80)
+    print("BUILD DONATION PARQUET CACHE")
+    print("="*80)
+
+    csv_file = Path(sys.argv[1]) if len(sys.argv) > 1 else Path('US_Election_Donation.csv')
+    if not csv_file.exists():
+        print(f"✗ Error: {csv_file} not found")
+        return
+
+    if pq is None:
+        print("✗ Error: pyarrow is not installed; readers will fall back to the CSV")
+        return
+
+    if is_cache_fresh(csv_file):
+        print(f"\n  ✓ Cache is up to date: {cache_paths(csv_file)[0]}")
+        return
+
+    build_cache(csv_file, force=True)
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,82 @@
+#!/usr/bin/env python3
+"""
+Vectorized decoding of the MDDYYYY / MMDDYYYY `Received` column.
+Works on the whole integer column with array arithmetic instead of a
+per-row Python call, and returns NaT for values parse_date rejects.
+"""
+
+import numpy as np
+import pandas as pd
+
+def parse_date(date_str):
+    """
+    Parse date from MMDDYYYY format (e.g., 7312023 = July 31, 2023)
+    Scalar reference implementation; use decode_received for columns.
+    """
+    if pd.isna(date_str):
+        return pd.NaT
+
+    date_str = str(int(date_str))
+
+    # Pad to ensure we have at least 7 digits (MDDYYYY)
+    if len(date_str) < 7:
+        return pd.NaT
+
+    try:
+        # Try MMDDYYYY format (8 digits)
+        if len(date_str) == 8:
+            month = int(date_str[:2])
+            day = int(date_str[2:4])
+            year = int(date_str[4:])
+        # Try MDDYYYY format (7 digits)
+        elif len(date_str) == 7:
+            month = int(date_str[0])
+            day = int(date_str[1:3])
+            year = int(date_str[3:])
+        else:
+            return pd.NaT
+
+        return pd.Timestamp(year=year, month=month, day=day)
+    except:
+        return pd.NaT
+
+def decode_received_days(received):
+    """
+    Decode Received values to datetime64[D] with NaT for invalid values.
+
+    The 7/8-digit layouts share the same arithmetic: the last four digits
+    are the year, the two before them the day, and the rest the month.
+    """
+    values = pd.to_numeric(pd.Series(received, copy=False), errors='coerce').to_numpy(
+        dtype='float64', na_value=np.nan)
+
+    # parse_date truncates through int(); 7 or 8 digits only
+    valid = np.isfinite(values)
+    codes = np.zeros(len(values), dtype='int64')
+    codes[valid] = np.trunc(values[valid]).astype('int64')
+    valid &= (codes >= 1_000_000) & (codes < 100_000_000)
+
+    month, rest = np.divmod(codes, 1_000_000)
+    day, year = np.divmod(rest, 10_000)
+    valid &= (month >= 1) & (month <= 12) & (day >= 1) & (year >= 1)
+
+    # Build month starts, then check the day fits in that month
+    month_index = np.where(valid, (year - 1970) * 12 + (month - 1), 0)
+    month_start = month_index.astype('datetime64[M]').astype('datetime64[D]')
+    next_month_start = (month_index + 1).astype('datetime64[M]').astype('datetime64[D]')
+    days_in_month = (next_month_start - month_start).astype('int64')
+    valid &= day <= days_in_month
+
+    dates = month_start + np.where(valid, day - 1, 0).astype('timedelta64[D]')
+    dates[~valid] = np.datetime64('NaT')
+    return dates
+
+def decode_received(received):
+    """
+    Vectorized equivalent of `received.apply(parse_date)`.
+    Returns a datetime64[us] Series (the resolution pd.Timestamp uses for
+    calendar dates) aligned with the input index.
+    """
+    index = received.index if isinstance(received, pd.Series) else None
+    dates = decode_received_days(received).astype('datetime64[us]')
+    return pd.Series(dates, index=index)
@@ -0,0 +1,151 @@
+#!/usr/bin/env python3
+"""
+Query API over the precomputed donation aggregates.
+Answers party/segment/candidate/period questions from the aggregate files
+written by the prepare scripts instead of rereading donation rows:
+
+    from donation_query import query
+    query(party='DEM', segment='Small', freq='monthly', start='2024-01', end='2024-06')
+    query(candidate=['LAKE, KARI', 'GALLEGO, RUBEN'], freq='weekly', segment='All')
+
+Results are memoized in a bounded LRU cache keyed on the query and the
+fingerprint of the aggregate file, so repeated queries return in
+milliseconds and a rewritten file is picked up automatically.
+"""
+
+import re
+import sys
+from functools import lru_cache
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+from donation_cache import source_fingerprint
+from period_rollup import FREQUENCIES
+
+# Label format of each frequency's periods; other strings are parsed as dates
+PERIOD_LABEL_PATTERNS = {
+    'weekly': r'\d{4}-W\d{2}',
+    'monthly': r'\d{4}-\d{2}',
+    'quarterly': r'\d{4}-Q[1-4]',
+    'cycle': r'\d{4}',
+}
+
+QUERY_CACHE_SIZE = 256
+TABLE_CACHE_SIZE = 8
+
+PARTY_STORE = Path('donation_time_series_data')
+CANDIDATE_STORE = Path('cumulative_ratio_analysis') / 'output' / 'candidate_cumulative_ratios.csv'
+
+def store_file(root, freq, by_candidate):
+    """Aggregate file answering a query for the given frequency."""
+    if freq not in FREQUENCIES:
+        raise ValueError(f"unknown frequency {freq!r}; expected one of {', '.join(FREQUENCIES)}")
+    if by_candidate:
+        return Path(root) / CANDIDATE_STORE
+    return Path(root) / PARTY_STORE / f'{freq}_aggregations.csv'
+
+def store_fingerprint(path):
+    """Hashable fingerprint of an aggregate file (size, mtime, head/tail hash)."""
+    return tuple(sorted(source_fingerprint(path).items()))
+
+@lru_cache(maxsize=TABLE_CACHE_SIZE)
+def _load_table(path, fingerprint):
+    """Read an aggregate file once per fingerprint."""
+    return pd.read_csv(path, dtype={'Year_Month': str, 'Year_Quarter': str, 'Election_Cycle': str,
+                                    'Period': str})
+
+def filter_values(value):
+    """Normalize a filter value to a tuple of strings (None means no filter)."""
+    if value is None:
+        return None
+    if isinstance(value, str):
+        return (value,)
+    return tuple(str(item) for item in value)
+
+def period_bound(value, freq):
+    """Period label for a bound given as a label string or as a date (or date string)."""
+    if value is None:
+        return None
+    if isinstance(value, str) and re.fullmatch(PERIOD_LABEL_PATTERNS.get(freq, ''), value.strip()):
+        return value.strip()
+    _, key_function, label_function = FREQUENCIES[freq]
+    day = np.datetime64(pd.Timestamp(value).date(), 'D').astype('int64')
+    return label_function(key_function(np.array([day])))[0]
+
+@lru_cache(maxsize=QUERY_CACHE_SIZE)
+def _run_query(path, fingerprint, freq, party, segment, candidate, start, end):
+    """Filter one aggregate table; cached on the query and the file fingerprint."""
+    table = _load_table(path, fingerprint)
+    if candidate is not None:
+        table = table[table['Frequency'] == freq]
+        period_col = 'Period'
+        segment_col = 'Segment'
+    else:
+        period_col = FREQUENCIES[freq][0]
+        segment_col = 'Donor_Segment'
+
+    mask = np.ones(len(table), dtype=bool)
+    if party is not None:
+        mask &= table['Party'].isin(party).to_numpy()
+    if segment is not None:
+        mask &= table[segment_col].isin(segment).to_numpy()
+    if candidate is not None:
+        mask &= table['Candidate'].isin(candidate).to_numpy()
+    periods = table[period_col].astype(str)
+    if start is not None:
+        mask &= (periods >= start).to_numpy()
+    if end is not None:
+        mask &= (periods <= end).to_numpy()
+    return table[mask].reset_index(drop=True)
+
+def query(party=None, segment=None, candidate=None, freq='weekly', start=None, end=None, root='.'):
+    """
+    Aggregated donations matching the filters.
+    party/segment/candidate take a value or a list of values; start/end are
+    inclusive period labels ('2024-W05', '2024-03', '2024-Q1', '2024') or
+    dates, which are mapped to the period that contains them.
+    Party queries read <freq>_aggregations.csv; candidate queries read the
+    per-candidate table (cumulative_ratio_analysis --by-candidate), which has
+    no party column.
+    """
+    if candidate is not None and party is not None:
+        raise ValueError("candidate queries have no party column; filter on candidate only")
+    path = store_file(root, freq, candidate is not None)
+    if not path.exists():
+        raise FileNotFoundError(f"{path} not found; run the prepare scripts first")
+
+    result = _run_query(str(path), store_fingerprint(path), freq, filter_values(party),
+                        filter_values(segment), filter_values(candidate),
+                        period_bound(start, freq), period_bound(end, freq))
+    # Callers get their own copy so the cached frame is never modified
+    return result.copy()
+
+def cache_info():
+    """Hit/miss statistics of the query cache."""
+    return _run_query.cache_info()
+
+def clear_cache():
+    """Drop all cached tables and query results."""
+    _run_query.cache_clear()
+    _load_table.cache_clear()
+
+def main():
+    """Run one query from the command line: donation_query.py [freq] [party] [segment]."""
+    print("="*80)
+    print("DONATION AGGREGATE QUERY")
+    print("="*80)
+
+    freq = sys.argv[1] if len(sys.argv) > 1 else 'monthly'
+    party = sys.argv[2] if len(sys.argv) > 2 else None
+    segment = sys.argv[3] if len(sys.argv) > 3 else None
+    try:
+        result = query(party=party, segment=segment, freq=freq)
+    except (FileNotFoundError, ValueError) as e:
+        print(f"✗ Error: {e}")
+        return
+    print(result.to_string(index=False))
+    print(f"\n  ✓ {len(result):,} rows")
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,128 @@
+#!/usr/bin/env python3
+"""
+Persistent donor dictionary: interns `Donator` name strings to int32 ids.
+Ids are assigned once, append-only, and stored in donor_dictionary.csv next to
+the donation file, so every stage can key on compact integers and join names
+back only when writing output.
+"""
+
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+DICTIONARY_NAME = 'donor_dictionary.csv'
+
+# Alphabetical so categorical grouping sorts the same way as the string labels
+SEGMENT_LABELS = ['Large', 'Medium', 'Small']
+
+# New names are kept in a small side index and folded in once it grows this big
+PENDING_COMPACT_SIZE = 1_000_000
+
+def dictionary_path(donation_file):
+    """Location of the donor dictionary for a donation file."""
+    return Path(donation_file).parent / DICTIONARY_NAME
+
+class DonorDictionary:
+    """Append-only mapping between donor names and int32 ids."""
+
+    def __init__(self, names=()):
+        self._index = pd.Index(list(names), dtype=object)
+        self._pending = []
+        self._pending_index = pd.Index([], dtype=object)
+        self.modified = False
+
+    def __len__(self):
+        return len(self._index) + len(self._pending)
+
+    @classmethod
+    def load(cls, path):
+        """Load a dictionary file, or return an empty dictionary if missing."""
+        path = Path(path)
+        if not path.exists():
+            return cls()
+        df = pd.read_csv(path, dtype={'Donator': object}, keep_default_na=False, na_filter=False)
+        return cls(df.sort_values('Donor_ID')['Donator'])
+
+    def save(self, path):
+        """Write the dictionary (Donor_ID, Donator) to disk."""
+        self._compact()
+        pd.DataFrame({
+            'Donor_ID': np.arange(len(self._index), dtype='int32'),
+            'Donator': self._index,
+        }).to_csv(path, index=False)
+        self.modified = False
+
+    def _compact(self):
+        """Fold pending names into the main index."""
+        if self._pending:
+            self._index = self._index.append(pd.Index(self._pending, dtype=object))
+            self._pending = []
+            self._pending_index = pd.Index([], dtype=object)
+
+    def _lookup(self, values):
+        """Hash lookup of names against the main and pending indexes (-1 if unknown)."""
+        ids = self._index.get_indexer(values).astype('int64')
+        if self._pending:
+            missing = ids < 0
+            pending_ids = self._pending_index.get_indexer(values[missing])
+            ids[np.flatnonzero(missing)[pending_ids >= 0]] = len(self._index) + pending_ids[pending_ids >= 0]
+        return ids
+
+    def encode(self, names, add=False):
+        """
+        Map names to int32 ids (-1 for missing/unknown names).
+        With add=True, unseen names are assigned the next free ids.
+        """
+        values = pd.Index(pd.Series(names, copy=False).to_numpy(dtype=object))
+        ids = self._lookup(values)
+
+        if add:
+            missing = (ids < 0) & ~pd.isna(values)
+            if missing.any():
+                new_names = pd.unique(values[missing])
+                self._pending.extend(new_names)
+                self._pending_index = pd.Index(self._pending, dtype=object)
+                ids[missing] = (len(self) - len(new_names)
+                                + pd.Index(new_names).get_indexer(values[missing]))
+                self.modified = True
+                if len(self._pending) >= PENDING_COMPACT_SIZE:
+                    self._compact()
+
+        return ids.astype('int32')
+
+    def decode(self, ids):
+        """Map int32 ids back to names (None for -1)."""
+        self._compact()
+        ids = np.asarray(ids)
+        names = self._index.to_numpy(dtype=object)
+        valid = (ids >= 0) & (ids < len(names))
+        result = np.full(len(ids), None, dtype=object)
+        result[valid] = names[ids[valid]]
+        return result
+
+def load_segment_codes(segment_file, dictionary):
+    """
+    Build an int8 array indexed by donor id holding the segment code
+    (position in SEGMENT_LABELS), or -1 for donors without a segment.
+    Older donor_segments.csv files without Donor_ID are encoded by name.
+    """
+    segments_df = pd.read_csv(segment_file)
+    if 'Donor_ID' in segments_df.columns:
+        ids = segments_df['Donor_ID'].to_numpy(dtype='int64')
+    else:
+        ids = dictionary.encode(segments_df['Donator']).astype('int64')
+
+    codes = pd.Categorical(segments_df['Donor_Segment'], categories=SEGMENT_LABELS).codes
+    segment_codes = np.full(max(len(dictionary), ids.max() + 1 if len(ids) else 0), -1, dtype='int8')
+    known = ids >= 0
+    segment_codes[ids[known]] = codes[known]
+    return segment_codes, len(segments_df)
+
+def lookup_segments(donor_ids, segment_codes):
+    """Vectorized segment lookup: an array gather instead of a per-row dict map."""
+    donor_ids = np.asarray(donor_ids, dtype='int64')
+    codes = np.full(len(donor_ids), -1, dtype='int8')
+    known = (donor_ids >= 0) & (donor_ids < len(segment_codes))
+    codes[known] = segment_codes[donor_ids[known]]
+    return pd.Categorical.from_codes(codes, categories=SEGMENT_LABELS)
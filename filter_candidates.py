@@ -1,59 +1,89 @@
 #!/usr/bin/env python3
 """
-Script to filter US_Election_Donation.csv to keep only rows for 
-LAKE, KARI and GALLEGO, RUBEN candidates.
+Script to filter US_Election_Donation.csv to keep only rows for the given
+candidates (LAKE, KARI and GALLEGO, RUBEN by default).
+With pyarrow the rows are read through the candidate index, so each run
+only reads the matching rows; otherwise the whole file is scanned.
 """
 
+import argparse
 import pandas as pd
-import os
+from candidate_index import pq, read_candidates
+from data_schema import DONATION_STAGE_COLUMNS
+from donation_cache import build_cache, iter_donation_chunks
 
 # File paths
 input_file = "US_Election_Donation.csv"
 output_file = "Filtered_US_Election_Donation.csv"
 
-# Target candidates
+# Default target candidates
 target_candidates = ["LAKE, KARI", "GALLEGO, RUBEN"]
 
-print(f"Reading {input_file}...")
+def parse_args():
+    """Parse command line options."""
+    parser = argparse.ArgumentParser(description="Filter the donation file to a list of candidates.")
+    parser.add_argument('candidates', nargs='*', default=target_candidates,
+                        help="candidate names as they appear in the Candidate column "
+                             f"(default: {'; '.join(target_candidates)})")
+    parser.add_argument('--input', default=input_file, help=f"donation file (default: {input_file})")
+    parser.add_argument('--output', default=output_file, help=f"filtered file (default: {output_file})")
+    return parser.parse_args()
 
-# Read the CSV file
-# Using chunksize for large files to be memory efficient
-chunk_size = 100000
-chunks = []
-total_rows = 0
-filtered_rows = 0
-
-try:
-    for chunk in pd.read_csv(input_file, chunksize=chunk_size, low_memory=False):
+def scan_candidates(input_file, candidates):
+    """Fallback without pyarrow: scan the file in chunks. Returns (filtered_df or None, total_rows)."""
+    # Using chunksize for large files to be memory efficient
+    chunk_size = 100000
+    chunks = []
+    total_rows = 0
+    filtered_rows = 0
+    for chunk in iter_donation_chunks(input_file, columns=DONATION_STAGE_COLUMNS['filter_candidates'],
+                                      chunksize=chunk_size):
         total_rows += len(chunk)
-        # Filter rows where Candidate is in target_candidates
-        filtered_chunk = chunk[chunk['Candidate'].isin(target_candidates)]
+        # Filter rows where Candidate is in candidates
+        filtered_chunk = chunk[chunk['Candidate'].isin(candidates)]
         filtered_rows += len(filtered_chunk)
-        
+
         if len(filtered_chunk) > 0:
             chunks.append(filtered_chunk)
-        
+
         print(f"Processed {total_rows:,} rows, found {filtered_rows:,} matching rows...")
-    
-    if chunks:
-        # Combine all filtered chunks
-        print("Combining filtered data...")
-        filtered_df = pd.concat(chunks, ignore_index=True)
-        
-        # Write back to the same file
-        print(f"Writing filtered data to {output_file}...")
-        filtered_df.to_csv(output_file, index=False)
-        
-        print(f"\nFiltering complete!")
-        print(f"Original rows: {total_rows:,}")
-        print(f"Filtered rows: {filtered_rows:,}")
-        print(f"Rows removed: {total_rows - filtered_rows:,}")
-        print(f"\nKept candidates: {', '.join(target_candidates)}")
-    else:
-        print("No rows found matching the target candidates.")
-        
-except Exception as e:
-    print(f"Error: {e}")
-    raise
 
+    if not chunks:
+        return None, total_rows
+    # Combine all filtered chunks
+    print("Combining filtered data...")
+    return pd.concat(chunks, ignore_index=True), total_rows
+
+def main():
+    """Filter the donation file to the requested candidates."""
+    args = parse_args()
+    print(f"Reading {args.input}...")
+
+    try:
+        if pq is not None:
+            filtered_df = read_candidates(args.input, args.candidates,
+                                          columns=DONATION_STAGE_COLUMNS['filter_candidates'])
+            print(f"Found {len(filtered_df):,} matching rows via the candidate index")
+            filtered_df = filtered_df if len(filtered_df) > 0 else None
+            total_rows = pq.ParquetFile(build_cache(args.input)).metadata.num_rows
+        else:
+            filtered_df, total_rows = scan_candidates(args.input, args.candidates)
+
+        if filtered_df is not None:
+            print(f"Writing filtered data to {args.output}...")
+            filtered_df.to_csv(args.output, index=False)
+
+            print(f"\nFiltering complete!")
+            print(f"Original rows: {total_rows:,}")
+            print(f"Filtered rows: {len(filtered_df):,}")
+            print(f"Rows removed: {total_rows - len(filtered_df):,}")
+            print(f"\nKept candidates: {', '.join(args.candidates)}")
+        else:
+            print("No rows found matching the target candidates.")
+
+    except Exception as e:
+        print(f"Error: {e}")
+        raise
 
+if __name__ == '__main__':
+    main()
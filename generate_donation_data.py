@@ -0,0 +1,183 @@
+#!/usr/bin/env python3
+"""
+Synthetic US_Election_Donation.csv generator.
+Writes files with the production columns at any size (1M/10M/70M rows) so
+the donation pipeline can be benchmarked without the real file:
+- repeated donors with Zipf-like activity and a per-donor typical amount,
+  giving heavy-tailed per-donation and per-donor totals
+- donors mostly giving to one party (DEM/REP with some IND/LIB rows) and to a
+  few popular candidates
+- MDDYYYY / MMDDYYYY Received codes, denser towards election day
+- a small share of malformed dates and amounts, as in the FEC export
+
+Rows are generated and appended in chunks, so memory stays flat with size.
+The same --rows/--seed always produce the same file.
+"""
+
+import argparse
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+CHUNK_ROWS = 1_000_000
+COLUMNS = ['Party', 'Candidate', 'Candidate_ID', 'Donator', 'Received', 'Donation_Amount_USD', 'State']
+
+PARTY_SHARES = {'DEM': 0.48, 'REP': 0.46, 'IND': 0.03, 'LIB': 0.03}
+CANDIDATES_PER_PARTY = {'DEM': 40, 'REP': 40, 'IND': 6, 'LIB': 6}
+# Names used in the docs, so example queries and filters return rows
+KNOWN_CANDIDATES = {'DEM': ['GALLEGO, RUBEN'], 'REP': ['LAKE, KARI']}
+
+SURNAMES = ['SMITH', 'JOHNSON', 'WILLIAMS', 'BROWN', 'JONES', 'GARCIA', 'MILLER', 'DAVIS', 'RODRIGUEZ',
+            'MARTINEZ', 'HERNANDEZ', 'LOPEZ', 'GONZALEZ', 'WILSON', 'ANDERSON', 'THOMAS', 'TAYLOR',
+            'MOORE', 'JACKSON', 'MARTIN', 'LEE', 'PEREZ', 'THOMPSON', 'WHITE', 'HARRIS', 'SANCHEZ',
+            'CLARK', 'RAMIREZ', 'LEWIS', 'ROBINSON', 'WALKER', 'YOUNG', 'ALLEN', 'KING', 'WRIGHT',
+            'SCOTT', 'TORRES', 'NGUYEN', 'HILL', 'FLORES', 'GREEN', 'ADAMS', 'NELSON', 'BAKER']
+FIRST_NAMES = ['JAMES', 'MARY', 'ROBERT', 'PATRICIA', 'JOHN', 'JENNIFER', 'MICHAEL', 'LINDA', 'DAVID',
+               'ELIZABETH', 'WILLIAM', 'BARBARA', 'RICHARD', 'SUSAN', 'JOSEPH', 'JESSICA', 'THOMAS',
+               'SARAH', 'CHARLES', 'KAREN', 'DANIEL', 'LISA', 'MATTHEW', 'NANCY', 'ANTHONY', 'BETTY']
+STATES = ['CA', 'TX', 'FL', 'NY', 'PA', 'IL', 'OH', 'GA', 'NC', 'MI', 'NJ', 'VA', 'WA', 'AZ', 'MA',
+          'TN', 'IN', 'MD', 'MO', 'WI', 'CO', 'MN', 'SC', 'AL', 'LA', 'KY', 'OR', 'OK', 'CT', 'UT',
+          'NV', 'IA', 'AR', 'MS', 'KS', 'NM', 'NE', 'ID', 'WV', 'HI', 'NH', 'ME', 'MT', 'RI', 'DE',
+          'SD', 'ND', 'AK', 'VT', 'WY', 'DC']
+
+def parse_size(text):
+    """Row count from '1M', '500k', '70M' or a plain integer."""
+    text = str(text).strip().upper().replace('_', '').replace(',', '')
+    scale = {'K': 1_000, 'M': 1_000_000, 'B': 1_000_000_000}.get(text[-1:], 1)
+    number = text[:-1] if scale > 1 else text
+    return int(float(number) * scale)
+
+def parse_args():
+    """Parse command line options."""
+    parser = argparse.ArgumentParser(description="Generate a synthetic US_Election_Donation.csv.")
+    parser.add_argument('--rows', default='1M', help="number of rows, e.g. 1M, 10M, 70M (default: 1M)")
+    parser.add_argument('--donors', type=parse_size,
+                        help="number of distinct donors (default: one per 20 rows)")
+    parser.add_argument('--output', type=Path, default=Path('US_Election_Donation.csv'),
+                        help="output CSV (default: US_Election_Donation.csv)")
+    parser.add_argument('--start', default='2021-01-01', help="first donation date (default: 2021-01-01)")
+    parser.add_argument('--end', default='2024-11-05', help="last donation date (default: 2024-11-05)")
+    parser.add_argument('--bad-rate', type=float, default=0.002,
+                        help="share of rows with a malformed date or amount (default: 0.002)")
+    parser.add_argument('--seed', type=int, default=0, help="random seed (default: 0)")
+    return parser.parse_args()
+
+def donor_population(rng, donors):
+    """Per-donor names, sampling CDF, party, typical amount and state."""
+    ids = np.arange(donors)
+    names = (pd.Series(np.array(SURNAMES)[ids % len(SURNAMES)])
+             + ', ' + np.array(FIRST_NAMES)[(ids // len(SURNAMES)) % len(FIRST_NAMES)]
+             + ' ' + pd.Series(ids).astype(str)).to_numpy(dtype=object)
+
+    # Zipf-like activity: a few donors give very often, most give once or twice
+    activity = 1.0 / np.power(rng.permutation(donors) + 1.0, 0.8)
+    cdf = np.cumsum(activity)
+    cdf /= cdf[-1]
+
+    parties = rng.choice(list(PARTY_SHARES), size=donors, p=list(PARTY_SHARES.values()))
+    # Typical gift per donor: lognormal around $50 with a heavy upper tail
+    scales = np.exp(rng.normal(np.log(50), 1.3, donors))
+    states = rng.choice(STATES, size=donors)
+    return names, cdf, parties, scales, states
+
+def candidate_pool(rng):
+    """Per-party candidate names, FEC-style ids and popularity weights."""
+    pool = {}
+    for party, count in CANDIDATES_PER_PARTY.items():
+        names = list(KNOWN_CANDIDATES.get(party, []))
+        while len(names) < count:
+            names.append(f"{rng.choice(SURNAMES)}, {rng.choice(FIRST_NAMES)} {party}{len(names):02d}")
+        ids = [f"{rng.choice(['H', 'S', 'P'])}{rng.integers(0, 10)}{rng.choice(STATES)}{rng.integers(0, 100000):05d}"
+               for _ in names]
+        weights = 1.0 / np.arange(1, count + 1) ** 1.1
+        pool[party] = (np.array(names, dtype=object), np.array(ids, dtype=object), weights / weights.sum())
+    return pool
+
+def day_sampler(rng, start, end):
+    """Sampler of donation days, with volume growing towards the end date."""
+    days = pd.date_range(start, end, freq='D')
+    position = np.linspace(0, 1, len(days))
+    weights = np.exp(3 * position) * (1 + 4 * (position > 0.9))
+    cdf = np.cumsum(weights)
+    cdf /= cdf[-1]
+    codes = (days.month * 1_000_000 + days.day * 10_000 + days.year).to_numpy(dtype='int64')
+    return lambda n: codes[np.searchsorted(cdf, rng.random(n))]
+
+def generate_chunk(rng, rows, population, pool, sample_days, bad_rate):
+    """One chunk of donation rows."""
+    names, cdf, parties, scales, states = population
+    donors = np.minimum(np.searchsorted(cdf, rng.random(rows)), len(cdf) - 1)
+
+    # Mostly the donor's own party, sometimes any party
+    party = parties[donors]
+    switch = rng.random(rows) < 0.08
+    party[switch] = rng.choice(list(PARTY_SHARES), size=switch.sum(), p=list(PARTY_SHARES.values()))
+
+    candidate = np.empty(rows, dtype=object)
+    candidate_id = np.empty(rows, dtype=object)
+    for name, (candidates, ids, weights) in pool.items():
+        rows_in_party = np.flatnonzero(party == name)
+        picks = rng.choice(len(candidates), size=len(rows_in_party), p=weights)
+        candidate[rows_in_party] = candidates[picks]
+        candidate_id[rows_in_party] = ids[picks]
+
+    amounts = np.round(scales[donors] * np.exp(rng.normal(0, 0.6, rows)), 2)
+    amounts = np.clip(amounts, 1, 1_000_000).astype(object)
+    received = sample_days(rows).astype(object)
+
+    # Malformed values the cleaning steps have to drop
+    bad = np.flatnonzero(rng.random(rows) < bad_rate)
+    kinds = rng.integers(0, 4, len(bad))
+    received[bad[kinds == 0]] = 13012023
+    received[bad[kinds == 1]] = np.nan
+    amounts[bad[kinds == 2]] = 'N/A'
+    amounts[bad[kinds == 3]] = -25.0
+
+    return pd.DataFrame({
+        'Party': party,
+        'Candidate': candidate,
+        'Candidate_ID': candidate_id,
+        'Donator': names[donors],
+        'Received': received,
+        'Donation_Amount_USD': amounts,
+        'State': states[donors],
+    }, columns=COLUMNS)
+
+def generate(output, rows, donors=None, start='2021-01-01', end='2024-11-05', bad_rate=0.002, seed=0,
+             progress=True):
+    """Write a synthetic donation file with `rows` rows; returns its size in bytes."""
+    rng = np.random.default_rng(seed)
+    donors = donors or max(1, rows // 20)
+    population = donor_population(rng, donors)
+    pool = candidate_pool(rng)
+    sample_days = day_sampler(rng, start, end)
+
+    output = Path(output)
+    output.parent.mkdir(parents=True, exist_ok=True)
+    written = 0
+    with open(output, 'w', newline='') as handle:
+        while written < rows:
+            size = min(CHUNK_ROWS, rows - written)
+            chunk = generate_chunk(rng, size, population, pool, sample_days, bad_rate)
+            chunk.to_csv(handle, header=written == 0, index=False)
+            written += size
+            if progress and written % (10 * CHUNK_ROWS) == 0:
+                print(f"  Generated {written:,} / {rows:,} rows...")
+    return output.stat().st_size
+
+def main():
+    """Generate the file from the command line options."""
+    args = parse_args()
+    print("="*80)
+    print("GENERATE SYNTHETIC DONATION DATA")
+    print("="*80)
+
+    rows = parse_size(args.rows)
+    donors = args.donors or max(1, rows // 20)
+    print(f"\n  Rows: {rows:,}  Donors: {donors:,}  Dates: {args.start} to {args.end}  Seed: {args.seed}")
+    size = generate(args.output, rows, donors, args.start, args.end, args.bad_rate, args.seed)
+    print(f"\n  ✓ Wrote {args.output} ({size / 1e6:,.1f} MB)")
+
+if __name__ == '__main__':
+    main()
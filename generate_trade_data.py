@@ -0,0 +1,164 @@
+#!/usr/bin/env python3
+"""
+Synthetic Polymarket-style input generator for the trader pipeline.
+Writes the layout build_combined_token.py and the later steps read:
+
+    data/<event>/trades/<market>_trades.csv
+    data/<event>/prices/<market>_price.csv
+    data/<event>/meta/meta_<event>.csv
+
+with a configurable number of events, markets per event, wallets and
+trades per market:
+- wallet activity is Zipf-distributed, so a few wallets trade in most
+  markets and most wallets trade a handful of times
+- each market has a YES/NO token pair whose prices follow a bounded random
+  walk, sampled every few hours in the price file; trades happen near the
+  current price
+- trade sizes are heavy-tailed and most trades are buys
+
+No production data is needed; the same options and seed always produce the
+same files.
+"""
+
+import argparse
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+TRADE_COLUMNS = ['proxyWallet', 'side', 'asset', 'conditionId', 'size', 'price', 'timestamp', 'title',
+                 'slug', 'eventSlug', 'outcome', 'outcomeIndex', 'transactionHash']
+SECONDS_PER_DAY = 86400
+
+def parse_args():
+    """Parse command line options."""
+    parser = argparse.ArgumentParser(description="Generate synthetic Polymarket-style trades, prices and meta.")
+    parser.add_argument('--events', type=int, default=4, help="number of events (default: 4)")
+    parser.add_argument('--markets', type=int, default=5, help="markets per event (default: 5)")
+    parser.add_argument('--wallets', type=int, default=2000, help="number of distinct wallets (default: 2000)")
+    parser.add_argument('--trades', type=int, default=10000, help="trades per market (default: 10000)")
+    parser.add_argument('--days', type=int, default=90, help="trading days before each market closes (default: 90)")
+    parser.add_argument('--price-interval', type=int, default=6,
+                        help="hours between price points (default: 6)")
+    parser.add_argument('--zipf', type=float, default=1.1, help="Zipf exponent of wallet activity (default: 1.1)")
+    parser.add_argument('--output', type=Path, default=Path('data'), help="output directory (default: data)")
+    parser.add_argument('--seed', type=int, default=0, help="random seed (default: 0)")
+    return parser.parse_args()
+
+def random_hex(rng, count, digits):
+    """`count` random lowercase hex strings of `digits` (even) digits with a 0x prefix."""
+    text = rng.bytes(count * digits // 2).hex()
+    return ['0x' + text[i:i + digits] for i in range(0, len(text), digits)]
+
+def token_ids(rng, count):
+    """Polymarket-style 77-digit decimal token ids."""
+    digits = rng.integers(0, 10, size=(count, 77))
+    digits[:, 0] = rng.integers(1, 10, count)
+    return [''.join(map(str, row)) for row in digits]
+
+def wallet_sampler(rng, wallets, exponent):
+    """Sampler of wallet ids with Zipf-distributed activity."""
+    ids = np.array(random_hex(rng, wallets, 40), dtype=object)
+    weights = 1.0 / np.power(rng.permutation(wallets) + 1.0, exponent)
+    cdf = np.cumsum(weights)
+    cdf /= cdf[-1]
+    return lambda n: ids[np.minimum(np.searchsorted(cdf, rng.random(n)), wallets - 1)]
+
+def price_path(rng, start, end, interval_hours):
+    """YES price points between two timestamps (bounded random walk in log-odds)."""
+    timestamps = np.arange(start, end + 1, interval_hours * 3600, dtype='int64')
+    log_odds = rng.normal(0, 1) + np.cumsum(rng.normal(0, 0.08 * np.sqrt(interval_hours), len(timestamps)))
+    return timestamps, np.round(np.clip(1 / (1 + np.exp(-log_odds)), 0.01, 0.99), 4)
+
+def generate_market(rng, event_id, market_num, close, trades, days, price_interval, sample_wallets):
+    """Trades, prices and the meta row of one market."""
+    slug = f'will-{event_id}-outcome-{market_num}'
+    yes_token, no_token = token_ids(rng, 2)
+    condition_id = random_hex(rng, 1, 64)[0]
+    end = int(close.timestamp())
+    start = end - days * SECONDS_PER_DAY
+
+    timestamps, yes_prices = price_path(rng, start - 2 * SECONDS_PER_DAY, end + 2 * SECONDS_PER_DAY,
+                                        price_interval)
+    prices = pd.DataFrame({
+        'timestamp': np.concatenate([timestamps, timestamps]),
+        'price': np.concatenate([yes_prices, np.round(1 - yes_prices, 4)]),
+        'token_id': [yes_token] * len(timestamps) + [no_token] * len(timestamps),
+    }).sort_values('timestamp', kind='stable')
+
+    # Activity picks up towards the close
+    n = trades
+    trade_times = np.sort(end - ((1 - rng.power(3, n)) * days * SECONDS_PER_DAY).astype('int64'))
+    outcome_index = rng.integers(0, 2, n)
+    current_yes = yes_prices[np.clip(np.searchsorted(timestamps, trade_times) - 1, 0, len(timestamps) - 1)]
+    trade_prices = np.where(outcome_index == 0, current_yes, 1 - current_yes) + rng.normal(0, 0.01, n)
+
+    trade_df = pd.DataFrame({
+        'proxyWallet': sample_wallets(n),
+        'side': np.where(rng.random(n) < 0.7, 'BUY', 'SELL'),
+        'asset': np.where(outcome_index == 0, yes_token, no_token),
+        'conditionId': condition_id,
+        'size': np.round(np.exp(rng.normal(3.5, 1.6, n)), 2),
+        'price': np.round(np.clip(trade_prices, 0.001, 0.999), 3),
+        'timestamp': trade_times,
+        'title': f'Will outcome {market_num} happen in {event_id}?',
+        'slug': slug,
+        'eventSlug': event_id,
+        'outcome': np.where(outcome_index == 0, 'Yes', 'No'),
+        'outcomeIndex': outcome_index,
+        'transactionHash': random_hex(rng, n, 64),
+    }, columns=TRADE_COLUMNS)
+
+    meta = {
+        'event_id': event_id,
+        'market_slug': slug,
+        'question': f'Will outcome {market_num} happen in {event_id}?',
+        'condition_id': condition_id,
+        'yes_token_id': yes_token,
+        'no_token_id': no_token,
+        'market_endDate': close.strftime('%Y-%m-%dT%H:%M:%SZ'),
+    }
+    return slug, trade_df, prices, meta
+
+def generate(output, events=4, markets=5, wallets=2000, trades=10000, days=90, price_interval=6, zipf=1.1,
+             seed=0, progress=True):
+    """Write the data/ layout; returns the number of trade rows written."""
+    rng = np.random.default_rng(seed)
+    sample_wallets = wallet_sampler(rng, wallets, zipf)
+    output = Path(output)
+
+    total = 0
+    for event_num in range(events):
+        event_id = f'synthetic-event-{event_num:03d}'
+        for subdir in ('trades', 'prices', 'meta'):
+            (output / event_id / subdir).mkdir(parents=True, exist_ok=True)
+
+        meta_rows = []
+        for market_num in range(markets):
+            close = pd.Timestamp('2024-11-05') + pd.Timedelta(days=int(rng.integers(0, 60)))
+            slug, trade_df, price_df, meta = generate_market(rng, event_id, market_num, close, trades, days,
+                                                             price_interval, sample_wallets)
+            trade_df.to_csv(output / event_id / 'trades' / f'{slug}_trades.csv', index=False)
+            price_df.to_csv(output / event_id / 'prices' / f'{slug}_price.csv', index=False)
+            meta_rows.append(meta)
+            total += len(trade_df)
+        pd.DataFrame(meta_rows).to_csv(output / event_id / 'meta' / f'meta_{event_id}.csv', index=False)
+        if progress:
+            print(f"  [{event_num + 1}/{events}] {event_id}: {markets} markets")
+    return total
+
+def main():
+    """Generate the data directory from the command line options."""
+    args = parse_args()
+    print("="*80)
+    print("GENERATE SYNTHETIC TRADE DATA")
+    print("="*80)
+    print(f"\n  Events: {args.events}  Markets/event: {args.markets}  Wallets: {args.wallets:,}  "
+          f"Trades/market: {args.trades:,}  Seed: {args.seed}\n")
+
+    total = generate(args.output, args.events, args.markets, args.wallets, args.trades, args.days,
+                     args.price_interval, args.zipf, args.seed)
+    print(f"\n  ✓ Wrote {total:,} trades to {args.output}/")
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,107 @@
+#!/usr/bin/env python3
+"""
+Hive-partitioned Parquet datasets shared by the trader stores.
+combined_token_store.py (partitioned by event) and positions_store.py
+(partitioned by event and market) keep their rows in one dataset directory
+each (<key>=<value>/.../part-0.parquet). This module holds what they have in
+common: the dataset path, resetting it, writing one partition and filtered
+reads. The stores only declare their columns, sort order and partition keys.
+
+Without pyarrow a dataset is a single CSV file with the partition keys as
+ordinary columns.
+"""
+
+import shutil
+from pathlib import Path
+
+import pandas as pd
+
+try:
+    import pyarrow as pa
+    import pyarrow.dataset as ds
+    import pyarrow.parquet as pq
+except ImportError:
+    pa = None
+    ds = None
+    pq = None
+
+ROW_GROUP_ROWS = 65_536
+
+def dataset_path(output_dir, name):
+    """Dataset directory (or CSV file when pyarrow is missing) under output_dir."""
+    output_dir = Path(output_dir)
+    if pq is None:
+        return output_dir / f'{name}.csv'
+    return output_dir / name
+
+def reset_dataset(path):
+    """Remove a previous dataset so a run never mixes old and new partitions."""
+    path = Path(path)
+    if path.is_dir():
+        shutil.rmtree(path)
+    elif path.exists():
+        path.unlink()
+
+def _partitioning(keys):
+    """Hive partitioning on the key columns, read back as strings."""
+    return ds.partitioning(pa.schema([(name, pa.string()) for name in keys]), flavor='hive')
+
+def write_partition(rows, path, partition, dictionary_columns=(), date_columns=()):
+    """
+    Write one partition's rows; `partition` maps each key column to its value.
+    dictionary_columns are stored dictionary-encoded and date_columns as days.
+    """
+    path = Path(path)
+    if pq is None:
+        rows = rows.assign(**{name: value for name, value in partition.items()})
+        rows.to_csv(path, mode='a' if path.exists() else 'w', header=not path.exists(), index=False)
+        return
+
+    table = pa.Table.from_pandas(rows.drop(columns=[name for name in partition if name in rows.columns]),
+                                 preserve_index=False)
+    for name in date_columns:
+        table = table.set_column(table.schema.get_field_index(name), name,
+                                 pa.array(pd.to_datetime(rows[name]).to_numpy(dtype='datetime64[D]')))
+    for name in dictionary_columns:
+        table = table.set_column(table.schema.get_field_index(name), name,
+                                 table[name].cast(pa.dictionary(pa.int32(), pa.string())))
+    for name, value in partition.items():
+        table = table.append_column(name, pa.array([str(value)] * len(table), pa.string()))
+    ds.write_dataset(table, path, format='parquet', partitioning=_partitioning(list(partition)),
+                     basename_template='part-{i}.parquet', max_rows_per_group=ROW_GROUP_ROWS,
+                     existing_data_behavior='overwrite_or_ignore')
+
+def partition_values(path, key):
+    """Values of the top-level partition key present in the dataset, in sorted order."""
+    path = Path(path)
+    if path.suffix == '.csv' or pq is None:
+        return sorted(pd.read_csv(path, usecols=[key], dtype=str)[key].unique())
+    return sorted(child.name.split('=', 1)[1] for child in path.iterdir()
+                  if child.is_dir() and child.name.startswith(f'{key}='))
+
+def read_dataset(path, keys, columns, string_columns, filters=None):
+    """
+    Load `columns` of a dataset. `filters` maps a column to the values to keep
+    (None keeps all); filters on partition keys skip whole partitions, others
+    skip the row groups that cannot match. string_columns come back as plain
+    strings.
+    """
+    path = Path(path)
+    filters = {name: [str(value) for value in values]
+               for name, values in (filters or {}).items() if values is not None}
+    if path.suffix == '.csv' or pq is None:
+        df = pd.read_csv(path, dtype={name: str for name in string_columns})
+        for name, values in filters.items():
+            df = df[df[name].isin(values)]
+        return df[columns].reset_index(drop=True)
+
+    expression = None
+    for name, values in filters.items():
+        term = ds.field(name).isin(values)
+        expression = term if expression is None else expression & term
+    dataset = ds.dataset(path, format='parquet', partitioning=_partitioning(keys))
+    df = dataset.to_table(columns=columns, filter=expression).to_pandas()
+    for name in string_columns:
+        if name in df.columns:
+            df[name] = df[name].astype(str)
+    return df
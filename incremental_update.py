@@ -0,0 +1,414 @@
+#!/usr/bin/env python3
+"""
+Incremental refresh of donor segments and donation aggregates.
+Keeps persisted state next to the donation file (per-donor running totals,
+a donor x day x party base table, daily partial sums and a byte
+high-water mark), parses only the rows appended since the last run,
+re-derives the segment thresholds and patches just the aggregates touched
+by the new rows and by donors whose segment moved.
+
+The first run (or a run after the already-processed part of the file
+changed) processes the whole file and seeds the state.
+"""
+
+import argparse
+import hashlib
+import io
+import json
+import shutil
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+from data_schema import DONATION_STAGE_COLUMNS, coerce_donations, donation_text_dtypes
+from donation_aggregates import _merge_sums, cumulative_aggregations
+from donation_base_table import KEY_COLUMNS, accumulator_from_partials, kept_rows, reduce_base_chunk
+from donor_dictionary import SEGMENT_LABELS, DonorDictionary, dictionary_path
+from parallel_ingest import shard_byte_ranges
+from period_rollup import daily_partials
+from sqlite_store import write_table
+
+STATE_DIR_NAME = '.donation_state'
+STATE_VERSION = 3
+PARSE_CHUNK_SIZE = 1_000_000
+DIGEST_SAMPLE_BYTES = 1 << 20
+
+# Same quantiles as segment_election_donors.py
+SEGMENT_QUANTILES = [0.333, 0.666]
+
+# Raw columns needed to update donor totals and the base table
+DELTA_COLUMNS = DONATION_STAGE_COLUMNS['parallel_ingest']
+
+# Merge the saved base table parts into one once there are more than this many
+BASE_PART_LIMIT = 16
+
+# Sentinels for donors without kept rows in the per-donor first/last day arrays
+NO_FIRST_DAY = np.iinfo('int32').max
+NO_LAST_DAY = np.iinfo('int32').min
+
+def state_dir(donation_file):
+    """Location of the incremental state for a donation file."""
+    return Path(donation_file).parent / STATE_DIR_NAME
+
+def prefix_digest(donation_file, offset):
+    """
+    Hash the first MiB and the MiB before `offset`, so edits to rows that
+    were already processed are noticed without rereading the whole prefix.
+    """
+    digest = hashlib.sha256()
+    with open(donation_file, 'rb') as f:
+        digest.update(f.read(min(offset, DIGEST_SAMPLE_BYTES)))
+        tail_start = max(offset - DIGEST_SAMPLE_BYTES, DIGEST_SAMPLE_BYTES)
+        if offset > tail_start:
+            f.seek(tail_start)
+            digest.update(f.read(offset - tail_start))
+    return digest.hexdigest()
+
+def complete_lines_end(donation_file):
+    """Byte offset just past the last complete line (a partly written row is left for the next run)."""
+    with open(donation_file, 'rb') as f:
+        f.seek(0, 2)
+        position = f.tell()
+        while position > 0:
+            step = min(DIGEST_SAMPLE_BYTES, position)
+            f.seek(position - step)
+            block = f.read(step)
+            newline = block.rfind(b'\n')
+            if newline >= 0:
+                return position - step + newline + 1
+            position -= step
+    return 0
+
+class IncrementalState:
+    """Persisted running totals and partial aggregates for the donation file."""
+
+    def __init__(self):
+        self.offset = 0
+        self.digest = None
+        self.total_rows = 0
+        self.thresholds = None
+        self.base_parts = []
+        self.donor_sums = np.zeros(0, dtype='float64')
+        self.donor_counts = np.zeros(0, dtype='int64')
+        self.segment_codes = np.zeros(0, dtype='int8')
+        self.first_day = np.zeros(0, dtype='int32')
+        self.last_day = np.zeros(0, dtype='int32')
+        self.daily = None
+
+    @classmethod
+    def load(cls, path):
+        """Load saved state, or return None if there is none (or it is from another version)."""
+        path = Path(path)
+        try:
+            with open(path / 'state.json') as f:
+                meta = json.load(f)
+        except (OSError, ValueError):
+            return None
+        if meta.get('version') != STATE_VERSION:
+            return None
+
+        state = cls()
+        state.offset = meta['offset']
+        state.digest = meta['digest']
+        state.total_rows = meta['total_rows']
+        state.thresholds = meta['thresholds']
+        state.base_parts = meta['base_parts']
+        with np.load(path / 'donors.npz') as donors:
+            for name in ('donor_sums', 'donor_counts', 'segment_codes', 'first_day', 'last_day'):
+                setattr(state, name, donors[name])
+        state.daily = pd.read_pickle(path / 'daily.pkl')
+        return state
+
+    def save(self, path):
+        """Write the state; state.json goes last so a partial save is never loaded."""
+        path = Path(path)
+        path.mkdir(parents=True, exist_ok=True)
+        np.savez(path / 'donors.npz', donor_sums=self.donor_sums, donor_counts=self.donor_counts,
+                 segment_codes=self.segment_codes, first_day=self.first_day, last_day=self.last_day)
+        self.daily.to_pickle(path / 'daily.pkl')
+        with open(path / 'state.json', 'w') as f:
+            json.dump({
+                'version': STATE_VERSION,
+                'offset': self.offset,
+                'digest': self.digest,
+                'total_rows': self.total_rows,
+                'thresholds': self.thresholds,
+                'base_parts': self.base_parts,
+            }, f, indent=2)
+
+    def grow(self, size):
+        """Extend the per-donor arrays to cover `size` donor ids."""
+        extra = size - len(self.donor_sums)
+        if extra <= 0:
+            return
+        self.donor_sums = np.concatenate([self.donor_sums, np.zeros(extra, dtype='float64')])
+        self.donor_counts = np.concatenate([self.donor_counts, np.zeros(extra, dtype='int64')])
+        self.segment_codes = np.concatenate([self.segment_codes, np.full(extra, -1, dtype='int8')])
+        self.first_day = np.concatenate([self.first_day, np.full(extra, NO_FIRST_DAY, dtype='int32')])
+        self.last_day = np.concatenate([self.last_day, np.full(extra, NO_LAST_DAY, dtype='int32')])
+
+def read_base_parts(path, names):
+    """Concatenate the saved donor x day x party base table parts."""
+    parts = [pd.read_pickle(Path(path) / name) for name in names]
+    return pd.concat(parts, ignore_index=True) if parts else None
+
+def _next_part_name(state):
+    """File name for the next base table part (numbered after the last saved one)."""
+    number = int(state.base_parts[-1][len('base-'):-len('.pkl')]) + 1 if state.base_parts else 0
+    return f'base-{number:05d}.pkl'
+
+def add_base_part(state, path, delta):
+    """
+    Save the appended rows as a new base table part. Past BASE_PART_LIMIT the
+    parts are merged into one, so reading the history never means opening a
+    file per run. Returns the file names that are no longer referenced.
+    """
+    path.mkdir(parents=True, exist_ok=True)
+    name = _next_part_name(state)
+    delta.to_pickle(path / name)
+    state.base_parts.append(name)
+    if len(state.base_parts) <= BASE_PART_LIMIT:
+        return []
+
+    merged = read_base_parts(path, state.base_parts)
+    merged = merged.groupby(['Day', 'Donor_ID', 'Party'], observed=True)[['sum', 'count']].sum().reset_index()
+    stale = state.base_parts
+    state.base_parts = [_next_part_name(state)]
+    merged.to_pickle(path / state.base_parts[0])
+    return stale
+
+def ingest_appended_rows(donation_file, state, dictionary, end):
+    """
+    Parse the rows between the high-water mark and `end`, updating donor
+    totals in place. Returns the new rows reduced to the base table layout.
+    """
+    header, ranges = shard_byte_ranges(donation_file, start=state.offset, end=end)
+    partials = []
+    new_rows = 0
+    with open(donation_file, 'rb') as f:
+        for start, stop in ranges:
+            f.seek(start)
+            data = f.read(stop - start)
+            reader = pd.read_csv(io.BytesIO(header + data), usecols=DELTA_COLUMNS,
+                                 dtype=donation_text_dtypes(DELTA_COLUMNS), chunksize=PARSE_CHUNK_SIZE)
+            for chunk in reader:
+                chunk = coerce_donations(chunk)
+                chunk['Donor_ID'] = dictionary.encode(chunk['Donator'], add=True)
+                new_rows += len(chunk)
+
+                # Running totals use the same rules as segment_election_donors.py
+                state.grow(len(dictionary))
+                ids = chunk['Donor_ID'].to_numpy()
+                known = ids >= 0
+                amounts = chunk['Donation_Amount_USD'].fillna(0).to_numpy()
+                state.donor_sums += np.bincount(ids[known], weights=amounts[known],
+                                                minlength=len(state.donor_sums))
+                state.donor_counts += np.bincount(ids[known], minlength=len(state.donor_counts))
+
+                partials.append(reduce_base_chunk(chunk))
+
+    state.total_rows += new_rows
+    if not partials:
+        return new_rows, None
+    # Same kept-row rules as the full base table; rows without a donor never get a segment
+    delta = kept_rows(pd.concat(partials).groupby(level=KEY_COLUMNS).sum().reset_index())
+    delta = delta[delta['Donor_ID'] >= 0].reset_index(drop=True)
+    return new_rows, (delta if len(delta) else None)
+
+def classify_donors(donor_sums, thresholds):
+    """Segment code per donor id (position in SEGMENT_LABELS, -1 without donations)."""
+    p33_3, p66_6 = thresholds
+    codes = np.where(donor_sums <= p33_3, SEGMENT_LABELS.index('Small'),
+                     np.where(donor_sums <= p66_6, SEGMENT_LABELS.index('Medium'),
+                              SEGMENT_LABELS.index('Large')))
+    return np.where(donor_sums > 0, codes, -1).astype('int8')
+
+def _negate(partials):
+    """Flip the sign of a (sum, count) partial so merging subtracts it."""
+    return None if partials is None else -partials
+
+def _drop_empty(partials, names):
+    """Drop groups whose donation count fell to zero and restore index names."""
+    partials = partials[partials['count'] > 0]
+    partials.index.names = names
+    return partials.sort_index()
+
+def patch_aggregates(state, path, delta, old_codes, new_codes):
+    """
+    Patch the daily partials: move the history of donors whose segment
+    changed, then add the appended rows. Returns the number of moved donors.
+    Donors without earlier kept rows (e.g. brand-new donors) have no history
+    to move, so a batch of only such donors never reads the saved base table.
+    """
+    had_history = state.first_day != NO_FIRST_DAY
+    changed = np.flatnonzero((old_codes != new_codes) & had_history)
+    updates = []
+
+    if len(changed) and state.base_parts:
+        base = read_base_parts(path, state.base_parts)
+        moved = base[np.isin(base['Donor_ID'].to_numpy(), changed)]
+        moved_ids = moved['Donor_ID'].to_numpy()
+        updates.append(_negate(daily_partials(moved, old_codes[moved_ids])))
+        updates.append(daily_partials(moved, new_codes[moved_ids]))
+
+    if delta is not None:
+        updates.append(daily_partials(delta, new_codes[delta['Donor_ID'].to_numpy()]))
+
+    for daily in updates:
+        state.daily = _merge_sums(state.daily, daily)
+    if state.daily is not None:
+        state.daily = _drop_empty(state.daily, ['Day', 'Donor_Segment', 'Party'])
+    return len(changed)
+
+def _update_day_range(state, delta):
+    """Track each donor's first and last kept donation day."""
+    ids = delta['Donor_ID'].to_numpy()
+    days = delta['Day'].to_numpy()
+    np.minimum.at(state.first_day, ids, days)
+    np.maximum.at(state.last_day, ids, days)
+
+def build_accumulator(state):
+    """Roll the patched daily partials up into a DonationAccumulator for output and summaries."""
+    segmented = (state.segment_codes >= 0) & (state.first_day != NO_FIRST_DAY)
+    if state.daily is None or not segmented.any():
+        return None
+    return accumulator_from_partials(state.daily, np.flatnonzero(segmented), state.first_day[segmented].min(),
+                                     state.last_day[segmented].max())
+
+def donor_segments_table(state, dictionary):
+    """Rebuild donor_segments.csv from the running totals."""
+    ids = np.flatnonzero(state.donor_sums > 0)
+    donor_stats = pd.DataFrame({
+        'Donator': dictionary.decode(ids),
+        'Cumulative_Donation_USD': state.donor_sums[ids],
+        'Number_of_Donations': state.donor_counts[ids],
+        'Donor_Segment': np.asarray(SEGMENT_LABELS, dtype=object)[state.segment_codes[ids]],
+        'Donor_ID': ids.astype('int32'),
+    })
+    return donor_stats.sort_values('Cumulative_Donation_USD', ascending=False)
+
+def parse_args():
+    """Parse command line options."""
+    parser = argparse.ArgumentParser(description="Incrementally refresh donor segments and aggregates.")
+    parser.add_argument('--donation-file', type=Path, default=Path('US_Election_Donation.csv'),
+                        help="donation CSV that new filings are appended to")
+    parser.add_argument('--rebuild', action='store_true',
+                        help="discard the saved state and process the whole file")
+    return parser.parse_args()
+
+def main():
+    """Process appended donation rows and patch the derived outputs."""
+    args = parse_args()
+    print("="*80)
+    print("INCREMENTAL DONATION UPDATE")
+    print("="*80)
+
+    donation_file = args.donation_file
+    if not donation_file.exists():
+        print(f"✗ Error: {donation_file} not found")
+        return
+
+    path = state_dir(donation_file)
+    print(f"\n[1/5] Loading incremental state...")
+    state = None if args.rebuild else IncrementalState.load(path)
+    if state is not None and prefix_digest(donation_file, state.offset) != state.digest:
+        print(f"  ⚠ Already-processed rows changed since the last run; rebuilding from scratch")
+        state = None
+    if state is None:
+        shutil.rmtree(path, ignore_errors=True)
+        state = IncrementalState()
+        print(f"  ✓ No usable state, processing the whole file")
+    else:
+        print(f"  ✓ High-water mark: byte {state.offset:,} ({state.total_rows:,} rows)")
+
+    end = complete_lines_end(donation_file)
+    if end <= state.offset:
+        print(f"\n  ✓ No new rows since the last run")
+        return
+
+    print(f"\n[2/5] Reading appended rows ({end - state.offset:,} bytes)...")
+    dictionary_file = dictionary_path(donation_file)
+    dictionary = DonorDictionary.load(dictionary_file)
+    new_rows, delta = ingest_appended_rows(donation_file, state, dictionary, end)
+    print(f"  ✓ Parsed {new_rows:,} new rows")
+
+    print(f"\n[3/5] Updating segment thresholds...")
+    totals = state.donor_sums[state.donor_sums > 0]
+    if len(totals) == 0:
+        print("✗ Error: No donors with donations")
+        return
+    state.thresholds = [float(np.quantile(totals, q)) for q in SEGMENT_QUANTILES]
+    old_codes = state.segment_codes
+    new_codes = classify_donors(state.donor_sums, state.thresholds)
+    print(f"  ✓ 33.3rd percentile threshold: ${state.thresholds[0]:,.2f}")
+    print(f"  ✓ 66.6th percentile threshold: ${state.thresholds[1]:,.2f}")
+
+    print(f"\n[4/5] Patching aggregates...")
+    moved = patch_aggregates(state, path, delta, old_codes, new_codes)
+    state.segment_codes = new_codes
+    print(f"  ✓ Donors moving their history to another segment: {moved:,}")
+
+    stale_parts = []
+    if delta is not None:
+        _update_day_range(state, delta)
+        stale_parts = add_base_part(state, path, delta)
+        if stale_parts:
+            print(f"  ✓ Merged {len(stale_parts)} base table parts into {state.base_parts[0]}")
+
+    print(f"\n[5/5] Writing outputs...")
+    root = donation_file.parent
+    if dictionary.modified or not dictionary_file.exists():
+        dictionary.save(dictionary_file)
+
+    # Every output also goes to the SQLite store when ELECTION_FUNDING_DB is set
+    outputs = {}
+    segment_file = root / 'donor_segments.csv'
+    outputs['donor_segments'] = donor_segments_table(state, dictionary)
+    outputs['donor_segments'].to_csv(segment_file, index=False)
+    print(f"  ✓ Donor segments: {segment_file}")
+
+    accumulator = build_accumulator(state)
+    if accumulator is None:
+        print("✗ Error: No segmented donations to aggregate")
+        return
+    series_dir = root / 'donation_time_series_data'
+    series_dir.mkdir(exist_ok=True)
+    outputs['weekly_aggregations'] = accumulator.weekly_aggregations()
+    outputs['monthly_aggregations'] = accumulator.monthly_aggregations()
+    outputs['weekly_aggregations'].to_csv(series_dir / 'weekly_aggregations.csv', index=False)
+    outputs['monthly_aggregations'].to_csv(series_dir / 'monthly_aggregations.csv', index=False)
+    print(f"  ✓ Weekly/monthly aggregations: {series_dir}")
+
+    cumulative_dir = root / 'cumulative_ratio_analysis' / 'output'
+    cumulative_dir.mkdir(parents=True, exist_ok=True)
+    outputs['weekly_cumulative_aggregations'] = cumulative_aggregations(accumulator.weekly, 'Year_Week')
+    outputs['monthly_cumulative_aggregations'] = cumulative_aggregations(accumulator.monthly, 'Year_Month')
+    outputs['weekly_cumulative_aggregations'].to_csv(
+        cumulative_dir / 'weekly_cumulative_aggregations.csv', index=False)
+    outputs['monthly_cumulative_aggregations'].to_csv(
+        cumulative_dir / 'monthly_cumulative_aggregations.csv', index=False)
+    print(f"  ✓ Cumulative aggregations: {cumulative_dir}")
+
+    for name, table in outputs.items():
+        db = write_table(name, table)
+        if db is not None:
+            print(f"  ✓ Stored {name} in {db}")
+
+    state.offset = end
+    state.digest = prefix_digest(donation_file, end)
+    state.save(path)
+    # Merged parts are only removed once the saved state no longer refers to them
+    for name in stale_parts:
+        (path / name).unlink(missing_ok=True)
+
+    print(f"\n{'='*80}")
+    print("SUMMARY STATISTICS")
+    print(f"{'='*80}\n")
+    accumulator.print_summary()
+
+    print(f"\n{'='*80}")
+    print(f"✓ COMPLETED: Processed {new_rows:,} new rows")
+    print(f"{'='*80}")
+
+if __name__ == '__main__':
+    main()
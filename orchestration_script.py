@@ -53,8 +53,9 @@ def main():
     
     # Define the pipeline steps
     steps = [
-        ("build_combined_token.py", "Step 0a: Generate combined_token.csv files from trades"),
-        ("build_date_group_token.py", "Step 0b: Generate date_group_token.csv files with value calculations"),
+        ("build_combined_token.py", "Step 0a: Build the combined token store and token map from trades"),
+        ("closing_price_index.py", "Step 0b: Build the closing price index of every market"),
+        ("build_date_group_token.py", "Step 0c: Generate date_group_token.csv files with value calculations"),
         ("analyze_all_users.py", "Step 1a: Analyze all users and calculate statistics"),
         ("segment_users.py", "Step 1b: Classify users into segments"),
         ("build_segment_positions_data.py", "Step 2: Build segment positions data"),
@@ -107,10 +108,12 @@ def main():
     
     # List generated outputs
     print("Generated outputs:")
-    print("- combined_token_output/")
+    print("- combined_token_output/combined_tokens/ (one Parquet partition per event)")
+    print("- combined_token_output/token_map.csv (asset/outcome pairs per market)")
+    print("- .price_index/ (end-of-day prices per market, token type and day)")
     print("- date_group_token_output/")
     print("- all_users_analysis.csv")
-    print("- data_segment_output/")
+    print("- data_segment_output/positions/ (one Parquet partition per market)")
     print("- data_segment/ (with CSV files and comparison graphs)")
     print()
     
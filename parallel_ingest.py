@@ -0,0 +1,200 @@
+#!/usr/bin/env python3
+"""
+Process-parallel ingestion of the donation CSV by byte-range sharding.
+Splits the file into newline-aligned byte ranges, parses and filters each
+range in a process pool (party filter, date decode, amount coercion, segment
+mapping) and writes the cleaned rows as parts named in shard order, so the
+processed export does not depend on the number of workers. The aggregates
+come from the base table, which donation_base_table.py builds from
+row-aligned shards of this module (shard_row_ranges) with workers > 1.
+
+Assumes one record per line (no newlines inside quoted fields), which holds
+for the FEC-derived donation export.
+"""
+
+import io
+import multiprocessing as mp
+import os
+import shutil
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+from data_schema import DONATION_STAGE_COLUMNS, coerce_donations, donation_text_dtypes
+from donation_aggregates import clean_donation_chunk
+from donor_dictionary import DonorDictionary, dictionary_path, load_segment_codes
+from processed_donations import reset_processed, write_processed_part
+
+SHARD_BYTES = 64 << 20
+PARSE_CHUNK_SIZE = 1_000_000
+RAW_COLUMNS = DONATION_STAGE_COLUMNS['parallel_ingest']
+
+# Donor dictionary and id-indexed segment codes shared with workers
+# (inherited on fork, loaded by the initializer otherwise)
+_SEGMENTS = {}
+
+def load_segment_lookup(csv_file, segment_file):
+    """Donor dictionary of the donation file and its id-indexed segment codes."""
+    dictionary = DonorDictionary.load(dictionary_path(csv_file))
+    segment_codes, _ = load_segment_codes(segment_file, dictionary)
+    return {'dictionary': dictionary, 'codes': segment_codes}
+
+def _init_worker(csv_file, segment_file):
+    """Pool initializer for start methods that do not inherit parent memory."""
+    if not _SEGMENTS:
+        _SEGMENTS.update(load_segment_lookup(csv_file, segment_file))
+
+def shard_byte_ranges(csv_file, shard_bytes=SHARD_BYTES, start=None, end=None):
+    """
+    Split the CSV body into (start, end) byte ranges that begin and end on
+    line boundaries. Returns (header_line, ranges). `start`/`end` restrict
+    the split to a line-aligned part of the body (e.g. appended rows).
+    """
+    size = os.path.getsize(csv_file) if end is None else end
+    with open(csv_file, 'rb') as f:
+        header = f.readline()
+        body_start = f.tell() if start is None else max(start, f.tell())
+        boundaries = [body_start]
+        position = body_start + shard_bytes
+        while position < size:
+            # Step back one byte so a range that already starts a line is kept
+            f.seek(position - 1)
+            f.readline()
+            boundary = f.tell()
+            if boundary >= size:
+                break
+            if boundary > boundaries[-1]:
+                boundaries.append(boundary)
+            position = boundary + shard_bytes
+    boundaries.append(size)
+    ranges = [(start, end) for start, end in zip(boundaries[:-1], boundaries[1:]) if end > start]
+    return header, ranges
+
+def shard_row_ranges(csv_file, rows_per_shard=PARSE_CHUNK_SIZE, block_bytes=SHARD_BYTES):
+    """
+    Split the CSV body into (start, end) byte ranges of `rows_per_shard` lines
+    each. Costs one sequential scan for newlines, but every shard then holds
+    exactly the rows of one chunk of a serial reader with the same chunk size.
+    Returns (header_line, ranges).
+    """
+    with open(csv_file, 'rb') as f:
+        header = f.readline()
+        position = f.tell()
+        boundaries = [position]
+        remaining = rows_per_shard
+        while True:
+            block = f.read(block_bytes)
+            if not block:
+                break
+            newlines = np.flatnonzero(np.frombuffer(block, dtype=np.uint8) == ord('\n'))
+            # Cut right after every rows_per_shard-th line end
+            while len(newlines) >= remaining:
+                boundaries.append(position + int(newlines[remaining - 1]) + 1)
+                newlines = newlines[remaining:]
+                remaining = rows_per_shard
+            remaining -= len(newlines)
+            position += len(block)
+    boundaries.append(position)
+    ranges = [(start, end) for start, end in zip(boundaries[:-1], boundaries[1:]) if end > start]
+    return header, ranges
+
+def _ingest_shard(task):
+    """Parse, filter and write one byte range. Runs in a worker process."""
+    csv_file, header, start, end, shard_index, part_target = task
+    with open(csv_file, 'rb') as f:
+        f.seek(start)
+        data = f.read(end - start)
+
+    kept = 0
+    skipped = 0
+    wrote_rows = False
+    reader = pd.read_csv(io.BytesIO(header + data), usecols=RAW_COLUMNS,
+                         dtype=donation_text_dtypes(RAW_COLUMNS),
+                         chunksize=PARSE_CHUNK_SIZE)
+    for chunk_num, chunk in enumerate(reader):
+        # Same coercions as the Parquet cache
+        chunk = coerce_donations(chunk)
+        # Donor_ID is the donor dictionary id, as in the Parquet cache
+        chunk['Donor_ID'] = _SEGMENTS['dictionary'].encode(chunk['Donator'])
+
+        chunk, chunk_skipped = clean_donation_chunk(chunk, _SEGMENTS['codes'])
+        skipped += chunk_skipped
+        if len(chunk) == 0:
+            continue
+
+        kept += len(chunk)
+        if part_target is not None:
+            output = chunk.drop(columns='Donor_ID')
+            output.insert(1, 'Donator', _SEGMENTS['dictionary'].decode(chunk['Donor_ID'].to_numpy()))
+            # Part names sort by shard, then chunk, i.e. in original file order
+            write_processed_part(output, part_target, f'{shard_index:05d}-{chunk_num:03d}')
+            wrote_rows = True
+
+    return kept, skipped, part_target if wrote_rows else None
+
+def ingest_parallel(csv_file, segment_file, workers=None, processed_file=None,
+                    shard_bytes=SHARD_BYTES):
+    """
+    Ingest the donation CSV with a process pool. Returns (kept_rows, skipped_rows).
+    The donor dictionary of csv_file must already exist (the base table writes it).
+    When processed_file is given (see processed_donations.processed_path), the
+    cleaned rows are written there: workers add their own parts to a Parquet
+    dataset directly, while the CSV fallback writes per-shard files that are
+    concatenated in order.
+    """
+    workers = workers or os.cpu_count() or 1
+    csv_file = str(csv_file)
+    header, ranges = shard_byte_ranges(csv_file, shard_bytes)
+
+    parts_dir = None
+    if processed_file is not None:
+        reset_processed(processed_file)
+        if Path(processed_file).suffix == '.csv':
+            parts_dir = Path(processed_file).parent / f'.{Path(processed_file).stem}_parts'
+            shutil.rmtree(parts_dir, ignore_errors=True)
+            parts_dir.mkdir(parents=True)
+
+    def part_target(i):
+        if parts_dir is not None:
+            return str(parts_dir / f'part-{i:05d}.csv')
+        return str(processed_file) if processed_file is not None else None
+
+    tasks = [(csv_file, header, start, end, i, part_target(i))
+             for i, (start, end) in enumerate(ranges)]
+
+    # Fork lets workers share the parent's segment lookup without reloading it
+    _SEGMENTS.clear()
+    if 'fork' in mp.get_all_start_methods():
+        _SEGMENTS.update(load_segment_lookup(csv_file, segment_file))
+        context = mp.get_context('fork')
+    else:
+        context = mp.get_context()
+
+    total_kept = 0
+    total_skipped = 0
+    part_files = []
+    with context.Pool(workers, initializer=_init_worker, initargs=(csv_file, str(segment_file))) as pool:
+        # imap keeps shard order, so CSV parts are concatenated in file order
+        for shard_num, (kept, skipped, part_file) in enumerate(pool.imap(_ingest_shard, tasks), 1):
+            total_kept += kept
+            total_skipped += skipped
+            if part_file is not None:
+                part_files.append(part_file)
+            if shard_num % 10 == 0 or shard_num == len(tasks):
+                print(f"  Shards: {shard_num}/{len(tasks)} "
+                      f"(kept: {total_kept:,}, skipped: {total_skipped:,})")
+
+    if parts_dir is not None:
+        _concat_parts(part_files, processed_file)
+        shutil.rmtree(parts_dir, ignore_errors=True)
+
+    return total_kept, total_skipped
+
+def _concat_parts(part_files, processed_file):
+    """Concatenate per-shard CSV parts, keeping only the first header."""
+    with open(processed_file, 'wb') as out:
+        for i, part_file in enumerate(part_files):
+            with open(part_file, 'rb') as part:
+                if i > 0:
+                    part.readline()
+                shutil.copyfileobj(part, out)
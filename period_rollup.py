@@ -0,0 +1,117 @@
+#!/usr/bin/env python3
+"""
+Daily donation partials and the period rollups derived from them.
+The daily (Day, Donor_Segment, Party) sums and counts are the single base
+level for the time series; weekly, monthly, quarterly and election-cycle
+partials are rolled up from it with integer period keys computed once per
+distinct day. Only the final index is turned into string labels.
+
+Adding a frequency means adding one entry to FREQUENCIES.
+"""
+
+import numpy as np
+import pandas as pd
+from donor_dictionary import SEGMENT_LABELS
+
+def civil_years(days):
+    """Calendar year of each day (days since 1970-01-01)."""
+    return np.asarray(days).astype('datetime64[D]').astype('datetime64[Y]').astype('int64') + 1970
+
+def week_keys(days):
+    """
+    ISO year * 100 + ISO week number, so days around New Year land in the
+    week they belong to (2024-12-30 is 2025-W01, 2021-01-01 is 2020-W53).
+    """
+    days = np.asarray(days, dtype='int64')
+    # 1970-01-01 was a Thursday; ISO weeks belong to the year of their Thursday
+    thursdays = days - (days + 3) % 7 + 3
+    iso_years = civil_years(thursdays)
+    year_starts = (iso_years - 1970).astype('datetime64[Y]').astype('datetime64[D]').astype('int64')
+    weeks = (thursdays - year_starts) // 7 + 1
+    return iso_years * 100 + weeks
+
+def week_labels(keys):
+    """YYYY-Www labels for week keys."""
+    return [f'{key // 100}-W{key % 100:02d}' for key in keys]
+
+def month_keys(days):
+    """Months since 1970-01."""
+    return np.asarray(days).astype('datetime64[D]').astype('datetime64[M]').astype('int64')
+
+def month_labels(keys):
+    """YYYY-MM labels for month keys."""
+    return list(np.datetime_as_string(np.asarray(keys, dtype='int64').astype('datetime64[M]'), unit='M'))
+
+def quarter_keys(days):
+    """Quarters since 1970-Q1."""
+    return month_keys(days) // 3
+
+def quarter_labels(keys):
+    """YYYY-Qn labels for quarter keys."""
+    return [f'{1970 + key // 4}-Q{key % 4 + 1}' for key in keys]
+
+def cycle_keys(days):
+    """Two-year federal election cycle, named by its (even) election year."""
+    years = civil_years(days)
+    return years + years % 2
+
+def cycle_labels(keys):
+    """Election year labels for cycle keys."""
+    return [str(key) for key in keys]
+
+# frequency -> (period column, day -> integer key, keys -> labels)
+FREQUENCIES = {
+    'weekly': ('Year_Week', week_keys, week_labels),
+    'monthly': ('Year_Month', month_keys, month_labels),
+    'quarterly': ('Year_Quarter', quarter_keys, quarter_labels),
+    'cycle': ('Election_Cycle', cycle_keys, cycle_labels),
+}
+
+def period_label_column(days, frequency):
+    """
+    Per-row period labels for day numbers, as a Categorical. Keys are
+    computed per distinct day and only the distinct keys are formatted, so
+    rows share a few label strings instead of each allocating its own.
+    """
+    _, key_function, label_function = FREQUENCIES[frequency]
+    unique_days, day_positions = np.unique(np.asarray(days, dtype='int64'), return_inverse=True)
+    unique_keys, key_positions = np.unique(key_function(unique_days), return_inverse=True)
+    return pd.Categorical.from_codes(key_positions[day_positions], categories=label_function(unique_keys))
+
+def daily_partials(rows, codes):
+    """
+    Daily (sum, count) partials of kept base rows (Day, Party, sum, count),
+    keyed by (Day, Donor_Segment, Party) with the given per-row segment codes.
+    Rows with a negative code have no segment and are dropped.
+    """
+    rows = rows[codes >= 0]
+    codes = codes[codes >= 0]
+    if len(rows) == 0:
+        return None
+
+    segments = pd.Categorical.from_codes(codes, categories=SEGMENT_LABELS)
+    values = rows[['sum', 'count']].reset_index(drop=True)
+    daily = values.groupby([rows['Day'].to_numpy(), segments, rows['Party'].to_numpy()],
+                           observed=True).sum()
+    daily.index.names = ['Day', 'Donor_Segment', 'Party']
+    return daily
+
+def rollup(daily, frequency):
+    """
+    Roll daily partials up to one of FREQUENCIES, keyed by the period label
+    followed by the other index levels of `daily` (e.g. Donor_Segment, Party),
+    in period order.
+    """
+    period_col, key_function, label_function = FREQUENCIES[frequency]
+    levels = [name for name in daily.index.names if name != 'Day']
+    # Key each distinct day once, then gather
+    unique_days, inverse = np.unique(daily.index.get_level_values('Day').to_numpy(), return_inverse=True)
+    keys = key_function(unique_days)[inverse]
+    rolled = daily.groupby([keys] + [daily.index.get_level_values(name) for name in levels],
+                           observed=True).sum()
+    unique_keys, key_positions = np.unique(rolled.index.get_level_values(0).to_numpy(), return_inverse=True)
+    labels = np.asarray(label_function(unique_keys), dtype=object)[key_positions]
+    rolled.index = pd.MultiIndex.from_arrays(
+        [labels] + [rolled.index.get_level_values(i + 1) for i in range(len(levels))],
+        names=[period_col] + levels)
+    return rolled
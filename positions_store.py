@@ -0,0 +1,62 @@
+#!/usr/bin/env python3
+"""
+Single columnar dataset for the per-user segment positions.
+build_segment_positions_data.py writes every wallet's day_offset rows of a
+market into one partition of data_segment_output/positions/
+(event_id=<event>/market_slug=<market>/part-0.parquet), sorted by wallet and
+day_offset, instead of one user_<id>.csv per wallet per market.
+build_segment_aggregation_data.py loads the whole dataset with one read.
+
+Without pyarrow the rows go to data_segment_output/positions.csv instead
+(see hive_dataset.py).
+"""
+
+import sys
+from pathlib import Path
+
+from hive_dataset import dataset_path, read_dataset, write_partition
+
+DATASET_NAME = 'positions'
+POSITION_COLUMNS = ['user_id', 'day_offset', 'yes_cumulative_position', 'no_cumulative_position',
+                    'individual_yes_position', 'individual_no_position', 'yes_price', 'no_price']
+SORT_COLUMNS = ['user_id', 'day_offset']
+PARTITION_COLUMNS = ['event_id', 'market_slug']
+STRING_COLUMNS = ['user_id', 'event_id', 'market_slug']
+
+def positions_path(output_dir='data_segment_output'):
+    """Dataset directory (or CSV file when pyarrow is missing) for the position rows."""
+    return dataset_path(output_dir, DATASET_NAME)
+
+def write_market_positions(rows, path, event_id, market_slug):
+    """Write one market's position rows (POSITION_COLUMNS), sorted by wallet and day_offset."""
+    rows = rows[POSITION_COLUMNS].sort_values(SORT_COLUMNS, kind='stable')
+    write_partition(rows, path, {'event_id': event_id, 'market_slug': market_slug},
+                    dictionary_columns=['user_id'])
+
+def read_positions(path, events=None, users=None, columns=None):
+    """
+    Load position rows with their event_id and market_slug, optionally only
+    for some events or wallets.
+    """
+    return read_dataset(path, PARTITION_COLUMNS, columns or POSITION_COLUMNS + PARTITION_COLUMNS,
+                        STRING_COLUMNS, {'event_id': events, 'user_id': users})
+
+def main():
+    """Print per-market row and wallet counts of the positions dataset."""
+    print("="*80)
+    print("POSITIONS DATASET")
+    print("="*80)
+
+    path = Path(sys.argv[1]) if len(sys.argv) > 1 else positions_path()
+    if not path.exists():
+        print(f"✗ Error: {path} not found")
+        print("  Run build_segment_positions_data.py first")
+        return
+
+    df = read_positions(path, columns=['user_id'] + PARTITION_COLUMNS)
+    for (event_id, market_slug), rows in df.groupby(PARTITION_COLUMNS):
+        print(f"  {event_id}/{market_slug}: {len(rows):,} rows, {rows['user_id'].nunique():,} wallets")
+    print(f"\n  ✓ {len(df):,} rows in {path}")
+
+if __name__ == '__main__':
+    main()
@@ -5,47 +5,65 @@ Processes ~70M donation records and creates weekly/monthly aggregations
 by party and donor segment.
 """
 
-import pandas as pd
-import numpy as np
+import argparse
 from pathlib import Path
 from datetime import datetime
 import warnings
+from data_schema import DONATION_STAGE_COLUMNS
+from donation_cache import iter_donation_chunks
+from donation_aggregates import clean_donation_chunk
+from donation_base_table import base_accumulator, load_base_table
+from donor_dictionary import DonorDictionary, dictionary_path, load_segment_codes
+from parallel_ingest import ingest_parallel
+from period_rollup import FREQUENCIES
+from processed_donations import processed_path, reset_processed, write_processed_part
+from sqlite_store import write_table
 warnings.filterwarnings('ignore')
 
-def parse_date(date_str):
-    """
-    Parse date from MMDDYYYY format (e.g., 7312023 = July 31, 2023)
-    Handles various formats including MDDYYYY, MMDDYYYY, etc.
-    """
-    if pd.isna(date_str):
-        return pd.NaT
-    
-    date_str = str(int(date_str))
-    
-    # Pad to ensure we have at least 7 digits (MDDYYYY)
-    if len(date_str) < 7:
-        return pd.NaT
-    
-    try:
-        # Try MMDDYYYY format (8 digits)
-        if len(date_str) == 8:
-            month = int(date_str[:2])
-            day = int(date_str[2:4])
-            year = int(date_str[4:])
-        # Try MDDYYYY format (7 digits)
-        elif len(date_str) == 7:
-            month = int(date_str[0])
-            day = int(date_str[1:3])
-            year = int(date_str[3:])
-        else:
-            return pd.NaT
+# Raw columns used by this stage (read from the columnar cache)
+DONATION_COLUMNS = DONATION_STAGE_COLUMNS['time_series']
+
+def parse_args():
+    """Parse command line options."""
+    parser = argparse.ArgumentParser(description="Prepare donation time series aggregations.")
+    parser.add_argument('--workers', type=int, default=1,
+                        help="build the base table and write the processed rows from parallel byte-range "
+                             "shards with this many processes")
+    parser.add_argument('--extra-frequencies', nargs='*', default=[],
+                        choices=[name for name in FREQUENCIES if name not in ('weekly', 'monthly')],
+                        help="also write <frequency>_aggregations.csv, rolled up from the daily partials")
+    return parser.parse_args()
+
+def ingest_serial(donation_file, dictionary, segment_codes, processed_file):
+    """Stream the cached donation file into the processed donation dataset in this process."""
+    # Stream chunks: each one is added to the processed dataset, so memory
+    # stays flat with input size
+    chunk_size = 1_000_000
+    total_written = 0
+    total_skipped = 0
+    reset_processed(processed_file)
+    
+    chunk_iter = iter_donation_chunks(donation_file, columns=DONATION_COLUMNS, chunksize=chunk_size)
+    
+    for chunk_num, chunk in enumerate(chunk_iter, 1):
+        chunk, skipped = clean_donation_chunk(chunk, segment_codes)
+        total_skipped += skipped
         
-        return pd.Timestamp(year=year, month=month, day=day)
-    except:
-        return pd.NaT
+        if len(chunk) > 0:
+            output = chunk.drop(columns='Donor_ID')
+            output.insert(1, 'Donator', dictionary.decode(chunk['Donor_ID'].to_numpy()))
+            write_processed_part(output, processed_file, f'{chunk_num:05d}')
+            total_written += len(chunk)
+        
+        if chunk_num % 10 == 0:
+            print(f"  Processed {chunk_num * chunk_size:,} records... "
+                  f"(kept: {total_written:,}, skipped: {total_skipped:,})")
+    
+    return total_written, total_skipped
 
 def main():
     """Main function to prepare time series data."""
+    args = parse_args()
     print("="*80)
     print("PREPARE DONATION TIME SERIES DATA")
     print("="*80)
@@ -63,96 +81,45 @@ def main():
         print("  Run segment_election_donors.py first to create donor segments")
         return
     
-    print(f"\n[1/5] Loading donor segments...")
-    segments_df = pd.read_csv(segment_file)
-    print(f"  ✓ Loaded {len(segments_df):,} donor segments")
-    
-    # Create a dictionary for fast lookup
-    donor_segments = dict(zip(segments_df['Donator'], segments_df['Donor_Segment']))
-    
-    print(f"\n[2/5] Processing donation data in chunks...")
-    print(f"  Reading from: {donation_file}")
-    
-    # Process in chunks to handle large file
-    chunk_size = 1_000_000
-    all_processed = []
-    total_processed = 0
-    total_skipped = 0
-    
-    chunk_iter = pd.read_csv(donation_file, chunksize=chunk_size, low_memory=False)
-    
-    for chunk_num, chunk in enumerate(chunk_iter, 1):
-        # Filter for only DEM and REP parties
-        chunk = chunk[chunk['Party'].isin(['DEM', 'REP'])].copy()
-        
-        # Parse dates
-        chunk['Date'] = chunk['Received'].apply(parse_date)
-        
-        # Filter out invalid dates and amounts
-        chunk = chunk[chunk['Date'].notna()].copy()
-        chunk['Donation_Amount_USD'] = pd.to_numeric(chunk['Donation_Amount_USD'], errors='coerce')
-        chunk = chunk[chunk['Donation_Amount_USD'] > 0].copy()
-        
-        # Add donor segment
-        chunk['Donor_Segment'] = chunk['Donator'].map(donor_segments)
-        
-        # Keep only donors with segments
-        before_filter = len(chunk)
-        chunk = chunk[chunk['Donor_Segment'].notna()].copy()
-        skipped = before_filter - len(chunk)
-        total_skipped += skipped
-        
-        if len(chunk) > 0:
-            # Ensure Date column is datetime type
-            chunk['Date'] = pd.to_datetime(chunk['Date'])
-            
-            # Extract week and month
-            chunk['Year'] = chunk['Date'].dt.year
-            chunk['Week'] = chunk['Date'].dt.isocalendar().week
-            chunk['Month'] = chunk['Date'].dt.month
-            chunk['Year_Week'] = chunk['Year'].astype(str) + '-W' + chunk['Week'].astype(str).str.zfill(2)
-            chunk['Year_Month'] = chunk['Date'].dt.to_period('M').astype(str)
-            
-            # Keep only needed columns
-            chunk = chunk[['Party', 'Donator', 'Donation_Amount_USD', 'Donor_Segment', 
-                          'Date', 'Year_Week', 'Year_Month']].copy()
-            
-            all_processed.append(chunk)
-            total_processed += len(chunk)
-        
-        if chunk_num % 10 == 0:
-            print(f"  Processed {chunk_num * chunk_size:,} records... "
-                  f"(kept: {total_processed:,}, skipped: {total_skipped:,})")
-    
-    print(f"\n  ✓ Total processed: {total_processed:,} records")
-    print(f"  ✓ Skipped (no segment): {total_skipped:,} records")
-    
-    if not all_processed:
+    output_dir = Path('donation_time_series_data')
+    output_dir.mkdir(exist_ok=True)
+    # Partitioned by Year_Month/Party (processed_donations.csv without pyarrow)
+    processed_file = processed_path(output_dir)
+    
+    print(f"\n[1/4] Loading the base table and donor segments...")
+    # Aggregates only need the cached base table, not the raw rows; building
+    # it also writes the donor dictionary its ids refer to
+    base = load_base_table(donation_file, workers=args.workers)
+    # Segments are looked up by integer donor id; names are only joined back on output
+    dictionary = DonorDictionary.load(dictionary_path(donation_file))
+    segment_codes, segment_count = load_segment_codes(segment_file, dictionary)
+    print(f"  ✓ Loaded {segment_count:,} donor segments")
+    
+    print(f"\n[2/4] Aggregating the donor x day x party base table...")
+    accumulator, total_skipped = base_accumulator(base, segment_codes)
+    
+    if accumulator is None:
         print("✗ Error: No valid data to process")
         return
     
-    print(f"\n[3/5] Combining processed chunks...")
-    df = pd.concat(all_processed, ignore_index=True)
-    print(f"  ✓ Combined {len(df):,} records")
-    
-    # Save intermediate processed data
-    print(f"\n[4/5] Saving processed data...")
-    output_dir = Path('donation_time_series_data')
-    output_dir.mkdir(exist_ok=True)
+    print(f"\n  ✓ Total processed: {accumulator.total_rows:,} records")
+    print(f"  ✓ Skipped (no segment): {total_skipped:,} records")
     
-    processed_file = output_dir / 'processed_donations.csv'
-    df.to_csv(processed_file, index=False)
+    # The row-level export is the only step that still reads every raw row
+    if args.workers > 1:
+        print(f"\n[3/4] Writing processed data with {args.workers} worker processes...")
+        ingest_parallel(donation_file, segment_file, args.workers, processed_file)
+    else:
+        print(f"\n[3/4] Writing processed data in chunks...")
+        print(f"  Reading from: {donation_file}")
+        ingest_serial(donation_file, dictionary, segment_codes, processed_file)
     print(f"  ✓ Saved to {processed_file}")
     
-    print(f"\n[5/5] Creating aggregations...")
-    
-    # Weekly aggregations by segment and party
-    weekly_agg = df.groupby(['Year_Week', 'Donor_Segment', 'Party'])['Donation_Amount_USD'].sum().reset_index()
-    weekly_agg.columns = ['Year_Week', 'Donor_Segment', 'Party', 'Total_Donation']
+    print(f"\n[4/4] Creating aggregations...")
     
-    # Monthly aggregations by segment and party
-    monthly_agg = df.groupby(['Year_Month', 'Donor_Segment', 'Party'])['Donation_Amount_USD'].sum().reset_index()
-    monthly_agg.columns = ['Year_Month', 'Donor_Segment', 'Party', 'Total_Donation']
+    # Weekly and monthly aggregations by segment and party
+    weekly_agg = accumulator.weekly_aggregations()
+    monthly_agg = accumulator.monthly_aggregations()
     
     # Save aggregations
     weekly_file = output_dir / 'weekly_aggregations.csv'
@@ -163,32 +130,25 @@ def main():
     
     print(f"  ✓ Weekly aggregations: {weekly_file}")
     print(f"  ✓ Monthly aggregations: {monthly_file}")
+    write_table('weekly_aggregations', weekly_agg)
+    db = write_table('monthly_aggregations', monthly_agg)
+    
+    # Further periods are cheap rollups of the same daily partials
+    for frequency in args.extra_frequencies:
+        period_file = output_dir / f'{frequency}_aggregations.csv'
+        period_agg = accumulator.period_aggregations(frequency)
+        period_agg.to_csv(period_file, index=False)
+        write_table(f'{frequency}_aggregations', period_agg)
+        print(f"  ✓ {frequency.capitalize()} aggregations: {period_file}")
+    if db is not None:
+        print(f"  ✓ Stored aggregations in {db}")
     
     # Generate summary statistics
     print(f"\n{'='*80}")
     print("SUMMARY STATISTICS")
     print(f"{'='*80}\n")
     
-    print(f"Total donations processed: {len(df):,}")
-    print(f"Date range: {df['Date'].min().date()} to {df['Date'].max().date()}")
-    print(f"\nDonations by Party:")
-    party_summary = df.groupby('Party')['Donation_Amount_USD'].agg(['sum', 'count'])
-    for party in party_summary.index:
-        total = party_summary.loc[party, 'sum']
-        count = party_summary.loc[party, 'count']
-        print(f"  {party}: ${total:,.2f} ({count:,} donations)")
-    
-    print(f"\nDonations by Segment:")
-    segment_summary = df.groupby('Donor_Segment')['Donation_Amount_USD'].agg(['sum', 'count'])
-    for segment in ['Small', 'Medium', 'Large']:
-        if segment in segment_summary.index:
-            total = segment_summary.loc[segment, 'sum']
-            count = segment_summary.loc[segment, 'count']
-            print(f"  {segment}: ${total:,.2f} ({count:,} donations)")
-    
-    print(f"\nUnique donors: {df['Donator'].nunique():,}")
-    print(f"Unique weeks: {df['Year_Week'].nunique()}")
-    print(f"Unique months: {df['Year_Month'].nunique()}")
+    accumulator.print_summary()
     
     print(f"\n{'='*80}")
     print("✓ Data preparation complete!")
@@ -0,0 +1,152 @@
+#!/usr/bin/env python3
+"""
+Partitioned Parquet store for the processed donation records.
+prepare_donation_time_series.py writes the cleaned rows as a Hive-style
+dataset under donation_time_series_data/processed_donations/, partitioned by
+Year_Month and Party (Year_Month=2024-03/Party=REP/part-*.parquet) with
+dictionary-encoded text columns and a date32 Date column. Readers prune
+partitions, so loading e.g. only 2024 REP donations touches only those files.
+Without pyarrow the rows are written to processed_donations.csv as before.
+"""
+
+import shutil
+import sys
+from pathlib import Path
+
+import pandas as pd
+from donation_aggregates import PARTIES
+from donor_dictionary import SEGMENT_LABELS
+
+try:
+    import pyarrow as pa
+    import pyarrow.dataset as ds
+    import pyarrow.parquet as pq
+except ImportError:
+    pa = None
+    ds = None
+    pq = None
+
+DATASET_NAME = 'processed_donations'
+PROCESSED_COLUMNS = ['Party', 'Donator', 'Donation_Amount_USD', 'Donor_Segment',
+                     'Date', 'Year_Week', 'Year_Month']
+
+def processed_path(output_dir):
+    """Dataset directory (or CSV file when pyarrow is missing) for processed rows."""
+    output_dir = Path(output_dir)
+    if pq is None:
+        return output_dir / f'{DATASET_NAME}.csv'
+    return output_dir / DATASET_NAME
+
+def reset_processed(path):
+    """Remove a previous processed output so a run never mixes old and new parts."""
+    path = Path(path)
+    if path.is_dir():
+        shutil.rmtree(path)
+    elif path.exists():
+        path.unlink()
+
+def _partitioning():
+    """Hive partitioning on (Year_Month, Party), both read back as strings."""
+    return ds.partitioning(pa.schema([('Year_Month', pa.string()), ('Party', pa.string())]),
+                           flavor='hive')
+
+def write_processed_part(rows, path, part_name):
+    """
+    Write cleaned rows (PROCESSED_COLUMNS) to the processed output.
+    `part_name` must be unique per call and sort in file order (e.g. the
+    chunk or shard number); it names the Parquet file in each partition.
+    """
+    rows = rows[PROCESSED_COLUMNS]
+    path = Path(path)
+    if pq is None:
+        rows.to_csv(path, mode='a' if path.exists() else 'w', header=not path.exists(), index=False)
+        return
+
+    # Partition values are written as plain strings
+    table = pa.Table.from_pandas(rows.astype({'Party': str, 'Year_Month': str}), preserve_index=False)
+    # Dates carry no time of day, so store them as days
+    table = table.set_column(table.schema.get_field_index('Date'), 'Date',
+                             table['Date'].cast(pa.timestamp('s')).cast(pa.date32()))
+    # Same dictionary type in every part, whether the column arrives as strings or categories
+    for name in ['Donator', 'Year_Week']:
+        table = table.set_column(table.schema.get_field_index(name), name,
+                                 table[name].cast(pa.dictionary(pa.int32(), pa.string())))
+    ds.write_dataset(table, path, format='parquet', partitioning=_partitioning(),
+                     basename_template=f'part-{part_name}-{{i}}.parquet',
+                     existing_data_behavior='overwrite_or_ignore')
+
+def _filter_expression(years, months, parties):
+    """Partition filter for the given years, YYYY-MM months and parties."""
+    terms = []
+    if years is not None:
+        years = [int(year) for year in years]
+        terms.append(ds.field('Year_Month').isin(
+            [f'{year}-{month:02d}' for year in years for month in range(1, 13)]))
+    if months is not None:
+        terms.append(ds.field('Year_Month').isin([str(month) for month in months]))
+    if parties is not None:
+        terms.append(ds.field('Party').isin(list(parties)))
+    expression = None
+    for term in terms:
+        expression = term if expression is None else expression & term
+    return expression
+
+def _restore_dtypes(df):
+    """Categorical party/segment labels and datetime dates, as the CSV readers expect."""
+    if 'Party' in df.columns:
+        df['Party'] = df['Party'].astype(pd.CategoricalDtype(PARTIES))
+    if 'Donor_Segment' in df.columns:
+        df['Donor_Segment'] = df['Donor_Segment'].astype(pd.CategoricalDtype(SEGMENT_LABELS))
+    if 'Date' in df.columns:
+        df['Date'] = pd.to_datetime(df['Date'])
+    return df
+
+def read_processed_donations(path, years=None, months=None, parties=None, columns=None):
+    """
+    Load processed donation rows, reading only the matching partitions.
+    `years` (e.g. [2024]), `months` ('YYYY-MM' labels) and `parties`
+    (e.g. ['REP']) restrict the partitions read; `columns` selects columns.
+    """
+    path = Path(path)
+    if path.suffix == '.csv' or pq is None:
+        df = pd.read_csv(path)
+        if years is not None:
+            df = df[df['Year_Month'].str[:4].astype(int).isin([int(year) for year in years])]
+        if months is not None:
+            df = df[df['Year_Month'].isin([str(month) for month in months])]
+        if parties is not None:
+            df = df[df['Party'].isin(list(parties))]
+        return _restore_dtypes(df[columns or PROCESSED_COLUMNS].reset_index(drop=True))
+
+    dataset = ds.dataset(path, format='parquet', partitioning=_partitioning())
+    # Files are discovered in path order, so rows come back month by month
+    table = dataset.to_table(columns=columns or PROCESSED_COLUMNS,
+                             filter=_filter_expression(years, months, parties))
+    return _restore_dtypes(table.to_pandas())
+
+def main():
+    """Print partition sizes of the processed donation dataset."""
+    print("="*80)
+    print("PROCESSED DONATION PARTITIONS")
+    print("="*80)
+
+    path = Path(sys.argv[1]) if len(sys.argv) > 1 else processed_path('donation_time_series_data')
+    if not path.exists():
+        print(f"✗ Error: {path} not found")
+        print("  Run prepare_donation_time_series.py first")
+        return
+    if not path.is_dir():
+        print(f"  {path} is a CSV file (pyarrow not installed); no partitions to list")
+        return
+
+    dataset = ds.dataset(path, format='parquet', partitioning=_partitioning())
+    counts = {}
+    for fragment in dataset.get_fragments():
+        key = Path(fragment.path).parent.relative_to(path).as_posix()
+        counts[key] = counts.get(key, 0) + fragment.metadata.num_rows
+    for key in sorted(counts):
+        print(f"  {key}: {counts[key]:,} rows")
+    print(f"\n  ✓ {sum(counts.values()):,} rows in {len(counts):,} partitions")
+
+if __name__ == '__main__':
+    main()
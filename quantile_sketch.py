@@ -0,0 +1,126 @@
+#!/usr/bin/env python3
+"""
+Streaming, mergeable quantile sketch (KLL) for donor segment thresholds.
+Keeps a few thousand weighted samples instead of every value; the rank error
+is bounded by `epsilon` (with high probability) and sketches built on separate
+chunks or shards can be merged.
+"""
+
+import math
+import numpy as np
+import pandas as pd
+from donation_base_table import donor_totals, iter_donor_totals
+
+# Empirical KLL constant: rank error is about 1.7 / k for compactor size k
+KLL_ERROR_CONSTANT = 1.7
+DEFAULT_EPSILON = 0.001
+
+class KLLSketch:
+    """KLL quantile sketch with numpy-backed compactors."""
+
+    def __init__(self, epsilon=DEFAULT_EPSILON, seed=0):
+        self.epsilon = epsilon
+        self.k = max(8, int(math.ceil(KLL_ERROR_CONSTANT / epsilon)))
+        self.count = 0
+        self.compactors = [np.empty(0, dtype='float64')]
+        self._rng = np.random.default_rng(seed)
+
+    def _capacity(self, level):
+        """Capacity of a level; lower levels shrink geometrically (c = 2/3)."""
+        depth = len(self.compactors) - level - 1
+        return max(int(math.ceil(self.k * (2 / 3) ** depth)), 2)
+
+    def _compress(self):
+        """Halve any over-full level, promoting every other item one level up."""
+        level = 0
+        while level < len(self.compactors):
+            items = self.compactors[level]
+            if len(items) > self._capacity(level):
+                if level + 1 == len(self.compactors):
+                    self.compactors.append(np.empty(0, dtype='float64'))
+                items = np.sort(items)
+                # Keep the odd item out at this level so the total weight is preserved
+                keep = items[-1:] if len(items) % 2 else items[:0]
+                pairs = items[:len(items) - len(keep)]
+                promoted = pairs[self._rng.integers(2)::2]
+                self.compactors[level] = keep
+                self.compactors[level + 1] = np.concatenate([self.compactors[level + 1], promoted])
+            level += 1
+
+    def update(self, values):
+        """Add an array of values to the sketch."""
+        values = np.asarray(values, dtype='float64')
+        values = values[~np.isnan(values)]
+        if len(values) == 0:
+            return self
+        self.count += len(values)
+        # Feed in k-sized batches so level 0 never grows far past its capacity
+        for start in range(0, len(values), self.k):
+            self.compactors[0] = np.concatenate([self.compactors[0], values[start:start + self.k]])
+            self._compress()
+        return self
+
+    def merge(self, other):
+        """Fold another sketch into this one."""
+        while len(self.compactors) < len(other.compactors):
+            self.compactors.append(np.empty(0, dtype='float64'))
+        for level, items in enumerate(other.compactors):
+            self.compactors[level] = np.concatenate([self.compactors[level], items])
+        self.count += other.count
+        self._compress()
+        return self
+
+    def quantile(self, q):
+        """Approximate value at quantile q (0-1)."""
+        if self.count == 0:
+            return np.nan
+        values = np.concatenate(self.compactors)
+        weights = np.concatenate([
+            np.full(len(items), 2 ** level, dtype='float64')
+            for level, items in enumerate(self.compactors)
+        ])
+        order = np.argsort(values, kind='stable')
+        cumulative = np.cumsum(weights[order])
+        position = np.searchsorted(cumulative, q * cumulative[-1], side='left')
+        return values[order][min(position, len(values) - 1)]
+
+    def size(self):
+        """Number of stored samples (the sketch's memory footprint)."""
+        return sum(len(items) for items in self.compactors)
+
+def sketch_donor_totals(base, epsilon=DEFAULT_EPSILON):
+    """
+    Positive donor totals of a base table and a KLL sketch of their amounts,
+    built in one pass over donor-id ranges: each range's totals are sketched
+    as they are produced and the sketches are merged.
+    Returns (donor totals, sketch).
+    """
+    sketch = KLLSketch(epsilon)
+    parts = []
+    for seed, totals in enumerate(iter_donor_totals(base), start=1):
+        totals = totals[totals['Cumulative_Donation_USD'] > 0]
+        sketch.merge(KLLSketch(epsilon, seed=seed).update(totals['Cumulative_Donation_USD']))
+        parts.append(totals)
+    if not parts:
+        return donor_totals(base.iloc[:0]), sketch
+    return pd.concat(parts, ignore_index=True), sketch
+
+def report_deviation(values, quantiles, approx_thresholds):
+    """
+    Print exact vs approximate thresholds and the rank error of each estimate.
+    Returns a list of (q, exact, approx, rank_error) tuples.
+    """
+    sorted_values = np.sort(np.asarray(values, dtype='float64'))
+    n = len(sorted_values)
+    rows = []
+    print(f"\n  Exact vs approximate thresholds:")
+    for q, approx in zip(quantiles, approx_thresholds):
+        exact = np.quantile(sorted_values, q)
+        # Ties span a rank interval; the error is the distance from q to it
+        low = np.searchsorted(sorted_values, approx, side='left') / n
+        high = np.searchsorted(sorted_values, approx, side='right') / n
+        rank_error = 0.0 if low <= q <= high else min(abs(low - q), abs(high - q))
+        rows.append((q, exact, approx, rank_error))
+        print(f"    q={q:.3f}: exact ${exact:,.2f}, approx ${approx:,.2f}, "
+              f"diff ${approx - exact:+,.2f}, rank error {rank_error:.5f}")
+    return rows
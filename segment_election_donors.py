@@ -4,11 +4,31 @@ Segment election donors into Small, Medium, and Large categories
 based on cumulative donation amounts using percentile thresholds.
 """
 
-import pandas as pd
+import argparse
 from pathlib import Path
+from donation_base_table import donor_totals, load_base_table
+from donor_dictionary import DonorDictionary, dictionary_path
+from quantile_sketch import DEFAULT_EPSILON, report_deviation, sketch_donor_totals
+from sqlite_store import write_table
+
+SEGMENT_QUANTILES = [0.333, 0.666]
+
+def parse_args():
+    """Parse command line options."""
+    parser = argparse.ArgumentParser(description="Segment election donors by cumulative donation.")
+    parser.add_argument('--approx', action='store_true',
+                        help="estimate thresholds with a KLL sketch instead of exact quantiles")
+    parser.add_argument('--epsilon', type=float, default=DEFAULT_EPSILON,
+                        help=f"rank error bound for --approx (default: {DEFAULT_EPSILON})")
+    parser.add_argument('--compare-exact', action='store_true',
+                        help="with --approx, also compute exact thresholds and report the deviation")
+    parser.add_argument('--workers', type=int, default=1,
+                        help="build the base table from parallel byte-range shards with this many processes")
+    return parser.parse_args()
 
 def main():
     """Main function to segment election donors."""
+    args = parse_args()
     print("="*80)
     print("SEGMENT ELECTION DONORS")
     print("="*80)
@@ -25,46 +45,42 @@ def main():
     
     print(f"\n[1/4] Loading donation data from {input_file.name}...")
     
-    # Load donation data
+    # The donor x day x party base table is built once per source file;
+    # re-segmenting only re-reads this table, not the raw rows
     try:
-        df = pd.read_csv(input_file, low_memory=False)
-        print(f"  ✓ Loaded {len(df):,} donation records")
+        base = load_base_table(input_file, workers=args.workers)
+        print(f"  ✓ Loaded {len(base):,} donor x day x party rows")
     except Exception as e:
         print(f"  ✗ Error loading file: {e}")
         return
     
-    # Check required columns
-    required_columns = ['Donator', 'Donation_Amount_USD']
-    missing_columns = [col for col in required_columns if col not in df.columns]
-    if missing_columns:
-        print(f"  ✗ Missing required columns: {', '.join(missing_columns)}")
-        return
-    
     print(f"\n[2/4] Calculating cumulative donations per donor...")
     
-    # Group by Donator and calculate cumulative donation
-    # Handle missing or zero values
-    df['Donation_Amount_USD'] = pd.to_numeric(df['Donation_Amount_USD'], errors='coerce').fillna(0)
-    
-    # Aggregate by donor
-    donor_stats = df.groupby('Donator').agg({
-        'Donation_Amount_USD': ['sum', 'count'],
-    }).reset_index()
-    
-    # Flatten column names
-    donor_stats.columns = ['Donator', 'Cumulative_Donation_USD', 'Number_of_Donations']
-    
-    # Remove donors with zero cumulative donations
-    donor_stats = donor_stats[donor_stats['Cumulative_Donation_USD'] > 0]
+    # Missing amounts count as 0; rows without a donor name are excluded
+    if args.approx:
+        # Totals and their sketch come from one pass over donor-id ranges
+        donor_stats, sketch = sketch_donor_totals(base, args.epsilon)
+    else:
+        donor_stats = donor_totals(base)
+        
+        # Remove donors with zero cumulative donations
+        donor_stats = donor_stats[donor_stats['Cumulative_Donation_USD'] > 0]
     
     total_donors = len(donor_stats)
     print(f"  ✓ Found {total_donors:,} unique donors with donations")
     
     print(f"\n[3/4] Calculating percentile thresholds...")
     
-    # Calculate percentile thresholds
-    p33_3 = donor_stats['Cumulative_Donation_USD'].quantile(0.333)
-    p66_6 = donor_stats['Cumulative_Donation_USD'].quantile(0.666)
+    if args.approx:
+        # Thresholds from the merged KLL sketch, with bounded rank error
+        p33_3, p66_6 = (sketch.quantile(q) for q in SEGMENT_QUANTILES)
+        print(f"  ✓ KLL sketch: epsilon={args.epsilon}, {sketch.size():,} samples kept")
+        if args.compare_exact:
+            report_deviation(donor_stats['Cumulative_Donation_USD'], SEGMENT_QUANTILES, [p33_3, p66_6])
+    else:
+        # Calculate percentile thresholds
+        p33_3 = donor_stats['Cumulative_Donation_USD'].quantile(SEGMENT_QUANTILES[0])
+        p66_6 = donor_stats['Cumulative_Donation_USD'].quantile(SEGMENT_QUANTILES[1])
     
     print(f"  ✓ 33.3rd percentile threshold: ${p33_3:,.2f}")
     print(f"  ✓ 66.6th percentile threshold: ${p66_6:,.2f}")
@@ -85,11 +101,20 @@ def main():
     # Sort by cumulative donation (descending)
     donor_stats = donor_stats.sort_values('Cumulative_Donation_USD', ascending=False)
     
+    # Join donor names back from the dictionary only for the output file
+    dictionary = DonorDictionary.load(dictionary_path(input_file))
+    donor_stats.insert(0, 'Donator', dictionary.decode(donor_stats['Donor_ID'].to_numpy()))
+    donor_stats = donor_stats[['Donator', 'Cumulative_Donation_USD', 'Number_of_Donations',
+                               'Donor_Segment', 'Donor_ID']]
+    
     # Save output
     output_file = Path('donor_segments.csv')
     donor_stats.to_csv(output_file, index=False)
     
     print(f"  ✓ Saved results to {output_file.name}")
+    db = write_table('donor_segments', donor_stats)
+    if db is not None:
+        print(f"  ✓ Stored donor_segments in {db}")
     
     # Generate summary statistics
     print(f"\n{'='*80}")
@@ -6,6 +6,7 @@ Updates all_users_analysis.csv with user_segment column.
 
 import pandas as pd
 from pathlib import Path
+from sqlite_store import write_table
 
 def main():
     """Main function to segment users."""
@@ -38,6 +39,7 @@ def main():
     
     # Save updated file
     df.to_csv(input_file, index=False)
+    write_table('all_users_analysis', df)
     
     print(f"\n{'='*80}")
     print(f"✓ COMPLETED: Classified {len(df)} users into segments")
@@ -0,0 +1,207 @@
+#!/usr/bin/env python3
+"""
+Optional SQLite backend for the pipeline outputs.
+When the ELECTION_FUNDING_DB environment variable names a database file,
+the scripts also write their outputs (donor segments, aggregations, user
+analysis and the per-user/per-market trader files) into that single
+database, using bulk inserts inside one transaction per write and indexes
+on donor, user, market, period and segment columns. The CSV outputs are
+written as before, so downstream steps do not change.
+
+Point lookups then become indexed queries:
+
+    from sqlite_store import donor_segment, wallet_positions
+    donor_segment('DOE, JANE')
+    wallet_positions('0xabc...', event_id='arizona-senate', market_slug='will-kari-lake-win')
+"""
+
+import os
+import sqlite3
+import sys
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+DB_ENV_VAR = 'ELECTION_FUNDING_DB'
+INSERT_BATCH_ROWS = 50_000
+
+# Indexed column groups per table
+TABLE_INDEXES = {
+    'donor_segments': [['Donator'], ['Donor_ID'], ['Donor_Segment']],
+    'weekly_aggregations': [['Year_Week'], ['Donor_Segment', 'Party']],
+    'monthly_aggregations': [['Year_Month'], ['Donor_Segment', 'Party']],
+    'weekly_cumulative_aggregations': [['Segment', 'Year_Week']],
+    'monthly_cumulative_aggregations': [['Segment', 'Year_Month']],
+    'candidate_cumulative_ratios': [['Candidate', 'Frequency', 'Period'], ['Race', 'Segment']],
+    'all_users_analysis': [['user_id'], ['user_segment']],
+    'combined_tokens': [['user_id', 'event_id'], ['event_id', 'market_slug']],
+    'date_group_tokens': [['user_id', 'date']],
+    'user_positions': [['user_id', 'event_id', 'market_slug'], ['event_id', 'market_slug']],
+    'segment_odds': [['event_id', 'market_slug', 'segment']],
+}
+
+def database_path():
+    """Database file from ELECTION_FUNDING_DB, or None when the backend is off."""
+    path = os.environ.get(DB_ENV_VAR)
+    return Path(path) if path else None
+
+def connect(db=None):
+    """Open the database (ELECTION_FUNDING_DB by default) with bulk-load settings."""
+    connection = sqlite3.connect(db or database_path())
+    connection.execute('PRAGMA journal_mode=WAL')
+    connection.execute('PRAGMA synchronous=NORMAL')
+    return connection
+
+def _quote(name):
+    """Quote an identifier (column names may contain spaces)."""
+    return '"' + str(name).replace('"', '""') + '"'
+
+def _sql_type(dtype):
+    if pd.api.types.is_bool_dtype(dtype) or pd.api.types.is_integer_dtype(dtype):
+        return 'INTEGER'
+    if pd.api.types.is_float_dtype(dtype):
+        return 'REAL'
+    return 'TEXT'
+
+def _rows(df):
+    """Rows as plain Python values (None for missing) that sqlite3 can bind."""
+    columns = []
+    for name in df.columns:
+        column = df[name]
+        if _sql_type(column.dtype) == 'TEXT':
+            values = column.astype(object).where(column.notna(), None)
+            values = [value if value is None or isinstance(value, str) else str(value) for value in values]
+        else:
+            values = column.astype(object).where(column.notna(), None).tolist()
+        columns.append(values)
+    return list(zip(*columns))
+
+def _table_columns(connection, name):
+    return [row[1] for row in connection.execute(f'PRAGMA table_info({_quote(name)})')]
+
+def write_table(name, df, scope=None, db=None):
+    """
+    Store `df` as table `name` in one transaction. Without `scope` the table
+    is replaced; with a {column: value} scope only the rows matching it are
+    replaced (e.g. one market). Returns the database path, or None when the
+    backend is off.
+    """
+    db = db or database_path()
+    if db is None:
+        return None
+
+    connection = connect(db)
+    try:
+        with connection:
+            if scope is None:
+                connection.execute(f'DROP TABLE IF EXISTS {_quote(name)}')
+            definition = ', '.join(f'{_quote(column)} {_sql_type(df[column].dtype)}' for column in df.columns)
+            connection.execute(f'CREATE TABLE IF NOT EXISTS {_quote(name)} ({definition})')
+            existing = _table_columns(connection, name)
+            for column in df.columns:
+                if column not in existing:
+                    connection.execute(f'ALTER TABLE {_quote(name)} ADD COLUMN '
+                                       f'{_quote(column)} {_sql_type(df[column].dtype)}')
+            if scope is not None:
+                where = ' AND '.join(f'{_quote(column)} = ?' for column in scope)
+                connection.execute(f'DELETE FROM {_quote(name)} WHERE {where}', list(scope.values()))
+
+            insert = (f'INSERT INTO {_quote(name)} ({", ".join(_quote(column) for column in df.columns)}) '
+                      f'VALUES ({", ".join("?" for _ in df.columns)})')
+            for start in range(0, len(df), INSERT_BATCH_ROWS):
+                connection.executemany(insert, _rows(df.iloc[start:start + INSERT_BATCH_ROWS]))
+
+            for columns in TABLE_INDEXES.get(name, []):
+                if all(column in df.columns for column in columns):
+                    index_name = f'idx_{name}_' + '_'.join(columns).replace(' ', '_')
+                    connection.execute(f'CREATE INDEX IF NOT EXISTS {_quote(index_name)} ON {_quote(name)} '
+                                       f'({", ".join(_quote(column) for column in columns)})')
+    finally:
+        connection.close()
+    return db
+
+class TableBatch:
+    """
+    Collects many small frames (e.g. one per user) and stores them with a
+    single write_table call on close, instead of one transaction per frame.
+    Does nothing when the backend is off.
+    """
+
+    def __init__(self, name, scope=None, db=None):
+        self.name = name
+        self.scope = scope
+        self.db = db or database_path()
+        self.frames = []
+
+    def add(self, df, **columns):
+        """Queue a frame, adding constant key columns such as user_id or market_slug."""
+        if self.db is None:
+            return
+        self.frames.append(df.assign(**columns) if columns else df)
+
+    def close(self):
+        """Write everything queued so far. Returns the database path or None."""
+        if self.db is None or not self.frames:
+            return None
+        frames, self.frames = self.frames, []
+        return write_table(self.name, pd.concat(frames, ignore_index=True), self.scope, self.db)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, traceback):
+        if exc_type is None:
+            self.close()
+
+def lookup(name, columns=None, db=None, **filters):
+    """Rows of `name` matching equality filters, e.g. lookup('donor_segments', Donator='DOE, JANE')."""
+    selected = '*' if columns is None else ', '.join(_quote(column) for column in columns)
+    query = f'SELECT {selected} FROM {_quote(name)}'
+    if filters:
+        query += ' WHERE ' + ' AND '.join(f'{_quote(column)} = ?' for column in filters)
+    connection = connect(db)
+    try:
+        return pd.read_sql_query(query, connection, params=[
+            value.item() if isinstance(value, np.generic) else value for value in filters.values()])
+    finally:
+        connection.close()
+
+def donor_segment(donor, db=None):
+    """Segment of one donor name (None when the donor is unknown)."""
+    rows = lookup('donor_segments', columns=['Donor_Segment'], db=db, Donator=donor)
+    return rows['Donor_Segment'].iloc[0] if len(rows) else None
+
+def wallet_positions(wallet, event_id=None, market_slug=None, db=None):
+    """Daily positions of one wallet, optionally restricted to an event and market."""
+    filters = {'user_id': wallet}
+    if event_id is not None:
+        filters['event_id'] = event_id
+    if market_slug is not None:
+        filters['market_slug'] = market_slug
+    return lookup('user_positions', db=db, **filters).sort_values(['event_id', 'market_slug', 'day_offset'])
+
+def main():
+    """List the tables stored in the database with their row counts."""
+    print("="*80)
+    print("ELECTION FUNDING SQLITE STORE")
+    print("="*80)
+
+    db = Path(sys.argv[1]) if len(sys.argv) > 1 else database_path()
+    if db is None or not db.exists():
+        print(f"✗ Error: no database; set {DB_ENV_VAR} (or pass a path) and rerun the pipeline")
+        return
+
+    connection = connect(db)
+    try:
+        names = [row[0] for row in connection.execute(
+            "SELECT name FROM sqlite_master WHERE type = 'table' ORDER BY name")]
+        for name in names:
+            count = connection.execute(f'SELECT COUNT(*) FROM {_quote(name)}').fetchone()[0]
+            print(f"  {name}: {count:,} rows")
+    finally:
+        connection.close()
+    print(f"\n  ✓ {len(names)} tables in {db}")
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,83 @@
+#!/usr/bin/env python3
+"""
+Asset-to-outcome token map of every market.
+build_combined_token.py already parses each trades file, so it records the
+distinct (asset, outcome) pairs of every market in
+combined_token_output/token_map.csv as it goes. Later steps map price
+token_ids to YES/NO with this small table instead of re-reading the
+(often multi-hundred-MB) trades files.
+"""
+
+import sys
+from pathlib import Path
+
+import pandas as pd
+from data_schema import TRADE_DTYPES, TRADE_STAGE_COLUMNS, read_schema_csv
+from trade_normalization import TOKEN_TYPES
+
+TOKEN_MAP_COLUMNS = ['event_id', 'market_slug', 'asset', 'outcome']
+
+def token_map_path(output_dir='combined_token_output'):
+    """CSV file holding the token map."""
+    return Path(output_dir) / 'token_map.csv'
+
+def market_token_pairs(trades, event_id, market_slug):
+    """Distinct (asset, outcome) pairs of one market's trades, as token map rows."""
+    if 'asset' not in trades.columns:
+        return pd.DataFrame(columns=TOKEN_MAP_COLUMNS)
+    pairs = trades[['asset', 'outcome']].drop_duplicates().sort_values(['asset', 'outcome'])
+    return pairs.assign(event_id=event_id, market_slug=market_slug)[TOKEN_MAP_COLUMNS]
+
+def write_token_map(pairs, path):
+    """Write the token map rows of every market, replacing a previous map."""
+    path = Path(path)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    token_map = pd.concat(pairs, ignore_index=True) if pairs else pd.DataFrame(columns=TOKEN_MAP_COLUMNS)
+    token_map.sort_values(['event_id', 'market_slug', 'asset', 'outcome']).to_csv(path, index=False)
+
+def read_token_map(path=None):
+    """{(event_id, market_slug): rows} of the token map; empty when it has not been built."""
+    path = Path(path) if path is not None else token_map_path()
+    if not path.exists():
+        return {}
+    token_map = pd.read_csv(path, dtype=str)
+    return {key: rows[['asset', 'outcome']].reset_index(drop=True)
+            for key, rows in token_map.groupby(['event_id', 'market_slug'], sort=False)}
+
+def market_token_types(token_map, data_dir, event_id, market_slug):
+    """
+    Series mapping asset -> YES/NO for a market. Markets missing from the map
+    (e.g. build_combined_token.py has not run) fall back to reading the
+    asset/outcome columns of their trades file; returns None without one.
+    """
+    pairs = token_map.get((event_id, market_slug))
+    if pairs is None:
+        trades_file = Path(data_dir) / event_id / 'trades' / f'{market_slug}_trades.csv'
+        if not trades_file.exists():
+            return None
+        print(f"  ⚠ {market_slug} is not in the token map; reading its trades file")
+        trades = read_schema_csv(trades_file, TRADE_DTYPES, TRADE_STAGE_COLUMNS['token_mapping'])
+        pairs = market_token_pairs(trades, event_id, market_slug)
+    return pairs.drop_duplicates('asset').set_index('asset')['outcome'].map(TOKEN_TYPES)
+
+def main():
+    """Print the token map of every market."""
+    print("="*80)
+    print("TOKEN MAP")
+    print("="*80)
+
+    path = Path(sys.argv[1]) if len(sys.argv) > 1 else token_map_path()
+    token_map = read_token_map(path)
+    if not token_map:
+        print(f"✗ Error: {path} not found")
+        print("  Run build_combined_token.py first")
+        return
+
+    for (event_id, market_slug), pairs in token_map.items():
+        outcomes = ', '.join(f"{outcome}={str(asset)[:12]}…"
+                             for asset, outcome in zip(pairs['asset'], pairs['outcome']))
+        print(f"  {event_id}/{market_slug}: {outcomes}")
+    print(f"\n  ✓ {len(token_map)} markets in {path}")
+
+if __name__ == '__main__':
+    main()
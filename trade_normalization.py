@@ -0,0 +1,53 @@
+#!/usr/bin/env python3
+"""
+Array-only normalization of raw trade rows, shared by the trader steps.
+Adds the columns every step derives from a trades file:
+- user_id: the trading wallet (proxyWallet)
+- token_type: YES/NO from the outcome label
+- net_tokens: signed size, +size for BUY and -size for anything else
+- epoch_day: int32 UTC day number (days since 1970-01-01) of the timestamp
+- day_offset: int16 days relative to the market's closing day (optional)
+
+Days stay integers through the groupbys; day_labels() turns the few
+distinct days of a grouped result back into YYYY-MM-DD strings.
+"""
+
+import numpy as np
+import pandas as pd
+
+SECONDS_PER_DAY = 86400
+TOKEN_TYPES = {'Yes': 'YES', 'No': 'NO'}
+
+def signed_sizes(side, size):
+    """Trade sizes signed by side: BUY adds tokens, SELL removes them."""
+    size = np.asarray(size, dtype='float64')
+    return np.where(np.asarray(side == 'BUY', dtype=bool), size, -size)
+
+def epoch_days(timestamps):
+    """int32 UTC day numbers of Unix timestamps in seconds (no missing values)."""
+    return np.floor_divide(np.asarray(timestamps, dtype='float64'), SECONDS_PER_DAY).astype('int32')
+
+def epoch_day(date):
+    """Day number of a date, datetime or date string."""
+    return int(np.datetime64(pd.Timestamp(date).date(), 'D').astype('int64'))
+
+def day_labels(days):
+    """YYYY-MM-DD strings for day numbers, formatted once per distinct day."""
+    unique_days, positions = np.unique(np.asarray(days, dtype='int64'), return_inverse=True)
+    labels = np.datetime_as_string(unique_days.astype('datetime64[D]'), unit='D').astype(object)
+    return labels[positions]
+
+def normalize_trades(df, closing_date=None):
+    """
+    Add user_id, token_type, net_tokens and epoch_day to a trades frame, and
+    day_offset when the market's closing date is given. Rows without a
+    timestamp are dropped.
+    """
+    df = df.dropna(subset=['timestamp'])
+    df['user_id'] = df['proxyWallet']
+    df['token_type'] = df['outcome'].map(TOKEN_TYPES)
+    df['net_tokens'] = signed_sizes(df['side'], df['size'])
+    df['epoch_day'] = epoch_days(df['timestamp'])
+    if closing_date is not None:
+        df['day_offset'] = (df['epoch_day'].to_numpy() - epoch_day(closing_date)).astype('int16')
+    return df
@@ -4,14 +4,24 @@ Generate comprehensive donor segmentation visualizations for all US Election don
 Creates individual graphs with detailed analysis and interpretation guides.
 """
 
+import argparse
 import pandas as pd
 import numpy as np
 import matplotlib.pyplot as plt
 import seaborn as sns
 from pathlib import Path
+from donation_base_table import donor_totals, load_base_table
+from donor_dictionary import DonorDictionary, dictionary_path
+from quantile_sketch import DEFAULT_EPSILON, report_deviation, sketch_donor_totals
 
-def load_and_segment_donors():
-    """Load donor data and segment by percentiles."""
+SEGMENT_QUANTILES = [0.333, 0.666]
+
+def load_and_segment_donors(approx=False, epsilon=DEFAULT_EPSILON, compare_exact=False):
+    """
+    Load donor data and segment by percentiles.
+    With approx=True, the thresholds come from a KLL sketch with rank error
+    bound `epsilon`.
+    """
     
     # Input file - use full dataset
     input_file = Path('US_Election_Donation.csv')
@@ -20,47 +30,36 @@ def load_and_segment_donors():
         print("✗ Error: US_Election_Donation.csv not found.")
         return None
     
-    print(f"\n[1/2] Loading full donation data (this may take a moment)...")
+    print(f"\n[1/2] Loading donor totals (the base table is built on first use)...")
     
-    # Load donation data in chunks to handle large files
+    # Per-donor totals come from the cached donor x day x party base table
     try:
-        chunks = []
-        chunk_size = 50000
-        for chunk in pd.read_csv(input_file, chunksize=chunk_size, low_memory=False):
-            chunks.append(chunk)
-        
-        df = pd.concat(chunks, ignore_index=True)
-        print(f"  ✓ Loaded {len(df):,} total donation records")
+        base = load_base_table(input_file)
+        if approx:
+            # Positive totals and their sketch come from one pass over donor-id ranges
+            donor_stats, sketch = sketch_donor_totals(base, epsilon)
+        else:
+            donor_stats = donor_totals(base)
+        print(f"  ✓ Loaded totals for {len(donor_stats):,} donors")
     except Exception as e:
         print(f"  ✗ Error loading file: {e}")
         return None
     
-    # Check required columns
-    required_columns = ['Donator', 'Donation_Amount_USD']
-    missing_columns = [col for col in required_columns if col not in df.columns]
-    if missing_columns:
-        print(f"  ✗ Missing required columns: {', '.join(missing_columns)}")
-        return None
-    
     print(f"\n[2/2] Calculating percentile thresholds and segmenting donors...")
     
-    # Handle missing or zero values
-    df['Donation_Amount_USD'] = pd.to_numeric(df['Donation_Amount_USD'], errors='coerce').fillna(0)
-    
-    # Aggregate by donor
-    donor_stats = df.groupby('Donator').agg({
-        'Donation_Amount_USD': ['sum', 'count'],
-    }).reset_index()
-    
-    # Flatten column names
-    donor_stats.columns = ['Donator', 'Cumulative_Donation_USD', 'Number_of_Donations']
-    
     # Remove donors with zero cumulative donations
     donor_stats = donor_stats[donor_stats['Cumulative_Donation_USD'] > 0]
     
-    # Calculate percentile thresholds
-    p33_3 = donor_stats['Cumulative_Donation_USD'].quantile(0.333)
-    p66_6 = donor_stats['Cumulative_Donation_USD'].quantile(0.666)
+    if approx:
+        # Thresholds from the merged KLL sketch, with bounded rank error
+        p33_3, p66_6 = (sketch.quantile(q) for q in SEGMENT_QUANTILES)
+        print(f"  ✓ KLL sketch: epsilon={epsilon}, {sketch.size():,} samples kept")
+        if compare_exact:
+            report_deviation(donor_stats['Cumulative_Donation_USD'], SEGMENT_QUANTILES, [p33_3, p66_6])
+    else:
+        # Calculate percentile thresholds
+        p33_3 = donor_stats['Cumulative_Donation_USD'].quantile(SEGMENT_QUANTILES[0])
+        p66_6 = donor_stats['Cumulative_Donation_USD'].quantile(SEGMENT_QUANTILES[1])
     
     print(f"  ✓ 33.3rd percentile: ${p33_3:,.2f}")
     print(f"  ✓ 66.6th percentile: ${p66_6:,.2f}")
@@ -76,6 +75,10 @@ def load_and_segment_donors():
     
     donor_stats['Donor_Segment'] = donor_stats['Cumulative_Donation_USD'].apply(classify_segment)
     
+    # Join donor names back from the dictionary
+    dictionary = DonorDictionary.load(dictionary_path(input_file))
+    donor_stats.insert(0, 'Donator', dictionary.decode(donor_stats['Donor_ID'].to_numpy()))
+    
     print(f"  ✓ Segmented {len(donor_stats):,} unique donors")
     
     return donor_stats
@@ -442,14 +445,26 @@ def print_summary(df):
         print(f"    Total: ${total:,.2f} ({total_pct:.2f}%)")
         print(f"    Avg: ${segment_df['Cumulative_Donation_USD'].mean():,.2f}")
 
+def parse_args():
+    """Parse command line options."""
+    parser = argparse.ArgumentParser(description="Generate all-donor segmentation visualizations.")
+    parser.add_argument('--approx', action='store_true',
+                        help="estimate thresholds with a KLL sketch instead of exact quantiles")
+    parser.add_argument('--epsilon', type=float, default=DEFAULT_EPSILON,
+                        help=f"rank error bound for --approx (default: {DEFAULT_EPSILON})")
+    parser.add_argument('--compare-exact', action='store_true',
+                        help="with --approx, also compute exact thresholds and report the deviation")
+    return parser.parse_args()
+
 def main():
     """Main function."""
+    args = parse_args()
     print("="*80)
     print("GENERATE ALL DONOR SEGMENTATION VISUALIZATIONS")
     print("="*80)
     
     # Load and segment data
-    df = load_and_segment_donors()
+    df = load_and_segment_donors(args.approx, args.epsilon, args.compare_exact)
     if df is None:
         return
     